@@ -22,6 +22,17 @@ import traceSelectTool as tst
 tst = reload(tst)
 traceSelect = tst.main(mc.ls(sl=True))
 """, p=pm)
+mc.menuItem( label="Lasso select motion", command="""
+import traceSelectTool as tst
+
+tst = reload(tst)
+traceSelect = tst.main(lasso=True)
+""", p=pm)
+mc.menuItem( label="Select motion inside selected cylinder", command="""
+import traceSelectTool as tst
+
+traceSelect = tst.selectMotionsInVolume()
+""", p=pm)
 
 ## Trace Move Tool ##
 if mc.shelfButton("moveTrace",q=True,exists=True):
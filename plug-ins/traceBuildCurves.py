@@ -0,0 +1,78 @@
+## Trace Build Curves (a scripted plugin)
+## An undoable command that makes the motion trace curves in one pass through the API
+## ACCAD, The Ohio State University
+## 2013
+
+#
+#	This plug-in registers one command in Maya:
+#		maya.cmds.traceBuildCurves()
+#
+#	It takes no arguments: the curves to make are handed over by
+#	buildMotionTraces.buildCurves (there can be thousands of CVs), which
+#	loads this plug-in and calls the command.  The command returns the
+#	long names of the new curve transforms, and deletes them on undo.
+#
+
+import maya.OpenMaya as OpenMaya
+import maya.OpenMayaMPx as OpenMayaMPx
+import sys
+
+kPluginCmdName="traceBuildCurves"
+
+# command
+class BuildCurvesCmd(OpenMayaMPx.MPxCommand):
+
+	def __init__(self):
+		OpenMayaMPx.MPxCommand.__init__(self)
+		self.__request = None	# (shapes, names, parent) of the curves to make
+		self.__xforms = []	# handles of the transforms that were made
+
+	def doIt(self, args):
+		import buildMotionTraces as bmt
+		self.__request = bmt.takeCurveRequest()
+		if self.__request is None:
+			raise RuntimeError("%s has nothing to build (call buildMotionTraces.buildCurves instead)" % kPluginCmdName)
+		self.redoIt()
+
+	def redoIt(self):
+		import buildMotionTraces as bmt
+		shapes, names, parent = self.__request
+		xforms = bmt.createCurves(shapes, names, parent)
+		self.__xforms = [OpenMaya.MObjectHandle(xform) for xform in xforms]
+		self.clearResult()
+		for xform in xforms:
+			self.appendToResult(OpenMaya.MFnDagNode(xform).fullPathName())
+
+	def undoIt(self):
+		# deleting the transforms deletes their curve shapes too
+		dagMod = OpenMaya.MDagModifier()
+		for handle in self.__xforms:
+			if handle.isValid():
+				dagMod.deleteNode(handle.object())
+		dagMod.doIt()
+		self.__xforms = []
+
+	def isUndoable(self):
+		return True
+
+def cmdCreator():
+	return OpenMayaMPx.asMPxPtr(BuildCurvesCmd())
+
+# Initialize the script plug-in
+
+def initializePlugin(mobject):
+	mplugin = OpenMayaMPx.MFnPlugin(mobject, "ACCAD", "1.0", "Any")
+	try:
+		mplugin.registerCommand(kPluginCmdName, cmdCreator)
+	except:
+		sys.stderr.write("Failed to register command: %s\n" % kPluginCmdName)
+		raise
+
+# Uninitialize the script plug-in
+def uninitializePlugin(mobject):
+	mplugin = OpenMayaMPx.MFnPlugin(mobject)
+	try:
+		mplugin.deregisterCommand(kPluginCmdName)
+	except:
+		sys.stderr.write("Failed to deregister command: %s\n" % kPluginCmdName)
+		raise
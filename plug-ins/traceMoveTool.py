@@ -1,5 +1,5 @@
 ## Trace Move Tool (a scripted plugin)
-## (this is a modification of the moveTool.py provided by Autodesk -- see lines 179 to 196 for the changes I made)
+## (this is a modification of the moveTool.py provided by Autodesk -- see the BEGIN EDIT / END EDIT sections for the changes I made)
 ## J Eisenmann
 ## ACCAD, The Ohio State University
 ## 2013
@@ -75,6 +75,16 @@ import maya.OpenMayaMPx as OpenMayaMPx
 import maya.OpenMayaUI as OpenMayaUI
 import maya.cmds as mc
 import sys, math
+### BEGIN EDIT
+try:	# lets the trace select tool know which parts of the motion were edited
+	import ChangeTracker as ct
+except ImportError:
+	ct = None
+try:	# tells us which objects are trace selections (and what they selected)
+	import SelectionIndex as si
+except ImportError:
+	si = None
+### END EDIT
 
 kPluginCmdName="traceMoveToolCmd"
 kPluginCtxName="traceMoveToolContext"
@@ -93,6 +103,9 @@ class MoveToolCmd(OpenMayaMPx.MPxToolCommand):
 		OpenMayaMPx.MPxToolCommand.__init__(self)
 		self.setCommandString(kPluginCmdName)
 		self.__delta = OpenMaya.MVector()
+### BEGIN EDIT
+		self.__keys = {}	# hash code of a trace selection -> the keyframe flags of the keys it moves (looked up when the drag starts)
+### END EDIT
 		kTrackingDictionary[OpenMayaMPx.asHashable(self)] = self
 
 	def __del__(self):
@@ -177,20 +190,29 @@ class MoveToolCmd(OpenMayaMPx.MPxToolCommand):
 				pass
 			else:
 				try:
-### BEGIN EDIT                                        
-                                        # check to see if the selected object is a trace selection
-					if( "isTraceSelection" in mc.listAttr(transFn.name()) ):
-                                                # if so, move it
-                                                transFn.translateBy(vector, spc)
-                                                # change the associated translation keyframes accordingly
-                                                tracedObj = transFn.name().split("_selection")[0]
-                                                timeInterval = ("%d:%d"%(mc.getAttr( transFn.name()+".startFrame" ),mc.getAttr( transFn.name()+".endFrame" )),)
-                                                mc.select(tracedObj)
-                                                mc.keyframe(at="translateX",r=True,vc=vector.x,t=timeInterval)
-                                                mc.keyframe(at="translateY",r=True,vc=vector.y,t=timeInterval)
-                                                mc.keyframe(at="translateZ",r=True,vc=vector.z,t=timeInterval)
-                                                mc.select(transFn.name())
-				except:
+### BEGIN EDIT
+					# check to see if the selected object is a trace selection (one lookup in the shared index)
+					record = si and si.index.Lookup( mdagPath.node() )
+					if record:
+						# if so, move it
+						transFn.translateBy(vector, spc)
+						# change the associated translation keyframes accordingly
+						tracedObj = record.object
+						# look up the keys in the selected frame range when the drag starts (keys may have been
+						# added or deleted since the selection was made), then keep moving (and undoing) those keys
+						selection = OpenMaya.MObjectHandle( mdagPath.node() ).hashCode()
+						if not selection in self.__keys:
+							self.__keys[selection] = record.ResolveKeys()
+						keys = self.__keys[selection]
+						mc.keyframe(tracedObj,at="translateX",r=True,vc=vector.x,**keys["translateX"])
+						mc.keyframe(tracedObj,at="translateY",r=True,vc=vector.y,**keys["translateY"])
+						mc.keyframe(tracedObj,at="translateZ",r=True,vc=vector.z,**keys["translateZ"])
+						if ct:
+							# record the frames whose motion changed (so the traces can be resampled),
+							# and the curves we changed (so their edit callbacks don't mark everything dirty)
+							start, end = affectedFrameRange( tracedObj, record.startFrame, record.endFrame )
+							ct.tracker.MarkEdited( tracedObj, start, end, ["translateX", "translateY", "translateZ"] )
+				except RuntimeError:	# (Maya commands and the API raise RuntimeError when they fail)
 					sys.stderr.write("Error doing translate on transform\n")
 				sIter.next()
 				continue
@@ -198,6 +220,22 @@ class MoveToolCmd(OpenMayaMPx.MPxToolCommand):
 			sIter.next()
 
 
+### BEGIN EDIT
+def affectedFrameRange(obj, start, end):
+	"""
+	Moving the keys between start and end also changes the motion
+	out to the neighbouring keys (or to the end of the timeline)
+	"""
+	prev = mc.findKeyframe(obj, time=(start,start), which="previous")
+	next = mc.findKeyframe(obj, time=(end,end), which="next")
+	if prev >= start:	# findKeyframe wraps around when there is no earlier key
+		prev = min(start, mc.playbackOptions(q=True, minTime=True))
+	if next <= end:		# ... or later key
+		next = max(end, mc.playbackOptions(q=True, maxTime=True))
+	return prev, next
+### END EDIT
+
+
 class MoveContext(OpenMayaMPx.MPxSelectionContext):
 	kTop, kFront, kSide, kPersp = 0, 1, 2, 3
 	
@@ -0,0 +1,62 @@
+## Arc Length Table
+## Maps between the U parameter and the arc length of a NURBS curve without querying Maya
+## ACCAD, The Ohio State University
+## 2013
+
+from bisect import bisect_right
+from math import sqrt
+from BSpline import *
+
+def interpolate( xs, ys, x ):
+    """ Piecewise linear lookup of y at x (xs sorted, x clamped to their range) """
+    if x <= xs[0]:
+        return ys[0]
+    if x >= xs[-1]:
+        return ys[-1]
+    i = bisect_right( xs, x )
+    x0, x1 = xs[i-1], xs[i]
+    if x1 == x0:
+        return ys[i]
+    return ys[i-1] + (ys[i]-ys[i-1])*(x-x0)/(x1-x0)
+
+class ArcLengthTable:
+    """ The arc length of a NURBS curve at many parameter values, measured
+        once from the curve's degree, knots and CVs.  Lookups in either
+        direction (u -> arc length, arc length -> u) are then a binary search
+        and a linear interpolation, instead of a round trip through an
+        arcLengthDimension node. """
+
+    def __init__( self, degree, knots, cvs, samplesPerSpan=16 ):
+        self.degree = degree
+        self.knots = list(knots)
+        self.cvs = [tuple(cv) for cv in cvs]
+        self.curve = BSpline( degree, knots, cvs )
+        self.minParam, self.maxParam = self.curve.Range()
+        # sample every span evenly (spans are the intervals between distinct knots)
+        breaks = sorted( set( [k for k in self.knots if self.minParam <= k <= self.maxParam] ) )
+        self.params = [ breaks[0] ]
+        for a, b in zip( breaks[:-1], breaks[1:] ):
+            self.params.extend( [ a+(b-a)*i/float(samplesPerSpan) for i in range(1, samplesPerSpan+1) ] )
+        self.points = self.curve.Points( self.params )
+        self.lengths = [ 0.0 ]
+        for p, q in zip( self.points[:-1], self.points[1:] ):
+            self.lengths.append( self.lengths[-1] + sqrt( (q[0]-p[0])**2 + (q[1]-p[1])**2 + (q[2]-p[2])**2 ) )
+        self.length = self.lengths[-1]
+
+    def ArcLen( self, u ):
+        """ Returns the arc length from the start of the curve to parameter u """
+        return interpolate( self.params, self.lengths, u )
+
+    def Param( self, distance ):
+        """ Returns the parameter at the given arc length along the curve """
+        return interpolate( self.lengths, self.params, distance )
+
+    def ParamAtPercent( self, percent ):
+        """ Returns the parameter at the given fraction (0 to 1) of the curve's length """
+        return self.Param( percent*self.length )
+
+    def ArcLens( self, params ):
+        return [ self.ArcLen( u ) for u in params ]
+
+    def Params( self, distances ):
+        return [ self.Param( s ) for s in distances ]
@@ -0,0 +1,198 @@
+## B-Spline
+## Evaluation and least squares fitting of NURBS curves in pure Python (no Maya needed)
+## ACCAD, The Ohio State University
+## 2013
+
+from bisect import bisect_right
+
+class BSpline:
+    """ A non-rational B-spline curve, described the way Maya describes one
+        (so mc.curve( d=c.degree, p=c.cvs, k=c.knots ) rebuilds it): the
+        knot vector has len(cvs)+degree-1 knots, without the extra knot at
+        each end.  Points, tangents and closest parameters are computed in
+        process, so curve geometry can be worked out off the DG and pushed
+        to Maya in one step. """
+
+    def __init__( self, degree, knots, cvs ):
+        self.degree = degree
+        self.knots = [ float(k) for k in knots ]
+        self.cvs = [ tuple(cv) for cv in cvs ]
+        self.K = [ self.knots[0] ] + self.knots + [ self.knots[-1] ]   # the full knot vector
+        self.derivative = None
+        self.samples = None
+
+    def Range( self ):
+        """ Returns the (min, max) parameter values of the curve """
+        return ( self.K[self.degree], self.K[len(self.cvs)] )
+
+    def Span( self, u ):
+        """ Returns the index of the knot span holding u """
+        return max( self.degree, min( bisect_right( self.K, u )-1, len(self.cvs)-1 ) )
+
+    def Basis( self, span, u ):
+        """ Returns the degree+1 basis functions that are non-zero at u (for CVs span-degree to span) """
+        K, p = self.K, self.degree
+        N = [1.0] + [0.0]*p
+        left = [0.0]*(p+1)
+        right = [0.0]*(p+1)
+        for j in range(1, p+1):
+            left[j] = u - K[span+1-j]
+            right[j] = K[span+j] - u
+            saved = 0.0
+            for r in range(j):
+                denom = right[r+1] + left[j-r]
+                temp = denom and N[r]/denom or 0.0
+                N[r] = saved + right[r+1]*temp
+                saved = left[j-r]*temp
+            N[j] = saved
+        return N
+
+    def Point( self, u ):
+        """ Returns the point on the curve at parameter u """
+        u = float(u)
+        span = self.Span( u )
+        N = self.Basis( span, u )
+        x = y = z = 0.0
+        for n, cv in zip( N, self.cvs[span-self.degree:span+1] ):
+            x += n*cv[0]
+            y += n*cv[1]
+            z += n*cv[2]
+        return (x, y, z)
+
+    def Points( self, params ):
+        return [ self.Point( u ) for u in params ]
+
+    def Derivative( self ):
+        """ Returns the first derivative of the curve (a BSpline of one degree less) """
+        if not self.derivative:
+            K, p = self.K, self.degree
+            cvs = []
+            for i in range(len(self.cvs)-1):
+                dk = K[i+p+1] - K[i+1]
+                s = dk and p/dk or 0.0
+                a, b = self.cvs[i], self.cvs[i+1]
+                cvs.append( ( s*(b[0]-a[0]), s*(b[1]-a[1]), s*(b[2]-a[2]) ) )
+            self.derivative = BSpline( p-1, K[2:-2], cvs )
+        return self.derivative
+
+    def Tangent( self, u ):
+        """ Returns the (unnormalized) tangent of the curve at parameter u """
+        if self.degree < 1:
+            return (0.0, 0.0, 0.0)
+        return self.Derivative().Point( u )
+
+    def Tangents( self, params ):
+        return [ self.Tangent( u ) for u in params ]
+
+    def ClosestParam( self, point, samplesPerSpan=8, iterations=24 ):
+        """ Returns the parameter of the point on the curve closest to the given point:
+            the nearest of a set of samples, refined with a golden section search """
+        if not self.samples:
+            lo, hi = self.Range()
+            n = max( 1, samplesPerSpan*(len(self.cvs)-self.degree) )
+            params = [ lo+(hi-lo)*i/float(n) for i in range(n+1) ]
+            self.samples = list( zip( params, self.Points( params ) ) )
+        def distSq( u ):
+            p = self.Point( u )
+            return (p[0]-point[0])**2 + (p[1]-point[1])**2 + (p[2]-point[2])**2
+        dists = [ (q[0]-point[0])**2 + (q[1]-point[1])**2 + (q[2]-point[2])**2 for u, q in self.samples ]
+        i = dists.index( min(dists) )
+        a = self.samples[ max(0, i-1) ][0]
+        b = self.samples[ min(len(self.samples)-1, i+1) ][0]
+        g = 0.6180339887498949
+        c, d = b-g*(b-a), a+g*(b-a)
+        fc, fd = distSq( c ), distSq( d )
+        for step in range(iterations):
+            if fc < fd:
+                b, d, fd = d, c, fc
+                c = b-g*(b-a)
+                fc = distSq( c )
+            else:
+                a, c, fc = c, d, fd
+                d = a+g*(b-a)
+                fd = distSq( d )
+        u = 0.5*(a+b)
+        # the ends of the curve can't be bracketed from outside, so check them too
+        return min( [ (distSq(v), v) for v in (u, self.samples[0][0], self.samples[-1][0]) ] )[1]
+
+    def ClosestParams( self, points ):
+        return [ self.ClosestParam( p ) for p in points ]
+
+def curvePoint( degree, knots, cvs, u ):
+    """ Evaluates a (Maya style) NURBS curve at parameter u """
+    return BSpline( degree, knots, cvs ).Point( u )
+
+def uniformKnots( spans, degree, lo, hi ):
+    """ Returns a Maya style, clamped knot vector with evenly spaced spans between lo and hi """
+    return [float(lo)]*(degree-1) + [ lo+(hi-lo)*i/float(spans) for i in range(spans+1) ] + [float(hi)]*(degree-1)
+
+def fit( points, spans, degree=3, params=None, paramRange=None ):
+    """ Least squares fit of a BSpline (with evenly spaced knots) to the points,
+        keeping the end points.  Each point is matched to the curve at its
+        parameter (evenly spaced over paramRange, which defaults to
+        (0, len(points)-1), like a rebuilt edit point curve, unless params
+        are given).  Fewer points than CVs lowers the span count, and fewer
+        than degree+1 points lowers the degree.  A single point gives a
+        degenerate (zero length) line that evaluates to the point. """
+    points = [ tuple(p) for p in points ]
+    n = len(points)
+    if not n:
+        raise ValueError( "can't fit a curve to no points" )
+    lo, hi = paramRange or (0.0, float(max(1, n-1)))
+    if hi <= lo:
+        if n > 1:
+            raise ValueError( "can't fit %d points over an empty parameter range (%s to %s)"%(n, lo, hi) )
+        hi = lo+1.0
+    if n == 1:
+        return BSpline( 1, [lo, hi], [ points[0], points[0] ] )
+    if not params:
+        params = [ lo+(hi-lo)*k/float(n-1) for k in range(n) ]
+    if n < degree+1:
+        degree = max( 1, n-1 )      # (a curve of that degree needs at least degree+1 points)
+    spans = max( 1, min( int(spans), n-degree ) )
+    curve = BSpline( degree, uniformKnots( spans, degree, lo, hi ), [ points[0] ]*(spans+degree) )
+    m = len(curve.cvs)
+    if m <= 2:
+        curve.cvs = [ points[0], points[-1] ]
+        return curve
+    # normal equations for the interior CVs (the end CVs are the end points), in band storage
+    p = degree
+    first, last = points[0], points[-1]
+    A = [ [0.0]*(2*p+1) for i in range(m) ]
+    rhs = [ [0.0, 0.0, 0.0] for i in range(m) ]
+    for q, u in zip( points[1:-1], params[1:-1] ):
+        span = curve.Span( u )
+        N = curve.Basis( span, u )
+        idx = range( span-p, span+1 )
+        # remove the contribution of the (fixed) end CVs
+        r = list( q )
+        for ni, i in zip( N, idx ):
+            if i == 0 or i == m-1:
+                e = i == 0 and first or last
+                r = [ r[0]-ni*e[0], r[1]-ni*e[1], r[2]-ni*e[2] ]
+        for ni, i in zip( N, idx ):
+            if i == 0 or i == m-1:
+                continue
+            rhs[i] = [ rhs[i][0]+ni*r[0], rhs[i][1]+ni*r[1], rhs[i][2]+ni*r[2] ]
+            for nj, j in zip( N, idx ):
+                if j != 0 and j != m-1:
+                    A[i][j-i+p] += ni*nj
+    # solve the (symmetric, banded) system for CVs 1 to m-2 by Gaussian elimination within the band
+    for k in range(1, m-1):
+        piv = A[k][p] or 1e-12
+        for i in range(k+1, min(k+p+1, m-1)):
+            f = A[i][k-i+p]/piv
+            if not f:
+                continue
+            for j in range(k, min(k+p+1, m-1)):
+                A[i][j-i+p] -= f*A[k][j-k+p]
+            rhs[i] = [ rhs[i][0]-f*rhs[k][0], rhs[i][1]-f*rhs[k][1], rhs[i][2]-f*rhs[k][2] ]
+    cvs = [ first ] + [ None ]*(m-2) + [ last ]
+    for k in range(m-2, 0, -1):
+        x = list( rhs[k] )
+        for j in range(k+1, min(k+p+1, m-1)):
+            x = [ x[0]-A[k][j-k+p]*cvs[j][0], x[1]-A[k][j-k+p]*cvs[j][1], x[2]-A[k][j-k+p]*cvs[j][2] ]
+        piv = A[k][p] or 1e-12
+        cvs[k] = ( x[0]/piv, x[1]/piv, x[2]/piv )
+    curve.cvs = cvs
+    return curve
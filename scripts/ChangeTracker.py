@@ -0,0 +1,95 @@
+## Change Tracker
+## Records which objects (and frame ranges) were edited since the motion was last sampled
+## ACCAD, The Ohio State University
+## 2013
+
+try:
+    import maya.cmds as mc
+    import maya.OpenMaya as OpenMaya
+    import maya.OpenMayaAnim as OpenMayaAnim
+except ImportError:     # running headless (outside of Maya)
+    mc = None
+
+class ChangeTracker:
+    """ Both trace tools share one tracker (see "tracker" below).  Editors
+        report what they changed with MarkDirty, and the trace selection
+        tool pops the accumulated changes and resamples only those frames.
+        A range of None means "the whole timeline".  Edits made with other
+        tools are caught by an anim curve callback, which can only mark the
+        whole timeline dirty. """
+
+    def __init__( self ):
+        self.dirty = {}         # obj -> list of [start, end] ranges (merged), or None for everything
+        self.expected = {}      # anim curve -> its keys after an edit that was reported with MarkEdited
+        self.callbackId = None
+
+    def MarkDirty( self, obj, start=None, end=None ):
+        """ Records that obj changed between start and end (inclusive) """
+        if start is None or end is None:
+            self.dirty[obj] = None
+            return
+        if obj in self.dirty and self.dirty[obj] is None:
+            return      # already dirty everywhere
+        ranges = self.dirty.setdefault( obj, [] )
+        ranges.append( [min(start,end), max(start,end)] )
+        # merge overlapping ranges
+        ranges.sort()
+        merged = [ ranges[0] ]
+        for s, e in ranges[1:]:
+            if s <= merged[-1][1]+1:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append( [s, e] )
+        self.dirty[obj] = merged
+
+    def MarkEdited( self, obj, start, end, attributes ):
+        """ Records an editor's own edit of obj's anim curves (for the given
+            attributes) between start and end.  The callbacks for these edits
+            (whenever they fire) are ignored for as long as the curves still
+            hold the keys the edit left them with. """
+        self.MarkDirty( obj, start, end )
+        for curve in set( mc.keyframe( obj, attribute=attributes, query=True, name=True ) or [] ):
+            self.expected[curve] = self.Keys( curve )
+
+    def Keys( self, curve ):
+        """ Returns the times and values of a curve's keys """
+        return mc.keyframe( curve, query=True, timeChange=True, valueChange=True )
+
+    def IsDirty( self ):
+        return len(self.dirty) > 0
+
+    def Pop( self ):
+        """ Returns (and forgets) everything that changed since the last Pop """
+        dirty = self.dirty
+        self.dirty = {}
+        return dirty
+
+    def Forget( self ):
+        """ Drops everything (e.g. when the scene is cleared) """
+        self.dirty = {}
+        self.expected = {}
+
+    def AnimCurveEdited( self, editedCurves, clientData=None ):
+        """ Callback: marks the objects driven by the edited anim curves as dirty
+            (skipping the curves whose edits were already reported with MarkEdited) """
+        for i in range(editedCurves.length()):
+            curve = OpenMaya.MFnDependencyNode( editedCurves[i] ).name()
+            if curve in self.expected:
+                if self.Keys( curve ) == self.expected[curve]:
+                    continue
+                del self.expected[curve]    # (edited since, by something else)
+            for obj in set( mc.listConnections( curve, source=False, destination=True ) or [] ):
+                self.MarkDirty( obj )
+
+    def WatchAnimCurves( self ):
+        """ Starts listening for anim curve edits (made by any tool) """
+        if self.callbackId is None:
+            self.callbackId = OpenMayaAnim.MAnimMessage.addAnimCurveEditedCallback( self.AnimCurveEdited )
+
+    def StopWatching( self ):
+        if self.callbackId is not None:
+            OpenMaya.MMessage.removeCallback( self.callbackId )
+            self.callbackId = None
+
+# the tracker shared by the trace select tool and the trace move tool
+tracker = ChangeTracker()
@@ -0,0 +1,44 @@
+## Gesture Context
+## Everything about the view that stays put for the length of one trace gesture
+## ACCAD, The Ohio State University
+## 2013
+
+try:
+    import maya.cmds as mc
+except ImportError:     # running headless (outside of Maya)
+    mc = None
+from Vector import *
+from Plane import *
+
+class GestureContext:
+    """ Made once when a gesture starts (on press), so that each drag event
+        only has to intersect the mouse ray with the plane and update the
+        matcher -- no camera, dragger or Maya queries.  Holds the camera (its
+        position and matrix), the plane the gesture is drawn on, the
+        modifier key that was held on press and the last point recorded. """
+
+    def __init__( self, dragger, plane=None ):
+        self.dragger = dragger
+        self.camera = mc.lookThru(q=True)
+        self.cameraMatrix = mc.xform(self.camera, q=True, m=True)
+        self.cameraPosition = Vector(mc.xform(self.camera, q=True, t=True))
+        self.viewAxis = Vector(self.cameraMatrix[8:11])     # the Z-axis of the camera
+        self.modifier = mc.draggerContext(dragger, query=True, modifier=True)
+        self.plane = plane
+        self.lastPoint = None
+
+    def SetPlane( self, normal, point ):
+        """ Sets the plane the gesture is drawn on """
+        self.plane = Plane( normal, point )
+
+    def Held( self, modifier ):
+        """ Was the given modifier key ("shift", "ctrl", ...) held when the gesture started? """
+        return self.modifier == modifier
+
+    def Project( self, screenPoint ):
+        """ Returns where the ray from the camera through a (world space) dragger point meets the gesture plane """
+        return self.plane.intersectWithRay( self.cameraPosition, screenPoint )
+
+    def DragPosition( self ):
+        """ Returns the current drag point, projected onto the gesture plane """
+        return self.Project( mc.draggerContext(self.dragger, query=True, dragPoint=True) )
@@ -0,0 +1,76 @@
+## Gesture Solver
+## Decides how much matching and redrawing each drag event gets, so fast strokes don't lag the cursor
+## ACCAD, The Ohio State University
+## 2013
+
+import time
+
+class GestureSolver:
+    """ The solver policy for a trace gesture.  Drag events add their points
+        to the trace without solving (they are coalesced), and the DTWs are
+        re-solved for the newest state only when a solve fits in the time
+        budget of a drag event -- a solve that overruns the budget makes the
+        following events skip solving for as long as it took, so the queued
+        events drain.  Viewport refreshes and time scrubs are held to
+        refreshRate per second.  Finish always does a full, exact solve of
+        whatever is still pending (call it on release). """
+
+    def __init__( self, budget=0.015, refreshRate=30.0, clock=time.time ):
+        self.budget = budget                    # seconds of solving allowed per drag event
+        self.refreshInterval = 1.0/refreshRate  # seconds between viewport refreshes (and time scrubs)
+        self.clock = clock
+        self.Start()
+
+    def Start( self ):
+        """ Resets the policy for a new gesture """
+        self.pending = 0            # points added since the last solve
+        self.cost = 0.0             # how long the last solve took
+        self.lastSolve = None       # when the last solve finished
+        self.lastRefresh = None     # when the viewport was last refreshed
+        self.unshown = False        # has there been a solve since the last refresh?
+
+    def Add( self, trajectory, point ):
+        """ Adds a point to the trajectory, leaving the solve for later """
+        trajectory.AddPoint( point, solve=False )
+        self.pending += 1
+
+    def Due( self ):
+        """ Is there anything to solve, and does solving now fit the budget? """
+        if not self.pending:
+            return False
+        if self.cost <= self.budget or self.lastSolve is None:
+            return True
+        return self.clock() - self.lastSolve >= self.cost
+
+    def Solve( self, trajectory, force=False ):
+        """ Re-solves the trajectory's DTWs for all pending points at once, if due
+            (or forced).  Returns True if it solved. """
+        if not self.pending or not ( force or self.Due() ):
+            return False
+        start = self.clock()
+        trajectory.UpdateDTWs()
+        self.lastSolve = self.clock()
+        self.cost = self.lastSolve - start
+        self.pending = 0
+        self.unshown = True
+        return True
+
+    def Finish( self, trajectory ):
+        """ Solves whatever is still pending, regardless of the budget """
+        return self.Solve( trajectory, force=True )
+
+    def RefreshDue( self ):
+        """ Returns True (and starts a new refresh interval) if it's time to
+            refresh the viewport or scrub the time slider """
+        now = self.clock()
+        if self.lastRefresh is not None and now - self.lastRefresh < self.refreshInterval:
+            return False
+        self.lastRefresh = now
+        return True
+
+    def SolutionDue( self ):
+        """ Returns True if there's a solve that hasn't been shown yet and it's time to refresh """
+        if not self.unshown or not self.RefreshDue():
+            return False
+        self.unshown = False
+        return True
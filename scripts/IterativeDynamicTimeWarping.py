@@ -5,6 +5,7 @@
 
 from math import sqrt
 from Vector import *
+from Profiler import *
 
 class DTW:
     def __init__( self, X, Y, subsequence=False, penalty=[0,5], maxPathLength=99999.0 ):
@@ -67,6 +68,7 @@ class DTW:
             start = len(self.D)-1
             for row in range( len(self.C) - len(self.D) ):
                 self.D.append( [ 0 for x in range(len(self.C[0])) ] )
+        profiler.Count( "dtw cells", (len(self.C)-start)*len(self.C[0]) )
         for n in range( start, len(self.C) ):
             for m in range( len(self.C[0]) ):
                 if n == 0:
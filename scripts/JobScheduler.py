@@ -0,0 +1,161 @@
+## Job Scheduler
+## Runs pure Python work (fitting, matching, loading) off Maya's UI thread, and hands the results back to it
+## ACCAD, The Ohio State University
+## 2013
+
+import threading, heapq, itertools, sys
+
+class Job:
+    """ A unit of pure Python work: fn(*args) runs on a worker thread, so it
+        must not call maya.cmds.  onDone(result) (and onError(exc_info) if
+        the job raises) run on the main thread, through the scheduler's pump,
+        so they may.  Lower priority numbers run first.  A job with a key
+        replaces any job with the same key that hasn't finished yet. """
+
+    PENDING, RUNNING, DONE, FAILED, CANCELLED = range(5)
+
+    def __init__( self, fn, args=(), onDone=None, onError=None, priority=0, key=None ):
+        self.fn = fn
+        self.args = args
+        self.onDone = onDone
+        self.onError = onError
+        self.priority = priority
+        self.key = key
+        self.state = Job.PENDING
+        self.result = None
+        self.error = None
+
+    def Cancel( self ):
+        """ Stops the job from running (if it hasn't started) and from delivering its result (if it has) """
+        if self.state in (Job.PENDING, Job.RUNNING):
+            self.state = Job.CANCELLED
+
+    def Cancelled( self ):
+        return self.state == Job.CANCELLED
+
+class MayaPump:
+    """ Runs callbacks on Maya's main thread (when it is next idle) """
+    def Post( self, fn ):
+        import maya.utils
+        maya.utils.executeDeferred( fn )
+
+class FakePump:
+    """ Queues callbacks until Run is called, standing in for Maya's main
+        thread so the scheduler can be used (and tested) headless """
+    def __init__( self ):
+        self.lock = threading.Lock()
+        self.queue = []
+
+    def Post( self, fn ):
+        with self.lock:
+            self.queue.append( fn )
+
+    def Run( self ):
+        """ Runs the queued callbacks (on the calling thread), returns how many ran """
+        with self.lock:
+            queue, self.queue = self.queue, []
+        for fn in queue:
+            fn()
+        return len(queue)
+
+class JobScheduler:
+    """ A priority queue of Jobs served by a few worker threads.  Results go
+        back to the main thread through the pump (MayaPump by default).
+        (Threads rather than processes: inside Maya, child processes would be
+        new Maya sessions, and the jobs share the samples in memory.) """
+
+    def __init__( self, workers=2, pump=None ):
+        self.pump = pump or MayaPump()
+        self.numWorkers = workers
+        self.workers = []
+        self.heap = []
+        self.keyed = {}             # key -> the latest job with that key
+        self.order = itertools.count()
+        self.cv = threading.Condition()
+        self.running = True
+
+    def Submit( self, fn, args=(), onDone=None, onError=None, priority=0, key=None ):
+        """ Queues fn(*args) to run on a worker thread, returns its Job """
+        job = Job( fn, args, onDone, onError, priority, key )
+        with self.cv:
+            if not self.running:
+                raise RuntimeError( "the job scheduler has been shut down" )
+            if key is not None:
+                if key in self.keyed:
+                    self.keyed[key].Cancel()
+                self.keyed[key] = job
+            heapq.heappush( self.heap, (priority, next(self.order), job) )
+            if len(self.workers) < self.numWorkers:
+                self.StartWorker()
+            self.cv.notify()
+        return job
+
+    def Cancel( self, key=None ):
+        """ Cancels the unfinished job with the given key (or every unfinished job) """
+        with self.cv:
+            if key is None:
+                for priority, n, job in self.heap:
+                    job.Cancel()
+                for job in self.keyed.values():
+                    job.Cancel()
+                del self.heap[:]
+                self.keyed.clear()
+            elif key in self.keyed:
+                self.keyed.pop( key ).Cancel()
+
+    def Shutdown( self ):
+        """ Cancels everything and stops the workers (once they finish their current jobs) """
+        self.Cancel()
+        with self.cv:
+            self.running = False
+            self.cv.notify_all()
+
+    def Pending( self ):
+        """ Returns how many jobs are waiting to run """
+        with self.cv:
+            return len([ 1 for priority, n, job in self.heap if not job.Cancelled() ])
+
+    def StartWorker( self ):
+        worker = threading.Thread( target=self.Work, name="JobScheduler worker %d"%len(self.workers) )
+        worker.daemon = True
+        self.workers.append( worker )
+        worker.start()
+
+    def Work( self ):
+        """ The worker loop: runs the highest priority job, posts its result to the main thread """
+        while True:
+            with self.cv:
+                while self.running and not self.heap:
+                    self.cv.wait()
+                if not self.running:
+                    return
+                priority, n, job = heapq.heappop( self.heap )
+                if job.Cancelled():
+                    continue
+                job.state = Job.RUNNING
+            try:
+                job.result = job.fn( *job.args )
+                done = True
+            except Exception:
+                job.error = sys.exc_info()
+                done = False
+            self.pump.Post( lambda job=job, done=done: self.Deliver( job, done ) )
+
+    def Deliver( self, job, done ):
+        """ Main thread: hands a finished job's result (or error) to its callbacks, unless it was cancelled """
+        with self.cv:
+            if job.Cancelled():
+                return
+            if done:
+                job.state = Job.DONE
+            else:
+                job.state = Job.FAILED
+            if job.key is not None and self.keyed.get( job.key ) is job:
+                del self.keyed[ job.key ]
+        if done:
+            if job.onDone:
+                job.onDone( job.result )
+        elif job.onError:
+            job.onError( job.error )
+        else:
+            sys.stderr.write( "Error in background job %s: %s\n"%( job.key or job.fn.__name__, job.error[1] ) )
@@ -0,0 +1,66 @@
+## Kinematics
+## Velocity, speed, acceleration, curvature and arc length of a sampled trajectory
+## ACCAD, The Ohio State University
+## 2013
+
+from math import sqrt
+
+class Kinematics:
+    """ Derives the kinematic channels of a sampled trajectory in one pass
+        (finite differences that allow unevenly spaced samples), so the
+        tools can read them instead of re-querying the scene.  Each channel
+        is a list aligned with times:
+            velocity, acceleration  -- (x,y,z) tuples, per unit of time
+            speed, curvature        -- floats (curvature is 1/radius)
+            arcLength               -- distance travelled since the first sample """
+
+    def __init__( self, times, points ):
+        self.times = [ float(t) for t in times ]
+        self.points = [ (p[0], p[1], p[2]) for p in points ]
+        n = len(self.points)
+        self.velocity = [ (0.0, 0.0, 0.0) ]*n
+        self.acceleration = [ (0.0, 0.0, 0.0) ]*n
+        self.speed = [ 0.0 ]*n
+        self.curvature = [ 0.0 ]*n
+        self.arcLength = [ 0.0 ]*n
+        if n < 2:
+            return
+        T, P = self.times, self.points
+        # differences between neighboring samples
+        steps = [ ( P[i+1][0]-P[i][0], P[i+1][1]-P[i][1], P[i+1][2]-P[i][2] ) for i in range(n-1) ]
+        dts = [ (T[i+1]-T[i]) or 1e-9 for i in range(n-1) ]
+        slopes = [ (d[0]/dt, d[1]/dt, d[2]/dt) for d, dt in zip( steps, dts ) ]
+        for i in range(n):
+            if i == 0:
+                v = slopes[0]
+            elif i == n-1:
+                v = slopes[-1]
+            else:   # weight the neighboring slopes by the other interval (exact for quadratic motion)
+                h0, h1 = dts[i-1], dts[i]
+                v = tuple( [ (h1*a + h0*b)/(h0+h1) for a, b in zip( slopes[i-1], slopes[i] ) ] )
+            self.velocity[i] = v
+            self.speed[i] = sqrt( v[0]*v[0] + v[1]*v[1] + v[2]*v[2] )
+            if i > 0:
+                d = steps[i-1]
+                self.arcLength[i] = self.arcLength[i-1] + sqrt( d[0]*d[0] + d[1]*d[1] + d[2]*d[2] )
+        if n > 2:
+            for i in range(1, n-1):
+                h = dts[i-1] + dts[i]
+                self.acceleration[i] = tuple( [ 2.0*(b-a)/h for a, b in zip( slopes[i-1], slopes[i] ) ] )
+            self.acceleration[0] = self.acceleration[1]
+            self.acceleration[-1] = self.acceleration[-2]
+        for i in range(n):
+            v, a, s = self.velocity[i], self.acceleration[i], self.speed[i]
+            if s > 1e-9:
+                c = ( v[1]*a[2]-v[2]*a[1], v[2]*a[0]-v[0]*a[2], v[0]*a[1]-v[1]*a[0] )
+                self.curvature[i] = sqrt( c[0]*c[0] + c[1]*c[1] + c[2]*c[2] )/(s*s*s)
+
+    def SpeedRange( self ):
+        """ Returns the (min, max) speed """
+        if not self.speed:
+            return (0.0, 0.0)
+        return ( min(self.speed), max(self.speed) )
+
+    def Length( self ):
+        """ Returns the total distance travelled """
+        return self.arcLength and self.arcLength[-1] or 0.0
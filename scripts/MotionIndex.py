@@ -0,0 +1,354 @@
+## A spatial index over the motion trajectories of every rig in the scene
+## ACCAD, The Ohio State University
+## 2013
+
+from math import floor
+from Vector import *
+from Plane import *
+from Cylinder import *
+
+class MotionIndex:
+    """ Flattens every sample of every trajectory in every root's searchList
+        into parallel arrays, projects them (once) onto the interaction plane
+        and buckets them in a uniform 2D grid.  The world space samples are
+        also bucketed in uniform 3D voxels (for volume queries, which the
+        view doesn't change).  Bulk queries (lasso, volume) only test the
+        samples of the cells (or voxels) that straddle the query region's
+        edge: the ones entirely inside it are accepted wholesale.  Nearest (hit testing a click) searches outward
+        from the click's cell, one ring of cells at a time, so it doesn't slow
+        down as rigs are added. """
+
+    def __init__( self, traces, plane, camPos=None, cellSize=None ):
+        """ traces is a dict of Trajectory objects (indexed by root), whose
+            searchLists hold the joint trajectories.  If camPos is given the
+            samples are projected through the camera (perspective), otherwise
+            they are projected orthographically onto the plane """
+        self.view = None        # an optional stamp that owners can use to decide when to rebuild
+
+        self.paths = []         # (root, joint) for each trajectory
+        self.first = []         # index of the first sample of each trajectory in the flat arrays
+        self.pathOf = []        # per sample: index into self.paths
+        self.times = []         # per sample: time (key in the trajectory's points dict)
+        self.xyz = []           # per sample: world space position (tuple)
+        self.uv = []            # per sample: position on the interaction plane (tuple)
+
+        for root in sorted(traces.keys()):
+            searchList = traces[root].searchList
+            for joint in sorted(searchList.keys()):
+                points = searchList[joint].points
+                self.first.append( len(self.times) )
+                pathIndex = len(self.paths)
+                self.paths.append( (root, joint) )
+                for t in sorted(points.keys()):
+                    p = points[t]
+                    self.pathOf.append( pathIndex )
+                    self.times.append( t )
+                    self.xyz.append( (p[0], p[1], p[2]) )
+        self.first.append( len(self.times) )
+        self.voxelSize = self.AutoVoxelSize()
+        self.voxels = {}        # (i,j,k) -> list of sample indices
+        for s, (x, y, z) in enumerate(self.xyz):
+            self.voxels.setdefault( self.Voxel(x, y, z), [] ).append( s )
+        self.Reproject( plane, camPos, cellSize )
+
+    def Reproject( self, plane, camPos=None, cellSize=None ):
+        """ Projects the samples onto a (new) interaction plane, as seen from a
+            (new) camera position, and buckets them again.  The flattened
+            samples are reused, so the trajectories aren't walked again. """
+        self.plane = plane
+        self.camPos = camPos
+        self.u, self.v = plane.basis()
+        self.uv = [ self.Project( p ) for p in self.xyz ]
+        self.cellSize = cellSize or self.AutoCellSize()
+        self.grid = {}          # (i,j) -> list of sample indices
+        for s, (a, b) in enumerate(self.uv):
+            self.grid.setdefault( self.Cell(a, b), [] ).append( s )
+        self.GridChanged()
+
+    def GridChanged( self ):
+        """ Drops everything worked out from the grid (it's worked out again on demand) """
+        self.cellRange = CellRange( self.grid )
+        self.grids = { None: (self.grid, self.cellRange) }     # filter (root, joint) -> (grid, cell range)
+
+    def Update( self, root, trajectory ):
+        """ Moves the samples of one root (e.g. after its motion was edited) to
+            their new positions, in place.  Returns False (changing nothing) if
+            the root's joints or sample times changed, so the index has to be
+            rebuilt instead. """
+        searchList = trajectory.searchList
+        paths = [ p for p in range(len(self.paths)) if self.paths[p][0] == root ]
+        if not paths or [ self.paths[p][1] for p in paths ] != sorted(searchList.keys()):
+            return False
+        for p in paths:
+            if sorted(searchList[ self.paths[p][1] ].points.keys()) != self.times[ self.first[p]:self.first[p+1] ]:
+                return False
+        for p in paths:
+            points = searchList[ self.paths[p][1] ].points
+            for s in range( self.first[p], self.first[p+1] ):
+                pt = points[ self.times[s] ]
+                oldVoxel = self.Voxel( self.xyz[s][0], self.xyz[s][1], self.xyz[s][2] )
+                self.xyz[s] = ( pt[0], pt[1], pt[2] )
+                voxel = self.Voxel( pt[0], pt[1], pt[2] )
+                if voxel != oldVoxel:
+                    self.voxels[oldVoxel].remove( s )
+                    if not self.voxels[oldVoxel]:
+                        del self.voxels[oldVoxel]
+                    self.voxels.setdefault( voxel, [] ).append( s )
+                oldCell = self.Cell( self.uv[s][0], self.uv[s][1] )
+                self.uv[s] = self.Project( pt )
+                cell = self.Cell( self.uv[s][0], self.uv[s][1] )
+                if cell != oldCell:
+                    self.grid[oldCell].remove( s )
+                    if not self.grid[oldCell]:
+                        del self.grid[oldCell]
+                    self.grid.setdefault( cell, [] ).append( s )
+        self.GridChanged()
+        return True
+
+    def Project( self, p ):
+        """ returns the (u,v) plane coordinates of a world space point """
+        n = self.plane.normal
+        o = self.plane.point
+        px, py, pz = p[0], p[1], p[2]
+        if self.camPos:
+            cx, cy, cz = self.camPos[0], self.camPos[1], self.camPos[2]
+            dx, dy, dz = px-cx, py-cy, pz-cz
+            denom = dx*n[0] + dy*n[1] + dz*n[2]
+            if denom != 0:
+                d = ((o[0]-cx)*n[0] + (o[1]-cy)*n[1] + (o[2]-cz)*n[2]) / denom
+                px, py, pz = cx+dx*d, cy+dy*d, cz+dz*d
+        rx, ry, rz = px-o[0], py-o[1], pz-o[2]
+        u, v = self.u, self.v
+        return ( rx*u[0] + ry*u[1] + rz*u[2], rx*v[0] + ry*v[1] + rz*v[2] )
+
+    def AutoCellSize( self ):
+        """ picks a cell size that puts a few dozen samples in an average occupied cell """
+        if not self.uv:
+            return 1.0
+        us = [a for a,b in self.uv]
+        vs = [b for a,b in self.uv]
+        area = max( (max(us)-min(us))*(max(vs)-min(vs)), 1e-6 )
+        return max( (area*32.0/len(self.uv))**0.5, 1e-3 )
+
+    def AutoVoxelSize( self ):
+        """ picks a voxel size that puts a few dozen samples in an average occupied voxel
+            (the samples' bounding box is padded to at least one voxel along each axis,
+            so flat or thin motions don't end up with tiny voxels) """
+        if not self.xyz:
+            return 1.0
+        extent = [ max([p[k] for p in self.xyz]) - min([p[k] for p in self.xyz]) for k in range(3) ]
+        size = max( max(extent), 1e-3 )
+        for i in range(4):      # (settles in a few steps)
+            volume = max(extent[0], size) * max(extent[1], size) * max(extent[2], size)
+            size = max( (volume*32.0/len(self.xyz))**(1/3.0), 1e-3 )
+        return size
+
+    def Voxel( self, x, y, z ):
+        """ returns the voxel containing world space point (x,y,z) """
+        size = self.voxelSize
+        return ( int(floor(x/size)), int(floor(y/size)), int(floor(z/size)) )
+
+    def Cell( self, a, b ):
+        """ returns the grid cell containing plane coordinates (a,b) """
+        return ( int(floor(a/self.cellSize)), int(floor(b/self.cellSize)) )
+
+    def CellsInBox( self, lo, hi ):
+        """ yields the occupied cells that overlap the 2D box [lo,hi] """
+        i0, j0 = self.Cell( lo[0], lo[1] )
+        i1, j1 = self.Cell( hi[0], hi[1] )
+        if (i1-i0+1)*(j1-j0+1) > len(self.grid):     # the box is bigger than the occupied area
+            for cell in self.grid.keys():
+                if i0 <= cell[0] <= i1 and j0 <= cell[1] <= j1:
+                    yield cell
+        else:
+            for i in range(i0, i1+1):
+                for j in range(j0, j1+1):
+                    if (i,j) in self.grid:
+                        yield (i,j)
+
+    def Lasso( self, lassoPoints ):
+        """ Returns the time ranges (per root, per joint) of every sample that
+            falls inside the lasso.  lassoPoints are world space points on the
+            interaction plane (e.g. mouse positions intersected with it) """
+        poly = [ self.Project( p ) for p in lassoPoints ]
+        if len(poly) < 3:
+            return {}
+        lo = ( min([a for a,b in poly]), min([b for a,b in poly]) )
+        hi = ( max([a for a,b in poly]), max([b for a,b in poly]) )
+        # mark the cells crossed by the lasso outline -- only those need per-sample tests
+        border = set()
+        for k in range(len(poly)):
+            p, q = poly[k-1], poly[k]
+            i0, j0 = self.Cell( min(p[0],q[0]), min(p[1],q[1]) )
+            i1, j1 = self.Cell( max(p[0],q[0]), max(p[1],q[1]) )
+            for i in range(i0, i1+1):
+                for j in range(j0, j1+1):
+                    if (i,j) in self.grid and self.SegmentHitsCell( p, q, i, j ):
+                        border.add( (i,j) )
+        hits = []
+        for cell in self.CellsInBox( lo, hi ):
+            if cell in border:
+                uv = self.uv
+                hits.extend( [ s for s in self.grid[cell] if PointInPolygon( uv[s], poly ) ] )
+            elif PointInPolygon( ((cell[0]+0.5)*self.cellSize, (cell[1]+0.5)*self.cellSize), poly ):
+                hits.extend( self.grid[cell] )      # the whole cell is inside the lasso
+        return self.Ranges( hits )
+
+    def Nearest( self, point, root=None, joint=None ):
+        """ Returns (root, joint, time, distance) of the sample nearest to the
+            given world space point, as seen on the interaction plane (or
+            None if there are no samples).  Pass root (and joint) to only
+            consider the trajectories of one root (or joint). """
+        grid, cellRange = self.Grid( root, joint )
+        if not grid:
+            return None
+        a, b = self.Project( point )
+        ci, cj = self.Cell( a, b )
+        imin, jmin, imax, jmax = cellRange
+        # rings nearer than the grid's bounds are empty, and rings past its far corner are never needed
+        ring = max( imin-ci, ci-imax, jmin-cj, cj-jmax, 0 )
+        maxRing = max( ci-imin, imax-ci, cj-jmin, jmax-cj )
+        uv, size = self.uv, self.cellSize
+        best, bestDistSq = None, float("inf")
+        # search rings of cells around the point's cell, until no closer sample can be in the next ring
+        while ring <= maxRing and ( best is None or ((ring-1)*size)**2 < bestDistSq ):
+            if 8*ring > len(grid):
+                # the rings are bigger than the occupied area -- finish with one pass over the cells left
+                cells = [ c for c in grid if max( abs(c[0]-ci), abs(c[1]-cj) ) >= ring ]
+                ring = maxRing
+            else:
+                cells = [ c for c in self.RingCells( ci, cj, ring, cellRange ) if c in grid ]
+            for cell in cells:
+                for s in grid[cell]:
+                    du, dv = uv[s][0]-a, uv[s][1]-b
+                    d = du*du + dv*dv
+                    if d < bestDistSq:
+                        best, bestDistSq = s, d
+            ring += 1
+        if best is None:
+            return None
+        r, jt = self.paths[ self.pathOf[best] ]
+        return ( r, jt, self.times[best], bestDistSq**0.5 )
+
+    def Grid( self, root=None, joint=None ):
+        """ Returns the grid (and its cell range) of the samples of one root
+            (or one of its joints), or of every sample if root is None.  The
+            filtered grids are built the first time they are asked for, so a
+            filtered search starts next to its own samples. """
+        key = root is not None and (root, joint) or None
+        if not key in self.grids:
+            grid = {}
+            for p, (r, jt) in enumerate(self.paths):
+                if r == root and (joint is None or jt == joint):
+                    for s in range( self.first[p], self.first[p+1] ):
+                        grid.setdefault( self.Cell( self.uv[s][0], self.uv[s][1] ), [] ).append( s )
+            self.grids[key] = ( grid, CellRange( grid ) )
+        return self.grids[key]
+
+    def RingCells( self, ci, cj, ring, cellRange ):
+        """ yields the cells on the edge of the square ring around cell
+            (ci,cj), clipped to the given cell range """
+        imin, jmin, imax, jmax = cellRange
+        if ring == 0:
+            yield (ci, cj)
+            return
+        i0, i1 = max( ci-ring, imin ), min( ci+ring, imax )
+        for j in (cj-ring, cj+ring):                    # top and bottom rows
+            if jmin <= j <= jmax:
+                for i in range(i0, i1+1):
+                    yield (i, j)
+        j0, j1 = max( cj-ring+1, jmin ), min( cj+ring-1, jmax )
+        for i in (ci-ring, ci+ring):                    # left and right columns (without the corners)
+            if imin <= i <= imax:
+                for j in range(j0, j1+1):
+                    yield (i, j)
+
+    def Volume( self, cylinder ):
+        """ Returns the time ranges (per root, per joint) of every sample that
+            falls inside the given (infinite) Cylinder.  Voxels whose boxes are
+            entirely outside the cylinder are skipped, and voxels whose corners
+            are all inside it are accepted wholesale. """
+        rad = cylinder.radius
+        axis = cylinder.axis.norm()
+        c = cylinder.center
+        cx, cy, cz = c[0], c[1], c[2]
+        ax, ay, az = axis[0], axis[1], axis[2]
+        def distSqToAxis( x, y, z ):
+            dx, dy, dz = x-cx, y-cy, z-cz
+            along = dx*ax + dy*ay + dz*az
+            return dx*dx + dy*dy + dz*dz - along*along
+        r2 = rad**2
+        size = self.voxelSize
+        half = 0.5*size
+        halfDiagonal = half*3**0.5
+        corners = [ (dx, dy, dz) for dx in (0, size) for dy in (0, size) for dz in (0, size) ]
+        hits = []
+        for (i, j, k), samples in self.voxels.items():
+            x0, y0, z0 = i*size, j*size, k*size
+            d = max( distSqToAxis( x0+half, y0+half, z0+half ), 0.0 )**0.5
+            if d - halfDiagonal >= rad:
+                continue                                # the whole voxel is outside the cylinder
+            for dx, dy, dz in corners:
+                if distSqToAxis( x0+dx, y0+dy, z0+dz ) >= r2:
+                    break
+            else:
+                hits.extend( samples )                  # the whole voxel is inside the cylinder
+                continue
+            for s in samples:
+                x, y, z = self.xyz[s]
+                if distSqToAxis( x, y, z ) < r2:
+                    hits.append( s )
+        return self.Ranges( hits )
+
+    def Ranges( self, hits ):
+        """ Turns a list of sample indices into contiguous time ranges:
+            { root: { joint: [ [start, end], ... ] } } """
+        ranges = {}
+        prev = None
+        for s in sorted(hits):
+            root, joint = self.paths[ self.pathOf[s] ]
+            if prev is not None and s == prev+1 and self.pathOf[s] == self.pathOf[prev]:
+                ranges[root][joint][-1][1] = self.times[s]      # extend the current range
+            else:
+                ranges.setdefault( root, {} ).setdefault( joint, [] ).append( [ self.times[s], self.times[s] ] )
+            prev = s
+        return ranges
+
+    def SegmentHitsCell( self, p, q, i, j ):
+        """ Determines if the 2D segment pq touches grid cell (i,j) """
+        x0, y0 = i*self.cellSize, j*self.cellSize
+        x1, y1 = x0+self.cellSize, y0+self.cellSize
+        # clip the segment against the cell (Liang-Barsky)
+        t0, t1 = 0.0, 1.0
+        dx, dy = q[0]-p[0], q[1]-p[1]
+        for pk, qk in ( (-dx, p[0]-x0), (dx, x1-p[0]), (-dy, p[1]-y0), (dy, y1-p[1]) ):
+            if pk == 0:
+                if qk < 0:
+                    return False
+            else:
+                r = qk/float(pk)
+                if pk < 0:
+                    t0 = max(t0, r)
+                else:
+                    t1 = min(t1, r)
+                if t0 > t1:
+                    return False
+        return True
+
+# utility functions
+def CellRange( grid ):
+    """ Returns the (imin, jmin, imax, jmax) range of a grid's occupied cells (None if it has none) """
+    if not grid:
+        return None
+    return ( min([i for i,j in grid]), min([j for i,j in grid]),
+             max([i for i,j in grid]), max([j for i,j in grid]) )
+
+def PointInPolygon( pt, poly ):
+    """ Even-odd test of a 2D point against a 2D polygon (list of (u,v) tuples) """
+    x, y = pt
+    inside = False
+    for k in range(len(poly)):
+        (x0, y0), (x1, y1) = poly[k-1], poly[k]
+        if (y0 > y) != (y1 > y) and x < (x1-x0)*(y-y0)/float(y1-y0) + x0:
+            inside = not inside
+    return inside
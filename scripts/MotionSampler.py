@@ -0,0 +1,134 @@
+## Motion Sampler
+## Records the motion of every traceable object in a single pass over the timeline
+## ACCAD, The Ohio State University
+## 2013
+
+from SceneBackend import *
+from Profiler import *
+
+class MotionSampler:
+    """ Resolves the traceable joints of each root once, walks the timeline
+        once and caches the world space position of every joint at every
+        sample time.  Both the motion trace curves and the Trajectory
+        objects are built from this cache.  Positions come from a scene
+        backend (see SceneBackend.py), which is a MayaScene by default.
+
+        If an adaptive tolerance is given, each root starts out with the
+        regular sample times and then recursively halves the intervals
+        where the motion of any of its joints bends (chord deviation) or
+        changes speed by more than the tolerance, so fast swings get
+        subframe samples without paying for them everywhere. """
+
+    def __init__( self, roots, traceableObjs, substeps=1, scene=None, adaptive=None, maxDepth=3 ):
+        self.scene = scene or MayaScene()
+        self.roots = list(roots)
+        # a set makes membership tests O(1) (nested lists never matched a joint name, so skip them)
+        self.traceables = set( [obj for obj in traceableObjs if not isinstance(obj, list)] )
+        self.substeps = substeps
+        self.adaptive = adaptive    # tolerance for adaptive sampling (None for uniform sampling)
+        self.maxDepth = maxDepth    # how many times an interval can be halved (adaptive sampling)
+        self.joints = {}        # root -> the traceable joints under that root (in DAG order)
+        self.times = []         # the regular sample times (shared by all joints)
+        self.rootTimes = {}     # root -> its sample times, if they differ from the regular ones (adaptive sampling)
+        self.samples = {}       # root -> joint -> list of (x,y,z) world positions (one per sample time)
+
+    def Joints( self, root ):
+        """ Returns the traceable joints under a root (resolved only once) """
+        if not root in self.joints:
+            self.joints[root] = [j for j in self.scene.Descendents( root ) if j in self.traceables]
+        return self.joints[root]
+
+    def SampleTimes( self ):
+        """ Returns the list of times to sample (substeps per frame, over the playback range) """
+        startFrame, endFrame = self.scene.PlaybackRange()
+        return sampleTimes( startFrame, endFrame, self.substeps )
+
+    def Sample( self, times=None, roots=None ):
+        """ Records the position of every traceable joint (of every root, or just the given roots)
+            at every sample time (in one bulk query).  By default the whole playback range is sampled,
+            but a batch worker can pass its share of the times.  Roots whose samples are already
+            cached (e.g. filled from a TrajectoryStore) are skipped. """
+        missing = [root for root in (roots or self.roots) if not root in self.samples]
+        if not missing:
+            return self.samples
+        if not self.times:
+            self.times = times or self.SampleTimes()
+        joints = []
+        seen = set()
+        for root in missing:
+            joints.extend( [j for j in self.Joints( root ) if not j in seen] )
+            seen.update( self.Joints( root ) )
+        positions = self.scene.WorldPositions( joints, self.times )
+        profiler.Count( "positions sampled", len(joints)*len(self.times) )
+        for root in missing:
+            self.samples[root] = dict( [ (j, positions[j]) for j in self.Joints( root ) ] )
+            if self.adaptive:
+                self.Refine( root )
+        return self.samples
+
+    def Refine( self, root ):
+        """ Adaptive sampling: adds samples (between the existing ones) wherever the
+            motion of one of the root's joints deviates from a straight, steady path """
+        joints = self.Joints( root )
+        times = list( self.times )
+        samples = self.samples[root]
+        for level in range(self.maxDepth):
+            newTimes = set()
+            for j in joints:
+                P = samples[j]
+                for k in range(1, len(times)-1):
+                    if self.Deviation( times[k-1:k+2], P[k-1:k+2] ) > self.adaptive:
+                        newTimes.add( 0.5*(times[k-1]+times[k]) )
+                        newTimes.add( 0.5*(times[k]+times[k+1]) )
+            newTimes = sorted( newTimes )
+            if not newTimes:
+                break
+            positions = self.scene.WorldPositions( joints, newTimes )
+            profiler.Count( "positions sampled", len(joints)*len(newTimes) )
+            for j in joints:
+                byTime = dict( zip( times, samples[j] ) )
+                byTime.update( dict( zip( newTimes, positions[j] ) ) )
+                samples[j] = [ byTime[t] for t in sorted(byTime.keys()) ]
+            times = sorted( times + newTimes )
+        self.rootTimes[root] = times
+
+    def Deviation( self, times, points ):
+        """ Measures how far the middle of three samples strays from a straight, steady
+            path: the larger of its distance from the chord and the change in velocity
+            (scaled by the shorter interval, so both are distances) """
+        t0, t1, t2 = times
+        p0, p1, p2 = points
+        chord = [b-a for a,b in zip(p0, p2)]
+        offset = [b-a for a,b in zip(p0, p1)]
+        chordLenSq = sum( [c*c for c in chord] )
+        if chordLenSq > 0:
+            along = sum( [c*o for c,o in zip(chord, offset)] )/chordLenSq
+            chordDev = sum( [(o-along*c)**2 for c,o in zip(chord, offset)] )**0.5
+        else:
+            chordDev = sum( [o*o for o in offset] )**0.5
+        v0 = [(b-a)/(t1-t0) for a,b in zip(p0, p1)]
+        v1 = [(b-a)/(t2-t1) for a,b in zip(p1, p2)]
+        velDev = sum( [(b-a)**2 for a,b in zip(v0, v1)] )**0.5 * min(t1-t0, t2-t1)
+        return max( chordDev, velDev )
+
+    def Points( self, root, joint, wholeFrames=False ):
+        """ Returns the sampled positions of a joint (optionally only those that fall on whole frames) """
+        self.Sample( roots=[root] )
+        if not wholeFrames:
+            return self.samples[root][joint]
+        return [p for t, p in zip(self.Times( root=root ), self.samples[root][joint]) if t == int(t)]
+
+    def Times( self, wholeFrames=False, root=None ):
+        """ Returns the sample times of a root (or the regular sample times), optionally only the whole frames """
+        if not self.times:
+            self.Sample()
+        times = self.rootTimes.get( root, self.times )
+        if not wholeFrames:
+            return times
+        return [t for t in times if t == int(t)]
+
+# utility function
+def sampleTimes( startFrame, endFrame, substeps=1 ):
+    """ Returns substeps sample times per frame, from startFrame up to (but not including) endFrame+1 """
+    endFrame += 1
+    return [float(x)/substeps+startFrame for x in range(0, int(endFrame-startFrame)*substeps)]
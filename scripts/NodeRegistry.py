@@ -0,0 +1,54 @@
+## Node Registry
+## Keeps track of the nodes the tools create, so they can be found (and cleaned up) without scanning the scene
+## ACCAD, The Ohio State University
+## 2013
+
+try:
+    import maya.cmds as mc
+except ImportError:     # running headless (outside of Maya)
+    mc = None
+
+class NodeRegistry:
+    """ Records the nodes the tools make, by category, on a network node the
+        tools own.  Each node is connected (by its message attribute) to a
+        multi attribute of the registry named after its category, so the
+        record follows renames, drops nodes that get deleted and is saved
+        with the scene.  Looking up (or deleting) a category only touches
+        the nodes in it -- never the rest of the scene. """
+
+    def __init__( self, name="traceSelectionRegistry" ):
+        self.name = name
+
+    def Node( self ):
+        """ Returns the registry node (making it the first time it is needed) """
+        if not mc.objExists( self.name ):
+            self.name = mc.createNode( "network", name=self.name, skipSelect=True )
+        return self.name
+
+    def Plug( self, category ):
+        node = self.Node()
+        if not mc.attributeQuery( category, node=node, exists=True ):
+            mc.addAttr( node, longName=category, attributeType="message", multi=True, indexMatters=False )
+        return "%s.%s"%(node, category)
+
+    def Add( self, category, nodes ):
+        """ Records the given node (or list of nodes) under a category """
+        if isinstance( nodes, basestring ):
+            nodes = [nodes]
+        plug = self.Plug( category )
+        for node in nodes:
+            mc.connectAttr( "%s.message"%node, plug, nextAvailable=True )
+        return nodes
+
+    def Nodes( self, category ):
+        """ Returns the nodes recorded under a category (that still exist) """
+        if not mc.objExists( self.name ) or not mc.attributeQuery( category, node=self.name, exists=True ):
+            return []
+        return mc.listConnections( "%s.%s"%(self.name, category), source=True, destination=False, fullNodeName=True ) or []
+
+    def Delete( self, category ):
+        """ Deletes every node recorded under a category """
+        nodes = self.Nodes( category )
+        if nodes:
+            mc.delete( nodes )
+        return nodes
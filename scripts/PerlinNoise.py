@@ -0,0 +1,61 @@
+## Perlin Noise
+## Ken Perlin's "improved noise" (2002) in pure Python, so curves can be deformed without MEL round trips
+## ACCAD, The Ohio State University
+## 2013
+
+from math import floor
+from random import Random as _PerlinRandom
+
+# the permutation table (fixed, so the noise is the same every session), repeated to avoid wrapping indices
+_perm = list(range(256))
+_PerlinRandom(1013).shuffle(_perm)
+_perm = _perm*2
+
+def _fade( t ):
+    return t*t*t*(t*(t*6-15)+10)
+
+def _lerp( t, a, b ):
+    return a + t*(b-a)
+
+def _grad( h, x, y, z ):
+    """ The dot product of (x,y,z) with one of 12 gradient directions (picked by the hash h) """
+    h = h & 15
+    if h < 8:
+        u = x
+    else:
+        u = y
+    if h < 4:
+        v = y
+    elif h == 12 or h == 14:
+        v = x
+    else:
+        v = z
+    if h & 1:
+        u = -u
+    if h & 2:
+        v = -v
+    return u + v
+
+def noise3( x, y, z ):
+    """ Returns the Perlin noise value (about -1 to 1) at a point in 3D """
+    fx, fy, fz = floor(x), floor(y), floor(z)
+    X, Y, Z = int(fx) & 255, int(fy) & 255, int(fz) & 255
+    x, y, z = x-fx, y-fy, z-fz
+    u, v, w = _fade(x), _fade(y), _fade(z)
+    p = _perm
+    A = p[X]+Y
+    AA, AB = p[A]+Z, p[A+1]+Z
+    B = p[X+1]+Y
+    BA, BB = p[B]+Z, p[B+1]+Z
+    return _lerp( w, _lerp( v, _lerp( u, _grad(p[AA], x, y, z),   _grad(p[BA], x-1, y, z) ),
+                               _lerp( u, _grad(p[AB], x, y-1, z), _grad(p[BB], x-1, y-1, z) ) ),
+                     _lerp( v, _lerp( u, _grad(p[AA+1], x, y, z-1),   _grad(p[BA+1], x-1, y, z-1) ),
+                               _lerp( u, _grad(p[AB+1], x, y-1, z-1), _grad(p[BB+1], x-1, y-1, z-1) ) ) )
+
+def noise1( x ):
+    """ Returns the Perlin noise value (about -1 to 1) at x in 1D """
+    return noise3( x, 0.37, 0.71 )     # (off the lattice planes, where 3D noise is always 0)
+
+def noises( xs ):
+    """ Returns the 1D noise at each of a list of values """
+    return [ noise1( x ) for x in xs ]
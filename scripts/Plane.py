@@ -25,3 +25,17 @@ class Plane:
             return a + direction*d
     
         
+    def basis(self):
+        """ returns two unit vectors that span this plane (u and v axes) """
+        up = Vector(0,1,0)
+        if abs(self.normal*up) > 0.99:     # normal is (nearly) vertical, so use a different helper axis
+            up = Vector(0,0,1)
+        u = up.cross(self.normal).norm()
+        v = self.normal.cross(u)
+        return u, v
+
+    def toPlaneCoords(self, point):
+        """ returns the 2D (u,v) coordinates of a point (projected) onto this plane """
+        u, v = self.basis()
+        d = Vector(point) - self.point
+        return (d*u, d*v)
@@ -0,0 +1,159 @@
+## Profiler
+## Phase timers, counters and Maya command counts for the trace tools
+## ACCAD, The Ohio State University
+## 2013
+
+import time, json
+from collections import deque
+
+class _NoPhase:
+    """ What Phase returns while profiling is off (entering and leaving it does nothing) """
+    def __enter__( self ):
+        return self
+    def __exit__( self, *exc ):
+        return False
+
+_noPhase = _NoPhase()
+
+class _Phase:
+    """ Times one named phase (use it in a with statement) """
+    def __init__( self, profiler, name ):
+        self.profiler = profiler
+        self.name = name
+    def __enter__( self ):
+        self.start = time.time()
+        return self
+    def __exit__( self, *exc ):
+        self.profiler.Record( self.name, self.start, time.time() )
+        return False
+
+class CommandCounter:
+    """ Stands in for a module like maya.cmds and counts the calls to each command """
+    def __init__( self, module, profiler ):
+        self._module = module
+        self._profiler = profiler
+
+    def __getattr__( self, name ):
+        command = getattr( self._module, name )
+        if not callable( command ):
+            return command
+        profiler = self._profiler
+        def counted( *args, **kwargs ):
+            profiler.commands[name] = profiler.commands.get( name, 0 ) + 1
+            return command( *args, **kwargs )
+        return counted
+
+class Profiler:
+    """ Collects the timings of named phases (in a rolling buffer of the most
+        recent events), named counters and the number of calls made to each
+        Maya command.  Everything is off until Enable is called: phases and
+        counters return right away, and the modules' Maya command modules
+        are only swapped for counting proxies while profiling is on. """
+
+    def __init__( self, capacity=10000 ):
+        self.enabled = False
+        self.events = deque( maxlen=capacity )  # (name, start, end) of the most recent phases
+        self.counters = {}      # name -> count
+        self.commands = {}      # Maya command -> number of calls
+        self.instrumented = []  # (module, attribute, original) swapped for CommandCounters
+        self.epoch = time.time()
+
+    def Enable( self, modules=(), attr="mc" ):
+        """ Starts profiling (and counts the Maya commands called through module.<attr> for each of the given modules) """
+        self.enabled = True
+        for module in modules:
+            original = getattr( module, attr, None )
+            if original is None or isinstance( original, CommandCounter ):
+                continue
+            setattr( module, attr, CommandCounter( original, self ) )
+            self.instrumented.append( (module, attr, original) )
+
+    def Disable( self ):
+        """ Stops profiling (and puts the original Maya command modules back) """
+        self.enabled = False
+        for module, attr, original in self.instrumented:
+            setattr( module, attr, original )
+        del self.instrumented[:]
+
+    def Reset( self ):
+        self.events.clear()
+        self.counters.clear()
+        self.commands.clear()
+        self.epoch = time.time()
+
+    def Phase( self, name ):
+        """ Returns a timer for a named phase:  with profiler.Phase("sample"): ... """
+        if not self.enabled:
+            return _noPhase
+        return _Phase( self, name )
+
+    def Record( self, name, start, end ):
+        self.events.append( (name, start, end) )
+
+    def Count( self, name, n=1 ):
+        if self.enabled:
+            self.counters[name] = self.counters.get( name, 0 ) + n
+
+    def Summary( self ):
+        """ Returns { phase: (calls, total seconds, max seconds) } over the buffered events """
+        summary = {}
+        for name, start, end in self.events:
+            calls, total, longest = summary.get( name, (0, 0.0, 0.0) )
+            summary[name] = ( calls+1, total+end-start, max(longest, end-start) )
+        return summary
+
+    def Report( self ):
+        """ Prints the phases (slowest first), the counters and the busiest Maya commands """
+        summary = self.Summary()
+        for name in sorted( summary.keys(), key=lambda n: -summary[n][1] ):
+            calls, total, longest = summary[name]
+            print("%-32s %6d calls %10.2f ms total %10.2f ms max"%(name, calls, 1000*total, 1000*longest))
+        for name in sorted( self.counters.keys() ):
+            print("%-32s %10d"%(name, self.counters[name]))
+        for name in sorted( self.commands.keys(), key=lambda n: -self.commands[n] ):
+            print("mc.%-29s %10d calls"%(name, self.commands[name]))
+
+    def AsDict( self ):
+        return { "phases": [ {"name": name, "start": start-self.epoch, "duration": end-start} for name, start, end in self.events ],
+                 "counters": dict( self.counters ),
+                 "commands": dict( self.commands ) }
+
+    def DumpJSON( self, path ):
+        """ Writes the buffered phases, the counters and the command counts to a JSON file """
+        f = open( path, 'w' )
+        try:
+            json.dump( self.AsDict(), f, indent=1, sort_keys=True )
+        finally:
+            f.close()
+
+    def DumpChromeTrace( self, path ):
+        """ Writes the buffered phases in the Chrome trace event format (open it in chrome://tracing) """
+        events = [ {"name": name, "ph": "X", "pid": 0, "tid": 0,
+                    "ts": 1e6*(start-self.epoch), "dur": 1e6*(end-start)} for name, start, end in self.events ]
+        now = 1e6*(time.time()-self.epoch)
+        for name in sorted( self.counters.keys() ):
+            events.append( {"name": name, "ph": "C", "pid": 0, "tid": 0, "ts": now, "args": {name: self.counters[name]}} )
+        f = open( path, 'w' )
+        try:
+            json.dump( {"traceEvents": events, "otherData": {"commands": self.commands}}, f )
+        finally:
+            f.close()
+
+def profiled( name ):
+    """ Decorator: times every call of a function as the named phase (when profiling is on) """
+    def decorate( function ):
+        def timed( *args, **kwargs ):
+            if not profiler.enabled:
+                return function( *args, **kwargs )
+            start = time.time()
+            try:
+                return function( *args, **kwargs )
+            finally:
+                profiler.Record( name, start, time.time() )
+        timed.__name__ = function.__name__
+        timed.__doc__ = function.__doc__
+        return timed
+    return decorate
+
+# the profiler shared by all the trace tools
+profiler = Profiler()
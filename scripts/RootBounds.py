@@ -0,0 +1,48 @@
+## Root Bounds
+## Bounding boxes and centers of each rig, worked out from its sampled trajectories (no viewport queries)
+## ACCAD, The Ohio State University
+## 2013
+
+from Vector import *
+
+class Box:
+    """ An axis aligned bounding box around a list of points """
+    def __init__( self, points ):
+        points = list(points) or [ (0.0, 0.0, 0.0) ]
+        self.lo = tuple( [ min([p[k] for p in points]) for k in range(3) ] )
+        self.hi = tuple( [ max([p[k] for p in points]) for k in range(3) ] )
+
+    def Center( self ):
+        return Vector( [ 0.5*(a+b) for a, b in zip( self.lo, self.hi ) ] )
+
+    def Radius( self ):
+        """ Returns the radius of the sphere around the box (half its diagonal) """
+        return 0.5*sum( [ (b-a)**2 for a, b in zip( self.lo, self.hi ) ] )**0.5
+
+class RootBounds:
+    """ Caches the bounds of each root's traceables: a Box over the whole
+        sampled range.  Each entry carries a stamp (e.g. the version of the
+        root's samples), and is worked out again when it is asked for with
+        a different stamp. """
+
+    def __init__( self ):
+        self.entries = {}       # root -> (stamp, Box over the range)
+
+    def Cached( self, root, stamp ):
+        """ Returns the cached range Box of a root (or None if it is missing or its stamp is stale) """
+        entry = self.entries.get( root )
+        if entry and entry[0] == stamp:
+            return entry[1]
+        return None
+
+    def Put( self, root, stamp, box ):
+        """ Caches a range Box for a root (e.g. worked out some other way, before it is sampled) """
+        self.entries[root] = ( stamp, box )
+
+    def Range( self, sampler, root, stamp ):
+        """ Returns the Box around every sample of every joint of a root (from the MotionSampler) """
+        box = self.Cached( root, stamp )
+        if box is None:
+            box = Box( [ p for j in sampler.Joints( root ) for p in sampler.Points( root, j ) ] )
+            self.Put( root, stamp, box )
+        return box
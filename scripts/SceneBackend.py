@@ -0,0 +1,123 @@
+## Scene Backends
+## Answer "where are objects O at times T?" for the trace tools
+## ACCAD, The Ohio State University
+## 2013
+
+try:
+    import maya.cmds as mc
+    import maya.OpenMaya as OpenMaya
+except ImportError:     # running headless (outside of Maya) -- only the FakeScene is available
+    mc = None
+    OpenMaya = None
+
+class MayaScene:
+    """ Samples a Maya scene.  By default, positions are evaluated through
+        the API in a DG context for each time, so the global time never
+        changes (no viewport updates or time-change callbacks).  Set scrub
+        to True to fall back to scrubbing the timeline (e.g. for rigs that
+        rely on dynamics, which only evaluate correctly at the current time). """
+
+    def __init__( self, scrub=False ):
+        self.scrub = scrub
+
+    def PlaybackRange( self ):
+        """ Returns the (min, max) frames of the playback range """
+        return ( mc.playbackOptions(q=True,minTime=True), mc.playbackOptions(q=True,maxTime=True) )
+
+    def Descendents( self, root ):
+        """ Returns all the descendents of a root (in DAG order) """
+        return mc.listRelatives( root, allDescendents=True ) or []
+
+    def FindTraceables( self, traceables=None ):
+        """ Returns (roots, traceableObjs) -- found the same way the trace select tool finds them """
+        import traceSelectTool as tst
+        if traceables:
+            jointRoots, xformRoots = tst.findRootsFromTraceables( traceables )
+            return xformRoots, traceables
+        jointRoots, xformRoots, traceableObjs = tst.autoFindTraceables()
+        return xformRoots, traceableObjs
+
+    def WorldPositions( self, objs, times ):
+        """ Returns { obj: [ (x,y,z) for each time ] } (world space translations) """
+        positions = dict( [ (obj, []) for obj in objs ] )
+        if not objs:
+            return positions
+        if self.scrub:
+            now = mc.currentTime(q=True)
+            for t in times:
+                mc.currentTime(t)
+                for obj in objs:
+                    positions[obj].append( tuple( mc.xform( obj, q=True, ws=True, translation=True ) ) )
+            mc.currentTime(now)
+            return positions
+        # look up the worldMatrix plug of each object once
+        sel = OpenMaya.MSelectionList()
+        for obj in objs:
+            sel.add( obj )
+        plugs = []
+        for i, obj in enumerate(objs):
+            dag = OpenMaya.MDagPath()
+            sel.getDagPath( i, dag )
+            fn = OpenMaya.MFnDependencyNode( dag.node() )
+            plugs.append( (positions[obj], fn.findPlug("worldMatrix").elementByLogicalIndex( dag.instanceNumber() )) )
+        # evaluate every plug in a context for each time (without changing the global time)
+        unit = OpenMaya.MTime.uiUnit()
+        for t in times:
+            ctx = OpenMaya.MDGContext( OpenMaya.MTime( t, unit ) )
+            for samples, plug in plugs:
+                m = OpenMaya.MFnMatrixData( plug.asMObject( ctx ) ).matrix()
+                samples.append( ( m(3,0), m(3,1), m(3,2) ) )
+        return positions
+
+class FakeScene:
+    """ A pure-Python stand-in for a Maya scene, so that the sampling (and
+        anything built on it) can run headless.  Each object has a parent
+        and a motion function that returns its local translation at time t. """
+
+    def __init__( self, playbackRange=(1.0, 100.0) ):
+        self.playbackRange = playbackRange
+        self.parents = {}       # obj -> parent (or None)
+        self.children = {}      # obj -> list of children (in creation order)
+        self.motion = {}        # obj -> function(t) -> (x,y,z) local translation
+        self.queries = 0        # number of (object, time) positions evaluated (for benchmarks)
+
+    def AddObject( self, name, parent=None, motion=None ):
+        """ Adds an object to the scene (motion defaults to sitting still at the parent's origin) """
+        self.parents[name] = parent
+        self.children[name] = []
+        if parent:
+            self.children[parent].append( name )
+        self.motion[name] = motion or (lambda t: (0.0, 0.0, 0.0))
+        return name
+
+    def PlaybackRange( self ):
+        return self.playbackRange
+
+    def Descendents( self, root ):
+        # Maya lists descendents deepest first, so mimic that ordering
+        found = []
+        for child in self.children.get( root, [] ):
+            found = self.Descendents( child ) + [child] + found
+        return found
+
+    def FindTraceables( self, traceables=None ):
+        """ Returns (roots, traceableObjs): the parentless objects, and (unless
+            traceables are given) the leaves under them """
+        roots = [obj for obj in self.parents.keys() if not self.parents[obj]]
+        if traceables:
+            roots = [root for root in roots if [d for d in self.Descendents( root ) if d in traceables]]
+            return sorted(roots), traceables
+        return sorted(roots), [obj for obj in self.parents.keys() if self.parents[obj] and not self.children[obj]]
+
+    def WorldPosition( self, obj, t ):
+        """ Returns the world space translation of an object at time t """
+        x, y, z = 0.0, 0.0, 0.0
+        while obj:
+            dx, dy, dz = self.motion[obj](t)
+            x, y, z = x+dx, y+dy, z+dz
+            obj = self.parents[obj]
+        return (x, y, z)
+
+    def WorldPositions( self, objs, times ):
+        self.queries += len(objs)*len(times)
+        return dict( [ (obj, [self.WorldPosition( obj, t ) for t in times]) for obj in objs ] )
@@ -0,0 +1,67 @@
+## Selection Curve Pool
+## Reuses the curves that show selected motion, instead of making and deleting a curve for every selection
+## ACCAD, The Ohio State University
+## 2013
+
+try:
+    import maya.cmds as mc
+except ImportError:     # running headless (outside of Maya)
+    mc = None
+import curveUtil as cu
+import SelectionIndex as si
+
+class SelectionCurvePool:
+    """ A pool of selection curves, each with the metadata attribute the
+        Trace Move Tool reads (see SelectionIndex.py).  Acquire reshapes a
+        free curve in place (its CVs, name and SelectionRecord), and Release
+        hides it again (clearing its record), so making a selection doesn't create or
+        delete any nodes once the pool is warm.  The curves are recorded in
+        the NodeRegistry, so the pool is found again (e.g. after the tool is
+        restarted) without scanning the scene. """
+
+    def __init__( self, registry, category="selectionCurves" ):
+        self.registry = registry
+        self.category = category
+        self.free = None            # the curves that aren't showing a selection (found on first use)
+
+    def Free( self ):
+        if self.free is None:
+            self.free = [ c for c in self.registry.Nodes( self.category ) if not si.index.Lookup( c ) ]
+        return self.free
+
+    def Fill( self, count ):
+        """ Makes sure there are at least count free curves (making the missing ones now) """
+        while len(self.Free()) < count:
+            self.free.append( self.Make() )
+
+    def Make( self ):
+        """ Builds a new (hidden) pool curve with an empty SelectionRecord """
+        curve = mc.curve( d=1, p=[(0,0,0), (0,0,0)], n="traceSelectionPool#" )
+        si.index.Clear( curve )
+        mc.setAttr( "%s.visibility"%curve, 0 )
+        self.registry.Add( self.category, curve )
+        return mc.ls( curve, long=True )[0]
+
+    def Acquire( self, name, shape, record ):
+        """ Shows a (world space) BSpline as a selection curve with the given name and SelectionRecord,
+            returns the curve """
+        free = self.Free()
+        curve = free and free.pop() or self.Make()
+        cu.replaceCurveShape( curve, shape )
+        curve = mc.rename( curve, name )
+        si.index.Write( curve, record )
+        mc.setAttr( "%s.visibility"%curve, 1 )
+        return curve
+
+    def Release( self, curves ):
+        """ Hides the given selection curves and puts them back in the pool """
+        free = self.Free()
+        for curve in curves:
+            if not mc.objExists( curve ):
+                continue
+            if not self.registry.name in (mc.listConnections( "%s.message"%curve, source=False, destination=True ) or []):
+                mc.delete( curve )      # (not from the pool, e.g. made by an older version of the tool)
+                continue
+            si.index.Clear( curve )
+            mc.setAttr( "%s.visibility"%curve, 0 )
+            free.append( mc.ls( mc.rename( curve, "traceSelectionPool#" ), long=True )[0] )
@@ -0,0 +1,139 @@
+## Selection Index
+## The metadata of each trace selection (one record per selection curve), and an index to look it up quickly
+## ACCAD, The Ohio State University
+## 2013
+
+import json
+
+try:
+    import maya.cmds as mc
+    import maya.OpenMaya as OpenMaya
+except ImportError:     # running headless (outside of Maya)
+    mc = None
+
+class SelectionRecord:
+    """ What a trace selection selected: the traced object, the frame range
+        (startFrame to endFrame), how long the gesture took (interactTime)
+        and, for each translate channel, the range of key indices that fell
+        in the frame range when the keys were last looked up (keys).  Keys
+        can be added or deleted after the selection is made, so the move
+        tool looks them up again (ResolveKeys) when a drag starts. """
+
+    def __init__( self, obj, startFrame, endFrame, interactTime=0.0, keys=None ):
+        self.object = obj
+        self.startFrame = startFrame
+        self.endFrame = endFrame
+        self.interactTime = interactTime
+        self.keys = keys or {}
+
+    def TimeInterval( self ):
+        """ The frame range, in the form the keyframe command takes """
+        return ( "%d:%d"%( self.startFrame, self.endFrame ), )
+
+    def KeySelection( self, attr ):
+        """ Returns the keyframe command flags that pick the keys of an attribute
+            that this selection selected: their index range (as last looked up),
+            or the frame range if none were recorded """
+        if attr in self.keys:
+            return { "index": tuple( self.keys[attr] ) }
+        return { "time": self.TimeInterval() }
+
+    def ResolveKeys( self ):
+        """ Looks up the keys in the frame range again, and returns the keyframe
+            command flags that pick them: { attr: flags } for each translate channel """
+        self.keys = keysInRange( self.object, self.startFrame, self.endFrame )
+        return dict( [ (attr, self.KeySelection( attr )) for attr in translateAttrs ] )
+
+    def AsDict( self ):
+        return { "object": self.object, "startFrame": self.startFrame, "endFrame": self.endFrame,
+                 "interactTime": self.interactTime, "keys": self.keys }
+
+    def Dumps( self ):
+        return json.dumps( self.AsDict(), sort_keys=True )
+
+def loadRecord( text ):
+    """ Returns the SelectionRecord stored in a string (or None if it's empty) """
+    if not text:
+        return None
+    d = json.loads( text )
+    return SelectionRecord( d["object"], d["startFrame"], d["endFrame"], d.get("interactTime", 0.0), d.get("keys") )
+
+translateAttrs = ("translateX", "translateY", "translateZ")
+
+def keysInRange( obj, startFrame, endFrame ):
+    """ Returns the [first, last] index of the keys of each translate channel between startFrame and endFrame """
+    keys = {}
+    for attr in translateAttrs:
+        indices = mc.keyframe( obj, attribute=attr, time=(startFrame, endFrame), query=True, indexValue=True )
+        if indices:
+            keys[attr] = [ min(indices), max(indices) ]
+    return keys
+
+def describeSelection( obj, startFrame, endFrame, interactTime=0.0 ):
+    """ Returns the SelectionRecord of a new selection (finding the keys in the frame range) """
+    return SelectionRecord( obj, startFrame, endFrame, interactTime, keysInRange( obj, startFrame, endFrame ) )
+
+class SelectionIndex:
+    """ Both trace tools share one index (see "index" below).  Each selection
+        curve stores its SelectionRecord (as JSON) in a single string
+        attribute, and the index maps node handles to their records, so
+        the move tool finds out what a selected curve is with one dictionary
+        lookup (no attribute listing or name parsing).  Nodes the index
+        hasn't seen yet (e.g. from a scene that was just opened) are read
+        once -- including selections made by older versions of the tools,
+        which used separate attributes. """
+
+    attr = "traceSelection"
+
+    def __init__( self ):
+        self.records = {}       # hash code -> (MObjectHandle, SelectionRecord or None)
+
+    def MObject( self, node ):
+        """ Returns the MObject of a node (given its name or MObject) """
+        if isinstance( node, OpenMaya.MObject ):
+            return node
+        sel = OpenMaya.MSelectionList()
+        sel.add( node )
+        obj = OpenMaya.MObject()
+        sel.getDependNode( 0, obj )
+        return obj
+
+    def Write( self, node, record ):
+        """ Stores a node's SelectionRecord (None to clear it) on the node and in the index """
+        name = isinstance( node, OpenMaya.MObject ) and OpenMaya.MFnDependencyNode( node ).name() or node
+        if not mc.attributeQuery( self.attr, node=name, exists=True ):
+            mc.addAttr( name, longName=self.attr, dataType="string" )
+        mc.setAttr( "%s.%s"%(name, self.attr), record and record.Dumps() or "", type="string" )
+        handle = OpenMaya.MObjectHandle( self.MObject( node ) )
+        self.records[ handle.hashCode() ] = ( handle, record )
+
+    def Clear( self, node ):
+        self.Write( node, None )
+
+    def Forget( self ):
+        """ Drops every record from the index (e.g. when another scene is opened) """
+        self.records = {}
+
+    def Lookup( self, node ):
+        """ Returns the SelectionRecord of a node (name or MObject), or None if it isn't a trace selection """
+        obj = self.MObject( node )
+        handle = OpenMaya.MObjectHandle( obj )
+        entry = self.records.get( handle.hashCode() )
+        if entry and entry[0].isAlive() and entry[0] == handle:
+            return entry[1]
+        record = self.Read( obj )
+        self.records[ handle.hashCode() ] = ( handle, record )
+        return record
+
+    def Read( self, obj ):
+        """ Reads the SelectionRecord stored on a node """
+        fn = OpenMaya.MFnDependencyNode( obj )
+        if fn.hasAttribute( self.attr ):
+            return loadRecord( fn.findPlug( self.attr ).asString() )
+        if fn.hasAttribute( "isTraceSelection" ) and fn.findPlug( "isTraceSelection" ).asBool():
+            # a selection from an older version of the tools (the traced object is in its name)
+            return SelectionRecord( fn.name().split("_selection")[0], fn.findPlug( "startFrame" ).asDouble(),
+                                    fn.findPlug( "endFrame" ).asDouble(), fn.findPlug( "interactTime" ).asDouble() )
+        return None
+
+index = SelectionIndex()
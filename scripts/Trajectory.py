@@ -7,8 +7,12 @@ from IterativeDynamicTimeWarping import *
 from Vector import *
 from Plane import *
 from Cylinder import *
+from Profiler import *
 
-import maya.cmds as mc
+try:
+    import maya.cmds as mc
+except ImportError:     # running headless (outside of Maya)
+    mc = None
 
 class Trajectory:
     """ A class to hold spatio-temporal path information """
@@ -32,7 +36,9 @@ class Trajectory:
         self.normal = None
         self.planePt = None
 
-    def AddPoint( self, p, t=None ):
+    def AddPoint( self, p, t=None, solve=True ):
+        """ Adds a point to the trajectory (at time t, or the next index) and re-solves
+            the DTWs, unless solve is False (then UpdateDTWs picks up all the new points later) """
         if not type(p) == Vector:
             try:
                 p = Vector(p)
@@ -43,22 +49,25 @@ class Trajectory:
             self.points[t] = p
         else:
             self.points[ len(self.points.keys()) ] = p  # if no time is provided, just use and index
-        self.UpdateDTWs()
+        if solve:
+            self.UpdateDTWs()
 
     def SetSearchList( self, trajectories ):
         """ Sets the dict of trajectories to check for a match """
         self.searchList = trajectories
 
-    def SetUpDTWs( self ):
-        """ Initializes the DTWs """
+    def SetUpDTWs( self, camPos=None ):
+        """ Initializes the DTWs (camPos defaults to the position of the current camera) """
         del self.dtws[:]
         do_subsequence = True
         selfData  = [ [self.points[t].x, self.points[t].y, self.points[t].z] for t in sorted(self.points.keys()) ]
-        for joint in sorted(self.searchList.keys()):
-            jointMotionPath = self.searchList[joint]
+        if camPos is None:
             currentCam = mc.lookThru(q=True)
             camPos = Vector(mc.xform(currentCam,q=True,t=True))
-            otherData = [ Plane(self.normal,self.planePt).intersectWithRay( camPos, jointMotionPath.points[t] ).asList() for t in sorted(jointMotionPath.points.keys()) ]
+        plane = Plane(self.normal,self.planePt)
+        for joint in sorted(self.searchList.keys()):
+            jointMotionPath = self.searchList[joint]
+            otherData = [ plane.intersectWithRay( camPos, jointMotionPath.points[t] ).asList() for t in sorted(jointMotionPath.points.keys()) ]
             self.dtws.append( DTW( selfData, otherData, do_subsequence ) )
 
     def UpdateDTWs( self ):
@@ -66,24 +75,27 @@ class Trajectory:
         minCost = None
 	minP = None
 	minC = float("inf")
+	profiler.Count( "dtw joints matched", len(self.dtws) )
+	selfData = [ [self.points[t].x, self.points[t].y, self.points[t].z] for t in sorted(self.points.keys()) ]
 	for i, (joint, dtw) in enumerate( zip( sorted(self.searchList.keys()), self.dtws ) ):
-            if dtw.P and dtw.minCost and dtw.D:     # if not first time, get an updated optimal cost and path
-                selfData = [ [self.points[t].x, self.points[t].y, self.points[t].z] for t in sorted(self.points.keys()) ]
-                P,C,M = dtw.UpdateX( selfData )
-            else:                                   # if first time, fresh start
-                P,C,M = dtw.DTW()
+            if not (dtw.P and dtw.minCost and dtw.D):   # if first time, fresh start
+                dtw.DTW()
+            # get an updated optimal cost and path (for all the points added since the last solve)
+            P,C,M = dtw.UpdateX( selfData )
             if C < minC:
                 minCost = M
                 minP = P
                 minC = C
                 self.closestJoint = joint
                 self.closest = i
-                start = 0
+                # map the path's indices into the joint's samples back to times (the samples need not be uniform)
+                times = sorted(self.searchList[joint].points.keys())
+                start = times[0]
                 for s,step in enumerate(minP):
                     if step[0] > 0:
-                        start = sorted(self.searchList[joint].points.keys())[s-1]
+                        start = times[minP[s-1][1]]
                         break
-                stop  = sorted(self.searchList[joint].points.keys())[minP[-1][1]]
+                stop  = times[minP[-1][1]]
                 if stop-start > 1:
                     self.timespan = [ start, stop ]
                     
@@ -0,0 +1,118 @@
+## Trajectory Cache
+## An on-disk cache of sampled motion, keyed by the content of the scene
+## ACCAD, The Ohio State University
+## 2013
+
+import os, hashlib
+from TrajectoryStore import *
+
+try:
+    import maya.cmds as mc
+except ImportError:     # running headless (outside of Maya)
+    mc = None
+
+class TrajectoryCache:
+    """ Keeps one TrajectoryStore file per root in a user directory.  The
+        key of each file hashes what determines the root's motion: the
+        nodes feeding the root's hierarchy (constraints, IK...), the keys
+        of their animation curves and their expressions, the transforms'
+        matrices, joint orients and pivots, the sampled times and the
+        substeps.  So a changed rig simply misses the cache (and only that
+        root is resampled), while the same rig in a renamed (or another)
+        scene file hits it.  The directory is kept under maxBytes by evicting the
+        least recently used files. """
+
+    def __init__( self, directory=None, maxBytes=512*1024*1024 ):
+        if not directory:
+            if mc:
+                directory = os.path.join( mc.internalVar( userAppDir=True ), "traceSelectionCache" )
+            else:
+                directory = os.path.join( os.path.expanduser("~"), ".traceSelectionCache" )
+        self.directory = directory
+        self.maxBytes = maxBytes
+        if not os.path.isdir( self.directory ):
+            os.makedirs( self.directory )
+
+    def Path( self, key ):
+        return os.path.join( self.directory, key+".traj" )
+
+    def Get( self, key ):
+        """ Returns the TrajectoryStore saved under key (or None on a miss) """
+        path = self.Path( key )
+        if not os.path.exists( path ):
+            return None
+        try:
+            store = TrajectoryStore.Load( path )
+        except Exception:       # a corrupt (or outdated) file is just a miss
+            os.remove( path )
+            return None
+        os.utime( path, None )  # mark it as recently used
+        return store
+
+    def Put( self, key, store ):
+        """ Saves a TrajectoryStore under key (then evicts old entries if the cache is too big) """
+        tmpPath = self.Path( key )+".tmp"
+        store.Save( tmpPath )
+        if os.path.exists( self.Path( key ) ):
+            os.remove( self.Path( key ) )
+        os.rename( tmpPath, self.Path( key ) )
+        self.Evict()
+
+    def Evict( self ):
+        """ Removes the least recently used entries until the cache fits in maxBytes """
+        entries = []
+        for name in os.listdir( self.directory ):
+            if name.endswith(".traj"):
+                path = os.path.join( self.directory, name )
+                entries.append( (os.path.getmtime( path ), os.path.getsize( path ), path) )
+        total = sum( [size for used, size, path in entries] )
+        for used, size, path in sorted( entries ):
+            if total <= self.maxBytes:
+                break
+            os.remove( path )
+            total -= size
+
+    def RootKey( self, root, joints, times, substeps, adaptive=None ):
+        """ Returns the cache key of a root's motion in the current Maya scene """
+        h = hashlib.sha1()
+        h.update( repr( (TrajectoryStore.version, root, list(joints), substeps, adaptive,
+                         len(times), times and times[0], times and times[-1]) ).encode("utf-8") )
+        for node in self.MotionSources( root ):
+            h.update( node.encode("utf-8") )
+            h.update( repr( self.NodeSignature( node, times and times[0] or 0 ) ).encode("utf-8") )
+        return h.hexdigest()
+
+    def MotionSources( self, root ):
+        """ Returns every node that can affect the motion of the root's hierarchy:
+            its transforms (and joints), their upstream history (anim curves,
+            constraints, expressions...) and the IK handles (and their history)
+            acting on it.  Shapes are left out, so their deformers (skin
+            clusters, blend shapes, etc.) aren't hashed. """
+        hierarchy = mc.ls( [root] + (mc.listRelatives( root, allDescendents=True, fullPath=True ) or []), type="transform", long=True )
+        sources = set( hierarchy )
+        handles = set()
+        for effector in mc.listRelatives( root, allDescendents=True, type="ikEffector", fullPath=True ) or []:
+            handles.update( mc.listConnections( effector, type="ikHandle" ) or [] )
+        sources.update( mc.listHistory( hierarchy + sorted(handles) ) or [] )
+        return sorted( sources )
+
+    def NodeSignature( self, node, t ):
+        """ Returns the data of a node that determines the motion it produces """
+        nodeType = mc.nodeType( node )
+        if nodeType.startswith( "animCurve" ):
+            return ( nodeType,
+                     mc.keyframe( node, q=True, timeChange=True, valueChange=True ),
+                     mc.keyTangent( node, q=True, inAngle=True, outAngle=True, inWeight=True, outWeight=True ),
+                     mc.keyTangent( node, q=True, inTangentType=True, outTangentType=True ),
+                     mc.getAttr( node+".preInfinity" ), mc.getAttr( node+".postInfinity" ) )
+        if nodeType == "expression":
+            return ( nodeType, mc.expression( node, q=True, string=True ) )
+        # transforms (and joints): their local matrix at the first sample time, plus the joint
+        # orient and pivot (the rest of their motion is covered by the anim curves driving them)
+        values = []
+        if nodeType in ("transform", "joint"):
+            values.append( ("matrix", mc.getAttr( node+".matrix", time=t )) )
+            if nodeType == "joint":
+                values.append( ("jointOrient", mc.getAttr( node+".jointOrient" )) )
+            values.append( ("rotatePivot", mc.getAttr( node+".rotatePivot" )) )
+        return ( nodeType, values )
@@ -0,0 +1,82 @@
+## Trajectory Store
+## Sampled motion (of many roots, over many frames) that can be saved, merged and loaded
+## ACCAD, The Ohio State University
+## 2013
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+class TrajectoryStore:
+    """ Holds the sample times, the traceable joints of each root and the
+        world space position of each joint at each time -- the same data
+        that a MotionSampler caches.  Stores sampled in pieces (different
+        roots and/or different time ranges) can be merged into one. """
+
+    version = 1
+
+    def __init__( self, substeps=1 ):
+        self.substeps = substeps
+        self.times = []         # sorted sample times
+        self.joints = {}        # root -> traceable joints under that root
+        self.samples = {}       # root -> joint -> { time: (x,y,z) }
+
+    def AddSamples( self, sampler ):
+        """ Adds everything a (sampled) MotionSampler holds """
+        for root in sampler.roots:
+            self.joints[root] = list( sampler.Joints( root ) )
+            rootSamples = self.samples.setdefault( root, {} )
+            for j in self.joints[root]:
+                rootSamples.setdefault( j, {} ).update( dict( zip( sampler.Times( root=root ), sampler.Points( root, j ) ) ) )
+        self.times = sorted( set( self.times ) | set( sampler.Times() ) )
+
+    def Merge( self, other ):
+        """ Merges another store (e.g. from another worker) into this one """
+        for root in other.joints.keys():
+            self.joints[root] = other.joints[root]
+            rootSamples = self.samples.setdefault( root, {} )
+            for j in other.joints[root]:
+                rootSamples.setdefault( j, {} ).update( other.samples[root][j] )
+        self.times = sorted( set( self.times ) | set( other.times ) )
+
+    def Covers( self, roots, times ):
+        """ Determines if this store holds every sample of the given roots at the given times """
+        have = set( self.times )
+        return all( [root in self.joints for root in roots] ) and all( [t in have for t in times] )
+
+    def Fill( self, sampler, times=None, roots=None ):
+        """ Fills a MotionSampler's cache (for all of its roots, or just the given ones)
+            from this store, so the sampler doesn't have to touch the scene """
+        sampler.times = list( times or self.times )
+        lo, hi = sampler.times[0], sampler.times[-1]
+        for root in (roots or sampler.roots):
+            sampler.joints[root] = list( self.joints[root] )
+            rootTimes = sampler.times
+            if self.joints[root]:   # adaptively sampled roots have extra (in-between) times
+                rootTimes = [t for t in sorted( self.samples[root][self.joints[root][0]].keys() ) if lo <= t <= hi]
+                if len(rootTimes) != len(sampler.times):
+                    sampler.rootTimes[root] = rootTimes
+            sampler.samples[root] = dict( [ (j, [self.samples[root][j][t] for t in rootTimes]) for j in self.joints[root] ] )
+        return sampler
+
+    def Save( self, path ):
+        f = open( path, 'wb' )
+        try:
+            pickle.dump( (self.version, self.substeps, self.times, self.joints, self.samples), f, 2 )
+        finally:
+            f.close()
+
+    def Load( path ):
+        """ Returns the TrajectoryStore saved at path """
+        f = open( path, 'rb' )
+        try:
+            version, substeps, times, joints, samples = pickle.load( f )
+        finally:
+            f.close()
+        if version != TrajectoryStore.version:
+            raise ValueError( "%s holds trajectories in an unknown format (version %s)"%(path, version) )
+        store = TrajectoryStore( substeps )
+        store.times, store.joints, store.samples = times, joints, samples
+        return store
+    Load = staticmethod( Load )
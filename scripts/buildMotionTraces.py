@@ -3,9 +3,18 @@
 ## ACCAD, The Ohio State University
 ## 2012-13
 
-import maya.cmds as mc
+try:
+    import maya.cmds as mc
+    import maya.OpenMaya as om
+    import maya.OpenMayaAnim as oma
+except ImportError:     # running headless (outside of Maya)
+    mc = om = oma = None
 import curveUtil as cu
+import BSpline
 from Vector import *
+from SceneBackend import *
+from Kinematics import *
+from ArcLengthTable import interpolate
 
 class CurveMotionTrace:
     """ Given a moving object, this class will construct a
@@ -16,18 +25,17 @@ class CurveMotionTrace:
     def __init__(self,
                  obj,
                  keys=None,
-                 duration=  [
-                             mc.playbackOptions(q=True,minTime=True),
-                             mc.playbackOptions(q=True,maxTime=True)
-                            ],
+                 duration=None,     # (defaults to the playback range)
                  smooth=0.25,
                  tstep=1.0,
                  tube=False,
                  radius=0.5,
                  multVel=False,
-                 invertVel=False ):
+                 invertVel=False,
+                 scene=None ):
+        self.scene = scene or MayaScene()     # the backend used to sample the object's motion
         self.object = obj
-        self.timeSpan = duration
+        self.timeSpan = duration or list( self.scene.PlaybackRange() )
         self.smooth = smooth
         self.timestep = tstep
         self.tube = tube
@@ -36,88 +44,67 @@ class CurveMotionTrace:
         self.invertVel = invertVel
         self.points = keys
         self.traceBits = []
+        self.kinematics = None                # the velocity, speed, etc. of the sampled motion
+        self.minVel = self.maxVel = 0.0
         
-    def construct(self,name=None):
-        """ builds the trace """
-        minVel = 99999.0
-        maxVel = 0.0
-        pPos = None
+    def fit(self):
+        """ fits the trace's curve (a BSpline) to the motion, without building it """
+        frames = [x*self.timestep+self.timeSpan[0] for x in range(0, int((self.timeSpan[1]-self.timeSpan[0])/self.timestep)+1)]
+        frames.append(self.timeSpan[1])
+        positions = None
+        if not self.points or self.tube:    # sample the object's motion (without scrubbing the timeline)
+            positions = self.scene.WorldPositions( [self.object], frames )[self.object]
+            self.kinematics = Kinematics( frames, positions )     # velocities, etc. (in one pass)
+            self.minVel, self.maxVel = self.kinematics.SpeedRange()
         if not self.points:     # if points is not yet defined, iterate through keys and gather the points
             self.points = []
-            frames = [x*self.timestep+self.timeSpan[0] for x in range(0, int((self.timeSpan[1]-self.timeSpan[0])/self.timestep)+1)]
-            frames.append(self.timeSpan[1])
-            for t in frames:
-                mc.currentTime(t)
-                pos = mc.xform( self.object, q=True, ws=True, translation=True )
-                if not pPos == None:
-                    vel = Vector(pos) - Vector(pPos)
-                    if( vel.mag() > maxVel ):
-                        maxVel = vel.mag()
-                    if( vel.mag() < minVel ):
-                        minVel = vel.mag()
+            for pos in positions:
                 if( len(self.points) == 0 or
                     (Vector(pos) - Vector(self.points[-1])).mag() > 0.001 ):
                     self.points.append(pos)
-                pPos = pos
-        self.origCurve = mc.curve(d=1, ep=self.points, n="nurbsCurveTrace")
-        self.origCurve = mc.rebuildCurve(self.origCurve,
-                                         constructionHistory=0,
-                                         replaceOriginal=1,
-                                         rebuildType=0,
-                                         endKnots=1,
-                                         keepRange=1,
-                                         keepControlPoints=0,
-                                         keepEndPoints=1,
-                                         keepTangents=0,
-                                         spans=len(self.points)*self.timestep*self.smooth,
-                                         degree=3,
-                                         tolerance=0.01)[0]
+        self.frames, self.positions = frames, positions
+        # fit a smooth cubic to the points (in process)
+        self.shape = fitTrace( self.points, self.smooth, self.timestep )
+        return self.shape
+
+    def construct(self,name=None):
+        """ builds the trace """
+        self.fit()
+        frames, positions = self.frames, self.positions
+        # make the curve in one step
+        self.origCurve = mc.curve(d=self.shape.degree, p=self.shape.cvs, k=self.shape.knots, n="nurbsCurveTrace")
         if name:
             self.origCurve = mc.rename(self.origCurve,name)
             
         if( self.tube == True ):
             self.extrusion = self.extrude()
-            frames = [x*self.timestep+self.timeSpan[0] for x in range(0, int((self.timeSpan[1]-self.timeSpan[0])/self.timestep)+1)]
-            frames.append(self.timeSpan[1])
-            for t in frames:
-                mc.currentTime(t)
-                end = cu.curveArcLen( self.origCurve )
-                mc.select( self.object )
-                pt = mc.xform( q=True, ws=True, t=True )
-                now = cu.findArcLenAtParam( self.origCurve, cu.findParamAtPoint( self.origCurve, pt ) )
-                # find subCurve2 of the extrusion
-                shape = mc.listRelatives(self.curve2, fullPath=True, shapes=True)[0]
-                for sub in mc.listConnections(shape):
-                    if(sub.startswith("subCurve")):
-                        mc.setKeyframe( "%s.maxValue"%sub, t=t, v=max(0.0001,now/end) )  # key the visibility
-                
-            prev = None
-            frames = [x*self.timestep+self.timeSpan[0] for x in range(0, int((self.timeSpan[1]-self.timeSpan[0])/self.timestep)+1)]
-            frames.append(self.timeSpan[1])
-            for prevT in frames:
-                mc.currentTime(prevT)
-                mc.select( self.object )
-                pt = mc.xform( q=True, ws=True, t=True )
-                
-                scalePivot = Vector()
-                for i in range(0,8):
-                    mc.select( "%s.cv[%d][%d]"%( self.extrusion, i, int(t/self.timestep) ) )
-                    scalePivot.add( Vector( mc.xform(q=True, ws=True, t=True) ) )
-                scalePivot.mult(1.0/8.0)
-                
-                mc.select( "%s.cv[0:7][%d]"%( self.extrusion,int(t/self.timestep) ) )
-                if( self.multVel ):
-                    sz = 1.0
-                    if( prev == None ):
-                        sz = 0.0
-                    else:
-                        vel = Vector(pt) - Vector(prev)
-                        if( self.invertVel ):
-                            sz = self.taper(prevT, self.timeSpan[0], self.timeSpan[1], 0.2, 0.8) #remap(vel.mag(), minVel, maxVel, 1, 0)
-                        else:
-                            sz = 1-self.taper(prevT, self.timeSpan[0], self.timeSpan[1], 0.2, 0.8) #remap(vel.mag(), minVel, maxVel, 0, 1)
-                    mc.scale( sz, sz, sz, centerPivot=True, relative=True, p=scalePivot )
-                prev = pt
+            # measure the curve once, then work out how much of the tube shows at each frame (all at once)
+            arcLens = cu.arcLengthTable( self.origCurve )
+            end = arcLens.length
+            shown = [ max(0.0001, now/end) for now in cu.closestOnCurve( self.origCurve, positions )[1] ]
+            # find subCurve2 of the extrusion and key its maxValue (the visible part of the tube) in one go
+            shape = mc.listRelatives(self.curve2, fullPath=True, shapes=True)[0]
+            for sub in mc.listConnections(shape):
+                if(sub.startswith("subCurve")):
+                    setKeys( "%s.maxValue"%sub, frames, shown )
+
+            if( self.multVel ):
+                # scale each ring of the tube's CVs about its center by the speed of the motion as it passes the ring
+                reached = list( shown )     # (made non-decreasing, for looking up frames)
+                for k in range(1, len(reached)):
+                    reached[k] = max( reached[k], reached[k-1] )
+                speeds = self.kinematics.speed
+                def ringScale( ringCenter ):
+                    frame = interpolate( reached, frames, arcLens.ArcLen( arcLens.curve.ClosestParam( ringCenter ) )/end )
+                    if frame <= frames[0]:
+                        return 0.0
+                    if self.maxVel <= self.minVel:      # (steady motion)
+                        return 1.0
+                    speed = interpolate( frames, speeds, frame )
+                    if( self.invertVel ):
+                        return remap(speed, self.minVel, self.maxVel, 1, 0)
+                    return remap(speed, self.minVel, self.maxVel, 0, 1)
+                scaleRings( self.extrusion, ringScale )
                 
             groupName = mc.group(self.traceBits,n=self.object+"TubeTraceGroup")
             mc.setKeyframe( groupName+".visibility", t=self.timeSpan[0]-1, v=0.0 )
@@ -175,6 +162,129 @@ class CurveMotionTrace:
         else:
             return 1-(t/(1-taperB)-1)**2
 
+def setKeys( attr, times, values ):
+    """ Keys an attribute (e.g. "node.maxValue") at all the given times with one anim curve operation """
+    sel = om.MSelectionList()
+    sel.add( attr )
+    plug = om.MPlug()
+    sel.getPlug( 0, plug )
+    keys = dict( zip( times, values ) )     # (one key per time)
+    unit = om.MTime.uiUnit()
+    timeArray = om.MTimeArray()
+    valueArray = om.MDoubleArray()
+    for t in sorted( keys.keys() ):
+        timeArray.append( om.MTime( t, unit ) )
+        valueArray.append( keys[t] )
+    fnCurve = oma.MFnAnimCurve()
+    fnCurve.create( plug )
+    fnCurve.addKeys( timeArray, valueArray )
+
+def scaleRings( surface, ringScale ):
+    """ Scales each ring of CVs of a tube (the CVs along U, at each V) about the
+        ring's center by ringScale( center ), reading and writing all the CVs at once """
+    sel = om.MSelectionList()
+    sel.add( surface )
+    dag = om.MDagPath()
+    sel.getDagPath( 0, dag )
+    dag.extendToShape()
+    fnSurface = om.MFnNurbsSurface( dag )
+    cvs = om.MPointArray()
+    fnSurface.getCVs( cvs, om.MSpace.kWorld )
+    numU, numV = fnSurface.numCVsInU(), fnSurface.numCVsInV()
+    ring = numU
+    if fnSurface.formInU() == om.MFnNurbsSurface.kPeriodic:
+        ring = fnSurface.numSpansInU()      # (the rest repeat the first CVs)
+    for v in range(numV):
+        x = y = z = 0.0
+        for u in range(ring):
+            p = cvs[u*numV+v]
+            x, y, z = x+p.x, y+p.y, z+p.z
+        center = ( x/ring, y/ring, z/ring )
+        sz = ringScale( center )
+        for u in range(numU):
+            p = cvs[u*numV+v]
+            cvs.set( om.MPoint( center[0]+sz*(p.x-center[0]), center[1]+sz*(p.y-center[1]), center[2]+sz*(p.z-center[2]) ), u*numV+v )
+    fnSurface.setCVs( cvs, om.MSpace.kWorld )
+    fnSurface.updateSurface()
+
+def fitTrace( points, smooth=0.25, tstep=1.0 ):
+    """ Returns the smooth cubic BSpline of a motion trace through the given points """
+    return BSpline.fit( [ Vector(p).asList() for p in points ], len(points)*tstep*smooth, degree=3 )
+
+def traceLevelsOfDetail( points, smooth=0.25, tstep=1.0, maxSpans=64, maxPolylinePoints=32 ):
+    """ Returns the levels of detail of a motion trace, from finest to coarsest:
+        the full fit, a coarser fit (at most maxSpans spans) and a polyline
+        through at most maxPolylinePoints of the points.  The coarse levels
+        don't grow with the length of the trajectory. """
+    full = fitTrace( points, smooth, tstep )
+    coarse = BSpline.fit( [ Vector(p).asList() for p in points ], min( maxSpans, 0.25*len(points)*tstep*smooth ), degree=3 )
+    step = max( 1, (len(points)+maxPolylinePoints-1)//maxPolylinePoints )
+    corners = [ Vector(p).asList() for p in points[::step] ]
+    if len(points) > 1 and (len(points)-1)%step:
+        corners.append( Vector(points[-1]).asList() )     # always end where the motion ends
+    if len(corners) < 2:
+        corners = corners*2
+    polyline = BSpline.BSpline( 1, range(len(corners)), corners )
+    return [ full, coarse, polyline ]
+
+_curveRequest = None       # the curves the traceBuildCurves command should make next (see buildCurves)
+
+def buildCurves( shapes, names, parent=None ):
+    """ Creates a curve for each BSpline (named after names, under the parent
+        transform) in one pass through the API -- no selection changes and
+        no per-curve commands.  The curves are made by the traceBuildCurves
+        command (a plug-in), so they go on the undo queue like any other
+        nodes.  Returns the long names of the new curves. """
+    global _curveRequest
+    if not mc.pluginInfo( "traceBuildCurves.py", query=True, loaded=True ):
+        mc.loadPlugin( "traceBuildCurves.py", quiet=True )
+    _curveRequest = ( list(shapes), list(names), parent )
+    try:
+        return mc.traceBuildCurves() or []
+    finally:
+        _curveRequest = None
+
+def takeCurveRequest():
+    """ Hands the curves passed to buildCurves over to the traceBuildCurves command """
+    global _curveRequest
+    request, _curveRequest = _curveRequest, None
+    return request
+
+def createCurves( shapes, names, parent=None ):
+    """ Makes the curves for buildCurves (and the traceBuildCurves command's redo).
+        Each curve's pivot is centered on it (like xform -cp).  Returns the
+        MObjects of the new curve transforms. """
+    parentObj = om.MObject()
+    if parent:
+        sel = om.MSelectionList()
+        sel.add( parent )
+        sel.getDependNode( 0, parentObj )
+    # make all the transforms at once
+    dagMod = om.MDagModifier()
+    xforms = []
+    for name in names:
+        xform = dagMod.createNode( "transform", parentObj )
+        dagMod.renameNode( xform, name )
+        xforms.append( xform )
+    dagMod.doIt()
+    # then give each one its curve shape
+    fnCurve = om.MFnNurbsCurve()
+    fnXform = om.MFnTransform()
+    for xform, shape in zip( xforms, shapes ):
+        cvs = om.MPointArray()
+        for x, y, z in shape.cvs:
+            cvs.append( om.MPoint( x, y, z ) )
+        knots = om.MDoubleArray()
+        for k in shape.knots:
+            knots.append( k )
+        fnCurve.create( cvs, knots, shape.degree, om.MFnNurbsCurve.kOpen, False, False, xform )
+        fnXform.setObject( xform )
+        fnCurve.setName( fnXform.name()+"Shape" )
+        center = om.MPoint( *[ 0.5*(min([cv[i] for cv in shape.cvs])+max([cv[i] for cv in shape.cvs])) for i in range(3) ] )
+        fnXform.setRotatePivot( center, om.MSpace.kTransform, False )
+        fnXform.setScalePivot( center, om.MSpace.kTransform, False )
+    return xforms
+
 # utility function
 def remap( v, fromLo, fromHi, toLo, toHi):
     """ remaps a value (v) from one range to another """
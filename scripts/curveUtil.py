@@ -5,11 +5,16 @@
 
 from math import *
 from Vector import *
+from BSpline import *
+from ArcLengthTable import *
+from PerlinNoise import *
 
-import maya.cmds as mc
-import maya.mel as mm
-
-mc.loadPlugin("closestPointOnCurve", quiet=True)
+try:
+    import maya.cmds as mc
+    import maya.mel as mm
+    import maya.OpenMaya as om
+except ImportError:     # running headless (outside of Maya)
+    mc = mm = om = None
 
 def drawLine(pt1, pt2):
     try:    # if pt1 and pt2 are Vectors
@@ -23,105 +28,137 @@ def connectedNodeOfType( curve, type ):
             return node.split('.')[0].split('>')[-1]
     return None
           
-def getCurveInfoNode( curve ):
-    infoNode = connectedNodeOfType( curve, "curveInfo" )
-    if not infoNode:
-        print "adding an info node to curve: "+curve
-        infoNode = mc.createNode("curveInfo")
-        mc.connectAttr( curve+".worldSpace", infoNode+".inputCurve")
-    return infoNode
-
-def getCurveArcLenDimNode( curve ):
-    arcLenDimNode = connectedNodeOfType( curve, "arcLengthDimension" )
-    if not arcLenDimNode:
-        max = mc.getAttr( curve+".maxValue" )
-        print "adding an arcLengthDimension node to curve: "+curve
-        arcLenDimNode = mc.arcLengthDimension( curve+".u[%f]"%max )
-    return arcLenDimNode
-
-def getClosestPointNode( curve ):
-    cpNode = connectedNodeOfType( curve, "closestPointOnCurve" )
-    if not cpNode:
-        print "adding a closestPointOnCurve node to curve: "+curve
-        cpNode = mc.closestPointOnCurve(curve);
-    return cpNode
-
 def findParamAtPoint( curve, point ):
-    cpNode = getClosestPointNode( curve )
-    mc.setAttr(cpNode+".inPosition", point[0], point[1], point[2] )
-    return mc.getAttr(cpNode+".paramU")
+    """ Returns the U parameter of the point on the curve closest to the (world space) point """
+    return closestOnCurve( curve, [point] )[0][0]
+
+class CurveMeasurements:
+    """ What is known about one curve: its ArcLengthTable.  Dirty callbacks
+        on the curve's shape and transform drop it as soon as the curve
+        changes (or moves), so looking it up doesn't have to read the curve
+        to find out. """
+
+    def __init__( self, handle, transform ):
+        self.handle = handle
+        self.table = None       # the curve's (world space) ArcLengthTable (measured on demand)
+        self.callbacks = [ om.MNodeMessage.addNodeDirtyCallback( node, self.Dirty ) for node in (handle.object(), transform) ]
+
+    def Table( self, curve ):
+        if self.table is None:
+            self.table = ArcLengthTable( *curveData( curve ) )
+        return self.table
+
+    def Dirty( self, *args ):
+        self.table = None
+
+    def Forget( self ):
+        for callback in self.callbacks:
+            try:
+                om.MMessage.removeCallback( callback )
+            except RuntimeError:    # (Maya already removed it, along with its node)
+                pass
+        self.callbacks = []
+
+_curves = {}    # hash code of a curve shape's MObjectHandle -> its CurveMeasurements
+
+def curveMeasurements( curve ):
+    """ Returns the CurveMeasurements of a curve (by name), starting them the first time it is measured """
+    sel = om.MSelectionList()
+    sel.add( curve )
+    dag = om.MDagPath()
+    sel.getDagPath( 0, dag )
+    transform = dag.transform()
+    if dag.node().hasFn( om.MFn.kTransform ):
+        dag.extendToShape()
+    handle = om.MObjectHandle( dag.node() )
+    entry = _curves.get( handle.hashCode() )
+    if not entry or not entry.handle.isAlive() or not entry.handle == handle:
+        pruneCurves()
+        entry = _curves[ handle.hashCode() ] = CurveMeasurements( handle, transform )
+    return entry
+
+def pruneCurves():
+    """ Drops the measurements of the curves that have been deleted """
+    for key, entry in _curves.items():
+        if not entry.handle.isAlive():
+            entry.Forget()
+            del _curves[key]
+
+def forgetCurves():
+    """ Drops the measurements of every curve (e.g. when another scene is opened) """
+    for entry in _curves.values():
+        entry.Forget()
+    _curves.clear()
+
+def arcLengthTable( curve ):
+    """ Returns the (world space) ArcLengthTable of a curve, measuring the curve only if it changed """
+    return curveMeasurements( curve ).Table( curve )
+
+def curveBSpline( curve ):
+    """ Returns the (world space) shape of a curve as a BSpline, for evaluating it without the DG """
+    return arcLengthTable( curve ).curve
+
+def closestOnCurve( curve, points ):
+    """ Batch query: returns the U parameters, the arc lengths and the closest points on the curve
+        for a list of (world space) points, with no helper nodes.  Only the curve's arc length
+        table is cached (the points of a drag are rarely asked about twice) """
+    table = arcLengthTable( curve )
+    params = [ table.curve.ClosestParam( (p[0], p[1], p[2]) ) for p in points ]
+    return params, [ table.ArcLen( u ) for u in params ], [ table.curve.Point( u ) for u in params ]
 
 def findArcLenAtParam( curve, param ):
-    arcLenDimNode = getCurveArcLenDimNode( curve )
-    mc.setAttr( arcLenDimNode+".uParamValue", param )
-    return mc.getAttr( arcLenDimNode+".arcLength" )
+    return arcLengthTable( curve ).ArcLen( param )
 
 def curveArcLen( curve ):
-    max = mc.getAttr( curve+".maxValue" )
-    arcLength = findArcLenAtParam( curve, max )
-    return arcLength
+    return arcLengthTable( curve ).length
 
 def findParamAtArcLen( curve, distance, epsilon=0.0001 ):
     """ Returns the U parameter value at a specified length along a curve
-        (Adapted from: http://ewertb.soundlinker.com/mel/mel.108.php) """
-    
-    u = 0.0
-
-    min = mc.getAttr( curve+".minValue" )
-    max = mc.getAttr( curve+".maxValue" )
-
-    arcLength = findArcLenAtParam( curve, max )
-
-    # Don't bother doing any work for the start or end of the curve.
-    if ( distance <= 0.0 ):
-        return 0.0
-    if ( distance >= arcLength ):
-        return max
-
-    # This is merely a diagnostic to measure the number of passes required to 
-    # find any particular point. You may be surprised that the number of 
-    # passes is typically quite low.
-    passes = 1
-
-    while ( True ):
-        u = ( min + max ) / 2.0
-        #mc.setAttr( arcLenDimNode+".uParamValue", u)
-        arcLength = findArcLenAtParam( curve, u ) #mc.getAttr( arcLenDimNode+".arcLength" )
-        if ( abs(arcLength-distance) < tol ):
-            break
-        if ( arcLength > distance ):
-            max = u
-        else:
-            min = u
-        passes+=1
-
-    return u
+        (epsilon is no longer used: the lookup is exact to the arc length table) """
+    return arcLengthTable( curve ).Param( distance )
 
 def findParamAtArcPercent( curve, percent, epsilon=0.0001 ):
     """ Returns the U parameter value at a specified % of the length along a curve """
-
-    max = mc.getAttr( curve+".maxValue" )
-    arcLength = findArcLenAtParam( curve, max ) 
-    return findParamAtArcLen( curve, percent*arcLength, epsilon )
+    return arcLengthTable( curve ).ParamAtPercent( percent )
 
 def findCVsInRange( curve, start, end ):
     """ Returns a list of the (index, u)'s of the CVs of "curve" that have u parameter
         values between "start" and "end" (percentages of arc length) """
     indices = []
     if( end >= start and start >= 0.0 and end <= 1.0):
-        a = findParamAtArcPercent( curve, start )
-        b = findParamAtArcPercent( curve, end )
-        # get CV positions in local (object) space
-        CVs = mc.getAttr( curve+".cv[*]" )
-        # translate them into global (world) space
-        CVs = [(Vector(cv)+Vector(mc.xform(curve, q=True, ws=True, translation=True))).asTuple() for cv in CVs]
-        for I,cv in enumerate(CVs):
-            U = findParamAtPoint(curve, cv)
-            L = findArcLenAtParam(curve, U)/curveArcLen(curve)  # arc length as a percentage
+        table = arcLengthTable( curve )
+        a = table.ParamAtPercent( start )
+        b = table.ParamAtPercent( end )
+        # get CV positions in global (world) space, and find where they are on the curve (all at once)
+        params, arcLens, closest = closestOnCurve( curve, table.cvs )
+        for I,(U,arcLen) in enumerate(zip(params, arcLens)):
+            L = arcLen/table.length  # arc length as a percentage
             if( a <= U and U <= b ):
                 indices.append((I,U,L))
     return indices
     
+def curveData( curve, space=None ):
+    """ Returns the (degree, knots, CVs) of a NURBS curve (CVs in world space by default) """
+    sel = om.MSelectionList()
+    sel.add( curve )
+    dag = om.MDagPath()
+    sel.getDagPath( 0, dag )
+    fn = om.MFnNurbsCurve( dag )
+    knots = om.MDoubleArray()
+    fn.getKnots( knots )
+    cvs = om.MPointArray()
+    fn.getCVs( cvs, space or om.MSpace.kWorld )
+    return ( fn.degree(),
+             [knots[i] for i in range(knots.length())],
+             [(cvs[i].x, cvs[i].y, cvs[i].z) for i in range(cvs.length())] )
+
+def replaceCurveShape( curve, shape ):
+    """ Replaces the shape of curve with a (world space) BSpline, keeping the curve node """
+    m = mc.getAttr( curve+".worldInverseMatrix[0]" )      # bring the world space CVs into curve's space
+    cvs = [ ( x*m[0]+y*m[4]+z*m[8]+m[12], x*m[1]+y*m[5]+z*m[9]+m[13], x*m[2]+y*m[6]+z*m[10]+m[14] ) for x,y,z in shape.cvs ]
+    mc.curve( curve, replace=True, degree=shape.degree, p=cvs, k=shape.knots )
+    return curve
+
 def arcCurve( curve, t1, t2 ):
     """ Perturb the tangents on the initial curve """
     cv1 = list(mc.getAttr( curve+".cv[1]" )[0])
@@ -143,9 +180,7 @@ def evenlyDivideCurve( curve, numDiv ):
     mc.move(0, 0, 0, curve)
     mc.rotate(0, 0, 0, curve)
 
-    # get the curve info node
-    infoNode = getCurveInfoNode(curve)
-    Knots = list( mc.getAttr( infoNode+".knots" )[0] )
+    Knots = curveData( curve )[1]
     CVs = mc.getAttr( curve+".cv[*]" )
     numOrigCVs = len(CVs)
     numOrigKnots = len(Knots)
@@ -188,48 +223,121 @@ def smoothstep(a, fuzz, t):
 def pulse(a, b, fuzz, t):
     return smoothstep(a, fuzz, t) - smoothstep(b, fuzz, t)
 
+def pulses(a, b, fuzz, ts):
+    """ pulse for each of a list of values """
+    return [ pulse(a, b, fuzz, t) for t in ts ]
+
+class CurveDeformation:
+    """ A stack of deformations applied to the CVs of a curve (that lie between
+        "start" and "end", as percentages of arc length) in memory.  The CVs,
+        their places along the curve, their normals and easing weights are
+        read once; each deformer then moves the CVs, and Write puts them all
+        back on the curve in one call.  A deformer is a function that takes
+        the CurveDeformation and updates its cvs -- e.g.
+
+            d = CurveDeformation( curve, 0.2, 0.8 )
+            d.Apply( oscillate( 4.0, 0.5 ), addNoise( 2.0, 0.3 ) )
+            d.Write() """
+
+    def __init__( self, curve, start=0.0, end=1.0, ease=0.5 ):
+        self.curve = curve
+        self.start = start
+        self.end = end
+        if(ease > (end-start)*0.5):         # ease must be between 0 and 0.5
+            ease = (end-start)*0.5
+        self.cvs = [ list(cv) for cv in curveData( curve, om.MSpace.kObject )[2] ]
+        self.indices = []   # which CVs are in range
+        self.params = []    # their U parameters
+        self.lengths = []   # their arc lengths (as percentages)
+        if start < end:
+            for (I,U,L) in findCVsInRange( curve, start, end ):
+                self.indices.append( I )
+                self.params.append( U )
+                self.lengths.append( L )
+        self.interp = [ (L-start)/(end-start) for L in self.lengths ]
+        self.weights = pulses( start+ease, end, ease, self.lengths )
+        # Don't use Maya's normalized normal -- it flip flops with curvature so it's not good for oscillating offset
+        self.normals = []
+        for tangent in curveBSpline( curve ).Tangents( self.params ):
+            normal = Vector(0,1,0)**Vector(tangent)
+            if normal.mag() > 0:
+                normal = normal.norm()
+            self.normals.append( normal.asList() )
+
+    def Offset( self, amounts ):
+        """ Moves each CV in range along its normal by the given amounts (eased by its weight) """
+        for I, normal, weight, amount in zip( self.indices, self.normals, self.weights, amounts ):
+            d = weight*amount
+            cv = self.cvs[I]
+            self.cvs[I] = [ cv[0]+d*normal[0], cv[1]+d*normal[1], cv[2]+d*normal[2] ]
+
+    def Apply( self, *deformers ):
+        for deformer in deformers:
+            deformer( self )
+        return self
+
+    def Write( self ):
+        """ Puts all the CVs back on the curve at once """
+        sel = om.MSelectionList()
+        sel.add( self.curve )
+        dag = om.MDagPath()
+        sel.getDagPath( 0, dag )
+        fn = om.MFnNurbsCurve( dag )
+        cvs = om.MPointArray()
+        for x, y, z in self.cvs:
+            cvs.append( om.MPoint( x, y, z ) )
+        fn.setCVs( cvs, om.MSpace.kObject )
+        fn.updateCurve()
+        return self.curve
+
+def oscillate( freq=1.0, strength=1.0 ):
+    """ Deformer: moves the CVs in an alternating direction along their normals """
+    def deform( d ):
+        d.Offset( [ strength*sin(freq*interp) for interp in d.interp ] )
+    return deform
+
+def addNoise( freq=1.0, strength=1.0 ):
+    """ Deformer: moves the CVs along their normals by Perlin noise """
+    def deform( d ):
+        d.Offset( [ strength*n for n in noises( [freq*interp for interp in d.interp] ) ] )
+    return deform
+
+def twist( freq=1.0, strength=1.0 ):
+    """ Deformer: twists the CVs about the X axis (in world space) """
+    def deform( d ):
+        points = arcLengthTable( d.curve ).points      # (the curve's bounds are measured once)
+        boundsXmin = min( [p[0] for p in points] )
+        boundsWidth = max( [p[0] for p in points] ) - boundsXmin
+        boundsZcenter = 0.5*( min( [p[2] for p in points] ) + max( [p[2] for p in points] ) )
+        for I, scale in zip( d.indices, d.weights ):
+            cv = d.cvs[I]
+            twistT = (((cv[0] - boundsXmin)/boundsWidth))*2*pi*freq
+            d.cvs[I] = [ cv[0],
+                         0,
+                         scale*strength*((cv[2]-boundsZcenter)*sin(twistT) + cv[1]*cos(twistT)) + boundsZcenter ]
+    return deform
+
 def oscillateCurve( curve, start=0.0, end=1.0, freq=1.0, ease=0.5, strength=1.0 ):
     """ Oscillates a given curve by moving each vertex in an alternating
         direction based on the normal.  This process takes place over the
         range defined by "start" and "end" as percentages of arc length.
         Oscillation eases to full strength as determined by the "ease" and
         "strength" arguments. """
-    if(ease > (end-start)*0.5):
-        ease = (end-start)*0.5
-    if(start < end):
-        CVs = mc.getAttr( curve+".cv[*]" )
-        newCVs = findCVsInRange(curve, start, end)
-        for (I,U,L) in newCVs:
-            interp = (L-start)/(end-start)
-            osc = sin(freq*interp)
-            scale = pulse(start+ease, end, ease, L)  # ease must be between 0 and 0.5
-## Don't use Maya's normalized normal -- it flip flops with curvature so it's not good for oscillating offset
-#            normal = Vector(mc.pointOnCurve(curve, parameter=cv[1], normalizedNormal=True))
-#            if(normal.mag() == 0.0):
-#                print "Getting normal from up x tangent"
-            normal = Vector(0,1,0)**Vector(mc.pointOnCurve(curve, parameter=U, tangent=True))
-            normal = normal.norm()
-            pos = Vector(CVs[I])
-            pos = pos+normal*scale*strength*osc
-            CVs[I] = pos.asTuple()
-
-    for i,cv in enumerate(CVs):
-        mc.setAttr(curve+".cv[%d]"%i, cv[0], cv[1], cv[2])
-
-    return curve
+    return CurveDeformation( curve, start, end, ease ).Apply( oscillate( freq, strength ) ).Write()
 
 def noise(x=0, y=None, z=None):
     """ Returns a Perlin noise value based on 1D or 3D input """
     try:
         if( isinstance(x, Vector) ):                                 # if x is a Vector
-            return mm.eval("noise <<%f, %f, %f>>"%x.asTuple())
+            return noise3( x.x, x.y, x.z )
         elif( len(x) == 3 ):                                    # if x is a sequence
-            return mm.eval("noise <<%f, %f, %f>>"%x)
-    except:
-        if(not y == None and not z == None):                # if y and z have values
-            return mm.eval("noise <<%f, %f, %f>>"%(x,y,z))
-        else:                                               # otherwise just use 1D data
-            return mm.eval("noise %f"%x)
+            return noise3( x[0], x[1], x[2] )
+    except TypeError:
+        pass
+    if(not y == None and not z == None):                # if y and z have values
+        return noise3( x, y, z )
+    else:                                               # otherwise just use 1D data
+        return noise1( x )
 
 def noiseCurve( curve, start=0.0, end=1.0, freq=1.0, ease=0.5, strength=1.0 ):
     """ Adds noise to a given curve by moving each vertex with Perlin
@@ -237,52 +345,16 @@ def noiseCurve( curve, start=0.0, end=1.0, freq=1.0, ease=0.5, strength=1.0 ):
         range defined by "start" and "end" as percentages of arc length.
         Noise eases to full strength as determined by the "ease" and
         "strength" arguments. """
-    if(ease > (end-start)*0.5):         # ease must be between 0 and 0.5
-        ease = (end-start)*0.5
-    if(start < end):
-        CVs = mc.getAttr( curve+".cv[*]" )
-        newCVs = findCVsInRange(curve, start, end)
-        for (I,U,L) in newCVs:
-            interp = (L-start)/(end-start)
-            noiz = noise(freq*interp)
-            scale = pulse(start+ease, end, ease, L)  
-            normal = Vector(0,1,0)**Vector(mc.pointOnCurve(curve, parameter=U, tangent=True))
-            normal = normal.norm()
-            pos = Vector(CVs[I])
-            pos = pos+normal*scale*strength*noiz
-            CVs[I] = pos.asTuple()
-    for i,cv in enumerate(CVs):
-        print(curve+".cv[%d]"%cv[0], cv[0], cv[1], cv[2])
-        mc.setAttr(curve+".cv[%d]"%i, cv[0], cv[1], cv[2])
+    CurveDeformation( curve, start, end, ease ).Apply( addNoise( freq, strength ) ).Write()
 
 def twistCurve( curve, start=0.0, end=1.0, freq=1.0, ease=0.5, strength=1.0 ):
     """ Twist the curve over the range defined by "start" and "end" as percentages of arc length.
         The twist operation happens in world space. Twist eases to full strength as determined by
         the "ease" and "strength" arguments. """
-    if(ease > (end-start)*0.5):         # ease must be between 0 and 0.5
-        ease = (end-start)*0.5
-    if(start < end):
-        CVs = mc.getAttr( curve+".cv[*]" )
-        newCVs = findCVsInRange(curve, start, end)
-        for (I,U,L) in newCVs:
-            interp = (L-start)/(end-start)
-            bounds = mc.exactWorldBoundingBox(curve)
-            boundsXmin = bounds[0]
-            boundsWidth = bounds[3] - bounds[0]
-            boundsZcenter = (bounds[2]+bounds[5])*0.5
-            scale = pulse(start+ease, end, ease, L)
-            twistT = (((CVs[I][0] - boundsXmin)/boundsWidth))*2*pi*freq
-            print "(((%f - %f)/%f)) = %f  -->  %f"%(CVs[I][0],boundsXmin,boundsWidth,(((CVs[I][0] - boundsXmin)/boundsWidth)), twistT)
-            CVs[I] = (CVs[I][0],
-                      0, 
-                      scale*strength*((CVs[I][2]-boundsZcenter)*sin(twistT) + CVs[I][1]*cos(twistT)) + boundsZcenter)
-                      
-    for i,cv in enumerate(CVs):
-        mc.setAttr(curve+".cv[%d]"%i, cv[0], cv[1], cv[2])
+    CurveDeformation( curve, start, end, ease ).Apply( twist( freq, strength ) ).Write()
         
 def printCurveDetails( curve ):
-    infoNode = getCurveInfoNode(curve)
-    Knots = list( mc.getAttr( infoNode+".knots" )[0] )
+    Knots = curveData( curve )[1]
     CVs = mc.getAttr( curve+".cv[*]" )
     print "Curve Details for: "+curve
     for k in Knots:
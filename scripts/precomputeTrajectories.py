@@ -0,0 +1,81 @@
+## Precompute Trajectories
+## Samples the motion of every traceable object with a pool of headless worker processes
+## ACCAD, The Ohio State University
+## 2013
+##
+## Usage (from a shell):
+##     mayapy precomputeTrajectories.py SCENE_FILE STORE_FILE [NUM_WORKERS] [SUBSTEPS]
+## and then, in Maya, load the result with:
+##     traceSelect = traceSelectTool.main(store="STORE_FILE")
+
+import sys, multiprocessing
+from MotionSampler import *
+from TrajectoryStore import *
+
+_scene = None       # the scene backend of this worker process (opened once per worker)
+
+def openMayaScene( scenePath ):
+    """ The default scene factory: starts Maya (headless) in a mayapy worker and opens the scene """
+    import maya.standalone
+    maya.standalone.initialize( name='python' )
+    import maya.cmds as mc
+    mc.file( scenePath, open=True, force=True )
+    return MayaScene()
+
+def initWorker( sceneFactory, scenePath ):
+    """ Runs once in each worker process """
+    global _scene
+    _scene = sceneFactory( scenePath )
+
+def describeScene( traceables ):
+    """ Worker job: returns the roots, the traceables and the playback range of the scene """
+    roots, traceableObjs = _scene.FindTraceables( traceables )
+    return roots, traceableObjs, _scene.PlaybackRange()
+
+def sampleChunk( job ):
+    """ Worker job: samples some of the roots over some of the times and returns a TrajectoryStore """
+    roots, traceableObjs, substeps, times = job
+    sampler = MotionSampler( roots, traceableObjs, substeps, scene=_scene )
+    sampler.Sample( times )
+    store = TrajectoryStore( substeps )
+    store.AddSamples( sampler )
+    return store
+
+def splitWork( roots, times, numWorkers ):
+    """ Splits the roots into groups and the times into contiguous chunks,
+        so that there are about two jobs for each worker """
+    numRootGroups = max( 1, min( len(roots), numWorkers ) )
+    numTimeChunks = max( 1, min( len(times), (2*numWorkers)//numRootGroups ) )
+    rootGroups = [ roots[i::numRootGroups] for i in range(numRootGroups) ]
+    chunkLen = (len(times)+numTimeChunks-1)//numTimeChunks
+    timeChunks = [ times[i:i+chunkLen] for i in range(0, len(times), chunkLen) ]
+    return [ (group, chunk) for group in rootGroups for chunk in timeChunks if group and chunk ]
+
+def precompute( scenePath, storePath=None, numWorkers=None, substeps=1, traceables=None, sceneFactory=openMayaScene ):
+    """ Samples the scene with a pool of worker processes, merges their results into
+        one TrajectoryStore and (optionally) saves it.  sceneFactory(scenePath) builds
+        each worker's scene backend (e.g. a FakeScene, for testing without mayapy) """
+    numWorkers = numWorkers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool( numWorkers, initWorker, (sceneFactory, scenePath) )
+    try:
+        roots, traceableObjs, (startFrame, endFrame) = pool.apply( describeScene, (traceables,) )
+        times = sampleTimes( startFrame, endFrame, substeps )
+        jobs = [ (group, traceableObjs, substeps, chunk) for group, chunk in splitWork( roots, times, numWorkers ) ]
+        store = TrajectoryStore( substeps )
+        for part in pool.imap_unordered( sampleChunk, jobs ):
+            store.Merge( part )
+    finally:
+        pool.close()
+        pool.join()
+    if storePath:
+        store.Save( storePath )
+    return store
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: mayapy precomputeTrajectories.py SCENE_FILE STORE_FILE [NUM_WORKERS] [SUBSTEPS]")
+        sys.exit(1)
+    numWorkers = len(sys.argv) > 3 and int(sys.argv[3]) or None
+    substeps = len(sys.argv) > 4 and int(sys.argv[4]) or 1
+    store = precompute( sys.argv[1], sys.argv[2], numWorkers, substeps )
+    print("saved %d roots x %d samples to %s"%(len(store.joints), len(store.times), sys.argv[2]))
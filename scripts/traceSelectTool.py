@@ -3,12 +3,31 @@
 ## ACCAD, The Ohio State University
 ## 2012-13
 
-import maya.cmds as mc          
-import maya.mel as mm
+try:
+    import maya.cmds as mc
+    import maya.mel as mm
+except ImportError:     # running headless (outside of Maya)
+    mc = mm = None
 from Plane import *                 # for interaction plane calculations
 from Trajectory import *            # for building motion trajectory curves
+from MotionIndex import *           # for bulk (lasso/volume) selection of motion
+from Cylinder import *              # for selecting the motion inside a volume
+from MotionSampler import *         # for sampling the motion of all the traceables in one pass
+from TrajectoryStore import *       # for loading motion that was sampled ahead of time
+from TrajectoryCache import *       # for reusing motion that was sampled in an earlier session
 import buildMotionTraces as bmt
+import curveUtil as cu
+import ChangeTracker as ct          # for finding out which parts of the motion were edited
+import SelectionIndex as si         # for the metadata of each selection (shared with the Trace Move Tool)
+from Profiler import *              # for timing the gestures (see profile below)
+from GestureContext import *        # for remembering the view for the length of a gesture
+from GestureSolver import *         # for budgeting the matching done on each drag event
+from JobScheduler import *          # for fitting curves (etc.) off the UI thread
+from RootBounds import *            # for the bounds of each rig (without asking the viewport)
+from NodeRegistry import *          # for keeping track of the nodes the tool makes
+from SelectionCurvePool import *    # for reusing the selection curves
 import sys, time
+from math import radians, sin
 
 debug = 0
         
@@ -18,55 +37,89 @@ class TraceSelection:
         self.traceableObjs = traceableObjs  # the list of joints to pay attention to (ignore the rest)
         
         self.substeps = 1             # precision settings
+        self.adaptive = None          # adaptive sampling tolerance (None samples every substep uniformly)
         self.dragDensity = 0.2
 
         self.selectedMotions = {}     # a dictionary to hold the selected motions for each root
         self.motionPathsVisible = {}  # a dictionary to remember whether (or not) the motion paths for a root were visible when the interaction started
 
         self.forceReload = False      # force the re-definition of the tool?
+
+        self.lassoMode = False        # select motion in bulk (across all trajectories) by drawing a lasso?
+        self.lassoPoints = []         # the lasso drawn during the current gesture
+        self.motionIndex = None       # spatial index over all the trajectories (reprojected when the view changes)
         
         # for keeping track of time when mousePressed (when selection started)
         self.startTime = 0
 
         # make an empty trajectory dictionary
         self.trace = {}
+        self.sampler = None           # the shared cache of sampled joint positions (filled on first use)
+        self.scene = MayaScene()      # the backend used to sample the scene (see SceneBackend.py)
+        self.versions = {}            # root -> how many times its samples have been patched (for invalidating caches)
+        self.cacheKeys = {}           # root -> key of its motion in the on-disk TrajectoryCache
+        self.cache = None             # the on-disk TrajectoryCache (if any)
+        self.cachedRoots = []         # the roots whose motion came from the on-disk cache
+
+        self.pendingRoots = []        # roots that are still waiting to be loaded (in priority order)
+        self.idleChunkSize = 1        # how many roots to load each time Maya is idle
+        self.idleJob = None           # the scriptJob that loads the pending roots
+        self.lodDistances = [2.0, 6.0]  # switch to coarser motion paths beyond these multiples of the fit-one camera distance
+        self.lodLevels = {}           # root -> the level of detail its motion paths are showing
+        self.cameraJob = None         # the scriptJob that updates the levels of detail when the camera moves
+        self.sceneJob = None          # the scriptJob that clears the caches when the scene is cleared (see WatchScene)
+        self.watchedCamera = None
         self.nearestRoot = None
         self.nearestPath = None
         self.interactionPlane = None
-
-        # measure the fit-one truck distance for the camera
-        mc.select( xformRoots[0] )
-        mc.viewFit()
-        self.viewFitDistance = self.CameraToPopDist()
-        # zoom back out to view all
-        mc.select(clear=True)
-        mc.viewFit()
+        self.gesture = None           # the GestureContext of the current gesture (made on press)
+        self.solver = GestureSolver() # when to re-solve the DTWs and refresh the view while dragging
+        self.jobs = JobScheduler()    # runs pure Python work (e.g. curve fitting) on worker threads
+        self.bounds = RootBounds()    # the cached bounding box of each root (see RootBox)
+        self.registry = NodeRegistry()  # the nodes the tool made ("motionTraces" groups, "debug" locators)
+        self.selectionPool = SelectionCurvePool( self.registry )  # the curves that show the selected motions
+        self.selectionPoolSize = 4    # how many selection curves to build ahead of time
 
 
+    @profiled("TraceGesturePress")
     def TraceGesturePress( self ):
         """ Procedure called on press """
         if debug>0: print("begin PRESS")
-        # Clean up: if there are any locators or groups in the scene, delete them
-        if( len(mc.ls("locator*")) > 0 ):
-            mc.delete(mc.ls("locator*"))
-        if( len(mc.ls("*Grp")) > 0 ):
-            mc.delete(mc.ls("*Grp"))
+        # bring the trajectories up to date with any edits made since the last gesture
+        with profiler.Phase("RefreshDirtyMotion"):
+            self.RefreshDirtyMotion()
+        self.WatchCamera()      # (in case the user looked through another camera)
+        # Clean up: delete the debugging locators (and groups) of the last gesture
+        self.registry.Delete( "debug" )
 
         # find the position of the mouse click
         pressPosition = Vector( mc.draggerContext( 'TraceGesture', query=True, anchorPoint=True) )
 
-        camPos = self.CameraPosition()
-        viewAxis = self.CameraViewAxis()
-        closestObj2Cam = self.FindNearestObjectToCamera()
+        # remember the camera, modifiers, etc. for the rest of the gesture
+        self.gesture = GestureContext( 'TraceGesture' )
+        camPos = self.gesture.cameraPosition
+        viewAxis = self.gesture.viewAxis
+        closestObj2Cam = self.FindNearestObjectToCamera( camPos )
         self.interactionPlane = Plane(viewAxis,closestObj2Cam)
+        self.gesture.plane = self.interactionPlane
 
         pressPosition = self.FindRayPlaneIntersect( camPos, pressPosition, self.interactionPlane )
+        if not self.lassoMode:
+            with profiler.Phase("LoadRootNearPress"):
+                self.LoadRootNearPress( pressPosition )
         if debug > 0:
-            mc.group(n="traceGrp",empty=True)
+            self.registry.Add( "debug", mc.group(n="traceGrp",empty=True) )
             loc = mc.spaceLocator(p=pressPosition)
             mc.parent(loc,"traceGrp")
 
-        for root in self.xformRoots:
+        if self.lassoMode:
+            # start a new lasso (the selection happens on release)
+            self.lassoPoints = [ pressPosition ]
+            self.startTime = time.time()
+            if debug>0: print("end PRESS")
+            return
+
+        for root in self.LoadedRoots():
             # remember whether (or not) the motion paths for a root were visible when the interaction started
             self.motionPathsVisible[root] = mc.getAttr("%s_MotionTraces.visibility"%root)
             # set up all the traces
@@ -75,82 +128,107 @@ class TraceSelection:
             self.trace[root].normal = self.interactionPlane.normal #Vector( mc.xform(mc.lookThru(q=True), q=True, m=True)[8:11] )
             self.trace[root].planePt = self.interactionPlane.point #closestObj2Cam
 
-        self.nearestRoot, rootDist = self.FindNearestRoot( pressPosition, self.interactionPlane )
+        # find the nearest root and motion path (and time) with one query of the spatial index
+        self.nearestRoot, self.nearestPath, nearestTime, rootDist = self.FindNearestMotion( pressPosition, camPos=camPos )
         mc.setAttr("%s_MotionTraces.visibility"%self.nearestRoot, 1)   # vis the new display layer
+        # only the nearest root's joints get matched against the gesture (the hit test pruned the rest)
+        profiler.Count( "joints pruned", sum( [ len(self.trace[r].searchList) for r in self.LoadedRoots() if r != self.nearestRoot ] ) )
 
         # make a group to hold the trace locators
         if debug > 0:
-            mc.group(name="trace%sGrp"%self.nearestRoot,empty=True)
+            self.registry.Add( "debug", mc.group(name="trace%sGrp"%self.nearestRoot,empty=True) )
             loc = mc.spaceLocator(p=pressPosition)
             mc.parent(loc,"trace%sGrp"%self.nearestRoot)
         # reset the trace
         self.trace[self.nearestRoot].Clear()
         # start the timer
         self.startTime = time.time()
+        self.solver.Start()
         # set the trace normal to the viewing normal of the camera
-        self.trace[self.nearestRoot].normal = Vector( mc.xform(mc.lookThru(q=True), q=True, m=True)[8:11] )
+        self.trace[self.nearestRoot].normal = self.gesture.viewAxis
         self.trace[self.nearestRoot].planePt = closestObj2Cam
+        self.gesture.SetPlane( self.gesture.viewAxis, closestObj2Cam )
                 
         # add the initial click position to the trace
         self.trace[self.nearestRoot].AddPoint( pressPosition )
+        self.gesture.lastPoint = pressPosition
         
-        self.nearestPath, pathDist = self.FindNearestMotionPath( pressPosition, self.nearestRoot )
-        if not mc.draggerContext( 'TraceGesture', query=True, modifier=True) == "ctrl":
-            self.trace[self.nearestRoot].SetUpDTWs()
+        if not self.gesture.Held("ctrl"):
+            with profiler.Phase("SetUpDTWs"):
+                self.trace[self.nearestRoot].SetUpDTWs( camPos )
             mc.refresh(currentView=True,force=True)
         if debug>0: print("end PRESS")
 
+    @profiled("TraceGestureDrag")
     def TraceGestureDrag( self ):
         """ Procedure called on drag """
         # find the current position of the mouse drag
         if debug>0: print("begin DRAG")
 
-        if not mc.draggerContext( 'TraceGesture', query=True, modifier=True) == 'shift':
+        if self.lassoMode:
+            dragPosition = self.gesture.DragPosition()
+            if (dragPosition-self.lassoPoints[-1]).mag() > self.dragDensity:
+                self.lassoPoints.append( dragPosition )
+            if debug>0: print("end DRAG")
+            return
+
+        if not self.gesture.Held('shift'):
             if self.nearestRoot in self.selectedMotions.keys():
-                for sm in self.selectedMotions[ self.nearestRoot ]:
-                    if mc.objExists(sm):
-                        mc.delete( sm )
+                self.selectionPool.Release( self.selectedMotions[ self.nearestRoot ] )
                 del self.selectedMotions[ self.nearestRoot ]
 
-        currentCam = mc.lookThru(q=True)
-        camPos = Vector(mc.xform(currentCam,q=True,t=True))
-        dragPosition = Vector( mc.draggerContext( 'TraceGesture', query=True, dragPoint=True) )
-        dragPosition = self.FindRayPlaneIntersect( camPos, dragPosition, Plane(self.trace[self.nearestRoot].normal,self.trace[self.nearestRoot].planePt) )
+        dragPosition = self.gesture.DragPosition()
         # find the last recorded drag position
-        lastDragPosition = self.trace[self.nearestRoot].points[ sorted(self.trace[self.nearestRoot].points.keys())[-1] ]
+        lastDragPosition = self.gesture.lastPoint
         # find the drag distance
         dragDist = (dragPosition-lastDragPosition).mag()
-        # if far enough away from last drag position, add a new trace point and re-solve the DTWs
+        # if far enough away from last drag position, add a new trace point
         if dragDist > self.dragDensity :
-            self.trace[self.nearestRoot].AddPoint( dragPosition )
+            self.solver.Add( self.trace[self.nearestRoot], dragPosition )
+            self.gesture.lastPoint = dragPosition
             if debug > 0:
                 loc = mc.spaceLocator(p=dragPosition)
                 mc.parent(loc,"traceGrp")
+        # re-solve the DTWs for all the points added since the last solve (if it fits in the budget)
+        with profiler.Phase("UpdateDTWs"):
+            self.solver.Solve( self.trace[self.nearestRoot] )
         if self.trace[self.nearestRoot].timespan and len(self.trace[self.nearestRoot].points) > 4*self.substeps and \
-           not mc.draggerContext( 'TraceGesture', query=True, modifier=True) == "ctrl":        
-            if debug > 0: print "DTW solved to timespan of ",trace[nearestRoot].timespan
-            mc.currentTime( self.trace[self.nearestRoot].timespan[1] )
-            if dragDist > self.dragDensity:
+           not self.gesture.Held("ctrl"):        
+            if debug > 0: print "DTW solved to timespan of ",self.trace[self.nearestRoot].timespan
+            if self.solver.SolutionDue():
+                mc.currentTime( self.trace[self.nearestRoot].timespan[1] )
                 mc.refresh(currentView=True,force=True)
-        elif dragDist > self.dragDensity:
+        elif dragDist > self.dragDensity and self.solver.RefreshDue():
             if debug > 0: print "No DTW, attempting closest path... point..."
             self.ScrubToNearestTimeOnPath( dragPosition, self.nearestRoot, self.nearestPath )
         if debug>0: print("end DRAG")    
     
+    @profiled("TraceGestureRelease")
     def TraceGestureRelease( self ):
         """ when the mouse is released, find the matching joint trajectory """
         if debug>0: print("begin RELEASE")
+        if self.lassoMode:
+            self.LoadAllRoots()             # (the lasso may cover rigs that haven't been loaded yet)
+            with profiler.Phase("Lasso"):
+                ranges = self.GetMotionIndex().Lasso( self.lassoPoints )
+            self.BulkSelectMotions( ranges )
+            self.lassoPoints = []
+            if debug>0: print("end RELEASE")
+            return
         releasePosition = Vector( mc.draggerContext( 'TraceGesture', query=True, dragPoint=True) ).projectToPlane( self.trace[self.nearestRoot].normal, planePt=self.trace[self.nearestRoot].planePt )
         if debug>0: print "release! ", releasePosition
         theTrace = self.trace[self.nearestRoot]
+        # finish with a full solve of any points the drags left pending
+        with profiler.Phase("UpdateDTWs"):
+            self.solver.Finish( theTrace )
         selectedMotion = None
         if theTrace.closestJoint and theTrace.timespan and (theTrace.timespan[1]-theTrace.timespan[0]) > 1 and \
-           not mc.draggerContext( 'TraceGesture', query=True, modifier=True) == "ctrl":        
+           not self.gesture.Held("ctrl"):        
             theDTW = theTrace.dtws[theTrace.closest]
             if debug > 0:
                 print "closest = ", theTrace.closestJoint, theTrace.timespan
                 if not mc.objExists("DTW_Y"):
-                    mc.group(n="DTW_Y",empty=True)
+                    self.registry.Add( "debug", mc.group(n="DTW_Y",empty=True) )
                 for pt in theDTW.Y:
                     loc = mc.spaceLocator(p=pt)
                     mc.parent(loc,"DTW_Y")
@@ -158,7 +236,8 @@ class TraceSelection:
 
             # Build the motion curve and store it's name in the selectedMotions dictionary
             duration = [ int(theTrace.timespan[0]), int(theTrace.timespan[1]+1) ]
-            keyframes = [ theTrace.searchList[theTrace.closestJoint].points[frame] for frame in range(duration[0],duration[1]) ]
+            points = theTrace.searchList[theTrace.closestJoint].points
+            keyframes = [ points[t] for t in sorted(points.keys()) if duration[0] <= t < duration[1] ]  # (samples need not be uniform)
             selectedMotion = bmt.CurveMotionTrace( theTrace.closestJoint, keys=keyframes ) #duration=theTrace.timespan )
             
         else:
@@ -175,27 +254,18 @@ class TraceSelection:
             if self.motionPathsVisible[self.nearestRoot] and mouse2path < 0.3:  
                 # Build the motion curve and store it's name in the selectedMotions dictionary
                 duration = [ mc.playbackOptions(q=True,min=True),mc.playbackOptions(q=True,max=True)+1 ]
-                keyframes = [ theTrace.searchList[self.nearestPath].points[frame] for frame in range(duration[0],duration[1]) ]
+                points = theTrace.searchList[self.nearestPath].points
+                keyframes = [ points[t] for t in sorted(points.keys()) if duration[0] <= t < duration[1] ]
                 selectedMotion = bmt.CurveMotionTrace( self.nearestPath, keys=keyframes ) #duration=[mc.playbackOptions(q=True,min=True),mc.playbackOptions(q=True,max=True)] )
 
             # if not scrubbing
-            if not mc.draggerContext( 'TraceGesture', query=True, modifier=True) == "ctrl" and \
-               cam2pop >= self.viewFitDistance:      # if trucked out, and mouse is clicked (w/ no drag)
+            if not self.gesture.Held("ctrl") and \
+               cam2pop >= self.FitDistance( self.nearestRoot ):      # if trucked out, and mouse is clicked (w/ no drag)
                 mc.select(self.nearestRoot)     # zoom in on the nearest root for a better view
                 mc.viewFit(fitFactor=2.5)            # the invisible parts of the roots can artificially enlarge the BB, so truck in a little extra
                 mc.select(clear=True)
         if selectedMotion:
-            selectedMotionCurve = selectedMotion.construct(self.nearestPath)
-            
-            if not self.nearestRoot in self.selectedMotions.keys():
-                self.selectedMotions[self.nearestRoot] = []
-            mc.setAttr("%s_MotionTraces.visibility"%self.nearestRoot, 0)
-            selectedMotionCurve = mc.rename(selectedMotionCurve, "%s_selection%d"%(self.nearestPath,len(self.selectedMotions[self.nearestRoot])))
-            self.selectedMotions[self.nearestRoot].append( selectedMotionCurve )
-            self.AddCustomAttr( selectedMotionCurve, "isTraceSelection", True )
-            self.AddCustomAttr( selectedMotionCurve, "interactTime", time.time()-self.startTime )
-            self.AddCustomAttr( selectedMotionCurve, "startFrame", duration[0] )
-            self.AddCustomAttr( selectedMotionCurve, "endFrame", duration[1] )
+            self.AddSelectedMotion( self.nearestRoot, self.nearestPath, selectedMotion, duration )
         mc.select(cl=True)
 ##        # select the related keyframes
 ##        if theTrace.closestJoint:
@@ -205,6 +275,65 @@ class TraceSelection:
 ##            for channel in self.GetAnimChans( jointParent ):
 ##                mc.selectKey( jointParent, time=(theTrace.timespan[0],theTrace.timespan[1]), attribute=channel.split(jointParent)[1].lstrip('_'), add=True )
 
+    def AddSelectedMotion( self, root, path, selectedMotion, duration ):
+        """ Shows a selected motion (on a curve from the pool) and stores its name in the selectedMotions dictionary """
+        shape = selectedMotion.fit()
+
+        if not root in self.selectedMotions.keys():
+            self.selectedMotions[root] = []
+        mc.setAttr("%s_MotionTraces.visibility"%root, 0)
+        record = si.describeSelection( path, duration[0], duration[1], time.time()-self.startTime )
+        selectedMotionCurve = self.selectionPool.Acquire( "%s_selection%d"%(path,len(self.selectedMotions[root])), shape, record )
+        self.selectedMotions[root].append( selectedMotionCurve )
+        return selectedMotionCurve
+
+    def GetMotionIndex( self, camPos=None ):
+        """ Returns the spatial index of all the trajectories, as seen from the current camera
+            (projected onto the interaction plane).  The samples are only projected again when the view changes """
+        if camPos is None:
+            camPos = self.CameraPosition()
+        if not self.interactionPlane:
+            self.interactionPlane = Plane( self.CameraViewAxis(), self.FindNearestObjectToCamera() )
+        view = ( self.interactionPlane.normal.asList(), self.interactionPlane.point.asList(), camPos.asList() )
+        if not self.motionIndex:
+            self.motionIndex = MotionIndex( self.trace, self.interactionPlane, camPos=camPos )
+            self.motionIndex.view = view
+        elif self.motionIndex.view != view:
+            # only the view changed, so project the samples again (instead of gathering them again)
+            self.motionIndex.Reproject( self.interactionPlane, camPos )
+            self.motionIndex.view = view
+        return self.motionIndex
+
+    def SelectMotionsInVolume( self, cylinder ):
+        """ Selects the motion of every trajectory (of every root) that passes through the given Cylinder """
+        self.startTime = time.time()
+        self.gesture = None             # (not part of a gesture)
+        self.LoadAllRoots()
+        self.BulkSelectMotions( self.GetMotionIndex().Volume( cylinder ) )
+
+    def BulkSelectMotions( self, ranges ):
+        """ Given the selected time ranges for each joint of each root
+            ({ root: { joint: [ [start, end], ... ] } }), build the selection curves """
+        if self.gesture:
+            shift = self.gesture.Held('shift')
+        else:
+            shift = mc.draggerContext( 'TraceGesture', query=True, modifier=True) == 'shift'
+        if not shift:
+            # replace the previous selections (unless Shift is held)
+            for root in ranges.keys():
+                self.selectionPool.Release( self.selectedMotions.pop( root, [] ) )
+        for root in sorted(ranges.keys()):
+            for joint in sorted(ranges[root].keys()):
+                points = self.trace[root].searchList[joint].points
+                for start, end in ranges[root][joint]:
+                    if end-start <= 1:      # too short to be a meaningful selection
+                        continue
+                    duration = [ int(start), int(end+1) ]
+                    keyframes = [ points[t] for t in sorted(points.keys()) if start <= t <= end ]
+                    selectedMotion = bmt.CurveMotionTrace( joint, keys=keyframes )
+                    self.AddSelectedMotion( root, joint, selectedMotion, duration )
+        mc.select(cl=True)
+
     def GetAnimChans( self, joint ):
         """ Given a joint name, it finds the attached animation channels """
         mc.select(joint)
@@ -241,13 +370,100 @@ class TraceSelection:
             mc.setAttr( "%s.%s"%(object, attrName), attrVal )
     
     def CameraToPopDist( self ):
-        camPos = Vector(mc.xform(mc.lookThru(q=True),q=True,t=True))
         if self.nearestRoot:
-            popPos = Vector(mc.objectCenter(self.nearestRoot))
-        else:
-            popPos = self.FindNearestObjectToCamera()
+            return self.CameraToRootDist( self.nearestRoot )
+        camPos = Vector(mc.xform(mc.lookThru(q=True),q=True,t=True))
+        popPos = self.FindNearestObjectToCamera( camPos )
         return (camPos-popPos).mag()
+
+    def CameraToRootDist( self, root, camPos=None ):
+        if camPos is None:
+            camPos = Vector(mc.xform(mc.lookThru(q=True),q=True,t=True))
+        return (camPos-self.RootCenter( root )).mag()
+
+    def RootBox( self, root ):
+        """ Returns the bounding Box of a root's traceables over the whole sampled range.
+            It's cached until the root's samples change (roots that haven't been sampled
+            yet get the box around where their traceables are now, until they are) """
+        if self.sampler and root in self.sampler.samples:
+            return self.bounds.Range( self.sampler, root, (id(self.sampler), self.versions.get( root, 0 )) )
+        box = self.bounds.Cached( root, None )
+        if box is None:
+            if not self.sampler:
+                self.sampler = self.NewSampler()    # (nothing is sampled yet, but it finds each root's joints once)
+            joints = self.sampler.Joints( root ) or [root]
+            positions = self.scene.WorldPositions( joints, [ mc.currentTime(q=True) ] )
+            box = Box( [ positions[j][0] for j in joints ] )
+            self.bounds.Put( root, None, box )
+        return box
+
+    def RootCenter( self, root ):
+        return self.RootBox( root ).Center()
+
+    def HalfFov( self ):
+        """ Returns half of the current camera's (narrower) field of view, in degrees """
+        cam = mc.lookThru(q=True)
+        return 0.5*min( mc.camera( cam, q=True, horizontalFieldOfView=True ), mc.camera( cam, q=True, verticalFieldOfView=True ) )
+
+    def FitDistance( self, root, halfFov=None ):
+        """ Returns how far from a root the camera would be after framing it (like viewFit) """
+        if halfFov is None:
+            halfFov = self.HalfFov()
+        return self.RootBox( root ).Radius()/sin( radians( halfFov ) )
+
+    def LevelOfDetail( self, root, camPos=None, halfFov=None ):
+        """ Returns which level of detail (0 is the finest) the motion paths of a root should show from the current camera
+            (its distance from the camera, in multiples of the distance that would frame the root) """
+        dist = self.CameraToRootDist( root, camPos )
+        fitDist = self.FitDistance( root, halfFov )
+        return len( [d for d in self.lodDistances if dist > d*fitDist] )
+
+    def UpdateLevelsOfDetail( self, roots=None ):
+        """ Shows the level of detail of each root's motion paths that suits its distance from the camera
+            (only roots whose level changed are touched) """
+        camPos = self.CameraPosition()
+        halfFov = self.HalfFov()
+        for root in (roots or self.LoadedRoots()):
+            level = self.LevelOfDetail( root, camPos, halfFov )
+            if self.lodLevels.get( root ) == level or not mc.objExists( "%s_MotionTracesLOD0"%root ):
+                continue
+            for lod in range(len(self.lodDistances)+1):
+                mc.setAttr( "%s_MotionTracesLOD%d.visibility"%(root, lod), lod == level )
+            self.lodLevels[root] = level
+
+    def WatchCamera( self ):
+        """ Updates the levels of detail whenever the current camera moves """
+        cam = mc.lookThru(q=True)
+        if cam == self.watchedCamera and self.cameraJob is not None:
+            return
+        self.StopWatchingCamera()
+        self.watchedCamera = cam
+        self.cameraJob = mc.scriptJob( attributeChange=[ "%s.translate"%cam, self.UpdateLevelsOfDetail ] )
+
+    def StopWatchingCamera( self ):
+        if self.cameraJob is not None:
+            mc.evalDeferred( "import maya.cmds as mc; mc.scriptJob( kill=%d, force=True )"%self.cameraJob )
+            self.cameraJob = None
     
+    def WatchScene( self ):
+        """ Clears the caches that hold nodes of the current scene when it is cleared (a new scene is made or another one is opened) """
+        if self.sceneJob is None:
+            self.sceneJob = mc.scriptJob( event=[ "deleteAll", self.ForgetScene ] )
+
+    def StopWatchingScene( self ):
+        if self.sceneJob is not None:
+            mc.evalDeferred( "import maya.cmds as mc; mc.scriptJob( kill=%d, force=True )"%self.sceneJob )
+            self.sceneJob = None
+
+    def ForgetScene( self ):
+        """ The scene is gone: stop loading and watching it, and drop what the shared caches know about it """
+        self.StopLazyLoading()
+        self.StopWatchingCamera()
+        self.StopWatchingScene()
+        cu.forgetCurves()
+        si.index.Forget()
+        ct.tracker.Forget()
+
     def ghostJoint( self, joint, framespan ):
         """ ghosts a given joint for a given span of frames """
         mc.setAttr( "%s.ghosting"%joint, 1)
@@ -257,15 +473,10 @@ class TraceSelection:
 
     def ToggleAllMotionPathsVisibility( self ):
         """ shows/hides all the motion paths """
-        allVizs = [mc.getAttr("%s.visibility"%group) for group in mc.ls(type="transform") if group.endswith("_MotionTraces")]
-        if not all(allVizs):
-            for group in mc.ls(type="transform"):
-                if group.endswith("_MotionTraces"):
-                    mc.setAttr("%s.visibility"%group, 1)
-        else:
-            for group in mc.ls(type="transform"):
-                if group.endswith("_MotionTraces"):
-                    mc.setAttr("%s.visibility"%group, 0)
+        groups = self.registry.Nodes( "motionTraces" )
+        allVizs = [mc.getAttr("%s.visibility"%group) for group in groups]
+        for group in groups:
+            mc.setAttr("%s.visibility"%group, not all(allVizs))
                 
     def FindRayPlaneIntersect( self, source, dest, plane ):
             """ given a source and destination (location) and a plane definition, 
@@ -279,43 +490,41 @@ class TraceSelection:
         return Vector( mc.xform(currentCam, q=True, m=True)[8:11] )
     
     def CameraPosition( self ):
-        """ return the Z-axis of the lookThru camera """
+        """ return the world position of the lookThru camera """
         currentCam = mc.lookThru(q=True)
         return Vector(mc.xform(currentCam,q=True,t=True))
 
-    def FindNearestObjectToCamera( self ):
-        camPos = self.CameraPosition()
+    def FindNearestObjectToCamera( self, camPos=None ):
+        if camPos is None:
+            camPos = self.CameraPosition()
         minDist = float("inf")
         closestObj = Vector()
         for obj in self.xformRoots: 
-            objPos = Vector(mc.objectCenter(obj))
+            objPos = self.RootCenter( obj )
             dist = ( camPos - objPos ).mag()
             if dist < minDist:
                 minDist = dist
                 closestObj = objPos
         return closestObj
 
-    def FindNearestRoot( self, mousePos, plane ):
-        """ find the root nearest to the mouse """
-        nearest = None
-        minDist = float("inf")
-        for root in self.xformRoots: #trueCenterMatchString):
-            path, dist = self.FindNearestMotionPath( mousePos, root, plane=plane)
-            if minDist > dist:
-                minDist = dist
-                nearest = root
+    def FindNearestMotion( self, mousePos, root=None, joint=None, camPos=None ):
+        """ Finds the sample (of any loaded root, or just the given root / joint) nearest to the mouse,
+            as seen on the interaction plane, with one query of the spatial index.
+            Returns (root, joint, time, distance) -- all None (and an infinite distance) if nothing is loaded """
+        hit = self.GetMotionIndex( camPos ).Nearest( mousePos, root=root, joint=joint )
+        if not hit:
+            return None, None, None, float("inf")
+        return hit
+
+    def FindNearestRoot( self, mousePos, plane=None ):
+        """ find the root nearest to the mouse (on the interaction plane) """
+        nearest, path, t, minDist = self.FindNearestMotion( mousePos )
         if debug > 0: print "nearest root is ", nearest
         return nearest, minDist
 
     def FindNearestMotionPath( self, mousePos, root, plane=None ):
         """ Finds the motion path of the given root that is nearest the given mouse position """
-        minDist = float("inf")
-        for joint in sorted(self.trace[root].searchList.keys()):
-            closestPoint = self.trace[root].searchList[joint].ClosestPointTo( mousePos, plane=plane )  #DistanceTo( mousePos, plane=plane )
-            dist = (mousePos - closestPoint.projectToPlane(self.interactionPlane.normal,planePt=self.interactionPlane.point)).mag()
-            if minDist > dist:
-                minDist = dist
-                nearestPath = joint
+        root, nearestPath, t, minDist = self.FindNearestMotion( mousePos, root=root )
         if debug>0:  print "FindNearestMotionPath found nearest path: ", nearestPath
         return nearestPath, minDist
 
@@ -323,86 +532,279 @@ class TraceSelection:
         """ Given the name of a joint (motion path), find the nearest
             point in time to the mouse location and change the current
             playback time to match """
-        path = self.trace[root].searchList[motionPath]
-        frame = path.ClosestTimeTo( mousePos, plane=self.interactionPlane )
+        camPos = self.gesture and self.gesture.cameraPosition or None
+        frame = self.FindNearestMotion( mousePos, root=root, joint=motionPath, camPos=camPos )[2]
+        if frame is None:
+            return
         if debug>0: print "ScrubToNearestTimeOnPath setting time to: ", frame
         mc.currentTime( frame )
     
-    def DrawJointMotionPaths( self, roots ):
-        """ Gathers points for each joint of each root and build motion paths (optimized to only cycle thru timeline once) """
-        # prep the data structure
-        keypoints = {}
-        for root in roots:
-            keypoints[root] = {}
-            #.split(':')[-1]
-            joints = [j for j in mc.listRelatives( root, allDescendents=True ) if j in self.traceableObjs]  # TODO: just get the nearby joints by projecting them all onto the viewing plane and finding the distance
+    @profiled("SampleJointMotion")
+    def SampleJointMotion( self, roots ):
+        """ Returns the shared sample cache (sampling the given roots the first time they are needed) """
+        if not self.sampler or self.sampler.substeps != self.substeps or self.sampler.adaptive != self.adaptive or \
+           not set(roots) <= set(self.sampler.roots):
+            self.sampler = self.NewSampler()
+        self.sampler.Sample( roots=roots )
+        return self.sampler
+
+    def NewSampler( self, substeps=None ):
+        """ Returns an empty MotionSampler for all the roots (with the current precision settings) """
+        return MotionSampler( self.xformRoots, self.traceableObjs, substeps or self.substeps, scene=self.scene, adaptive=self.adaptive )
+
+    def LoadedRoots( self ):
+        """ Returns the roots whose motion paths are ready to be traced """
+        return [root for root in self.xformRoots if root in self.trace]
+
+    def PrioritizedRoots( self ):
+        """ Returns the roots in the order they should be loaded: the roots in view
+            (nearest to the camera first), and then the ones out of view (nearest first) """
+        camPos = self.CameraPosition()
+        forward = -self.CameraViewAxis()    # cameras look down their -Z axis
+        cam = mc.lookThru(q=True)
+        halfFov = 0.5*max( mc.camera( cam, q=True, horizontalFieldOfView=True ), mc.camera( cam, q=True, verticalFieldOfView=True ) )
+        ranked = []
+        for root in self.xformRoots:
+            toRoot = self.RootCenter( root ) - camPos
+            inView = toRoot.mag() == 0 or forward.angleBetween( toRoot ) <= radians( halfFov )
+            ranked.append( (not inView, toRoot.mag(), root) )
+        return [root for outOfView, dist, root in sorted(ranked)]
+
+    @profiled("LoadRoots")
+    def LoadRoots( self, roots ):
+        """ Samples the given roots, draws their motion paths (if they aren't in the scene yet) and loads them """
+        self.pendingRoots = [root for root in self.pendingRoots if not root in roots]
+        if self.cache:
+            self.FillFromTrajectoryCache( roots )
+        toDraw = [root for root in roots if not mc.objExists( "%s_MotionTraces"%root )]
+        if toDraw:
+            self.DrawJointMotionPaths( toDraw )
+        if len(toDraw) < len(roots):
+            self.RegisterMotionTraces( [root for root in roots if not root in toDraw] )
+        self.LoadJointMotionPaths( roots )
+        if self.cache:
+            self.SaveToTrajectoryCache( self.cache, [root for root in roots if not root in self.cachedRoots] )
+
+    def RegisterMotionTraces( self, roots ):
+        """ Records the (existing) motion trace groups of the given roots in the registry, if they
+            aren't yet -- e.g. groups drawn by an older version of the tool, before it had a registry """
+        registered = set( self.registry.Nodes( "motionTraces" ) )
+        groups = [group for group in mc.ls( ["%s_MotionTraces"%root for root in roots], long=True ) if not group in registered]
+        if groups:
+            self.registry.Add( "motionTraces", groups )
+
+    def LoadRootsLazily( self ):
+        """ Loads the highest priority root right away (so the tool is usable), and the rest when Maya is idle """
+        self.pendingRoots = self.PrioritizedRoots()
+        self.LoadRoots( self.pendingRoots[:1] )
+        if self.pendingRoots and self.idleJob is None:
+            self.idleJob = mc.scriptJob( idleEvent=self.LoadPendingRoots )
+
+    def LoadPendingRoots( self ):
+        """ Idle callback: loads the next chunk of roots (and stops once they are all loaded) """
+        if self.pendingRoots:
+            self.LoadRoots( self.pendingRoots[:self.idleChunkSize] )
+        if not self.pendingRoots:
+            self.StopLazyLoading()
+
+    def LoadAllRoots( self ):
+        """ Loads every root that hasn't been loaded yet (bulk selections have to see all of them) """
+        unloaded = [root for root in self.xformRoots if not root in self.trace]
+        if unloaded:
+            self.LoadRoots( unloaded )
+        self.StopLazyLoading()
+
+    def StopLazyLoading( self ):
+        if self.idleJob is not None:
+            # a scriptJob can't kill itself while it is running, so kill it a moment later
+            mc.evalDeferred( "import maya.cmds as mc; mc.scriptJob( kill=%d, force=True )"%self.idleJob )
+            self.idleJob = None
+
+    def LoadRootNearPress( self, pressPosition ):
+        """ If the press is nearer to a root that hasn't been loaded yet than to
+            any of the loaded motion paths, load that root right away """
+        unloaded = [root for root in self.xformRoots if not root in self.trace]
+        if not unloaded:
+            return
+        camPos = self.CameraPosition()
+        nearest = None
+        minDist = float("inf")
+        for root in unloaded:
+            center = self.interactionPlane.intersectWithRay( camPos, self.RootCenter( root ) )
+            if center and (pressPosition-center).mag() < minDist:
+                minDist = (pressPosition-center).mag()
+                nearest = root
+        if nearest and (not self.LoadedRoots() or minDist < self.FindNearestRoot( pressPosition, self.interactionPlane )[1]):
+            self.LoadRoots( [nearest] )
+
+    def RootsAffectedBy( self, obj ):
+        """ Returns the roots whose traceables may move when obj is edited """
+        if mc.nodeType(obj) == "ikHandle":
+            obj = mc.ikHandle( obj, q=True, startJoint=True )
+        itr = obj
+        while itr:
+            if itr in self.xformRoots:
+                return [itr]
+            parent = mc.listRelatives( itr, parent=True )
+            itr = parent and parent[0]
+        return list(self.xformRoots)    # we can't tell what it drives (e.g. a constraint target), so check every root
+
+    def RefreshDirtyMotion( self ):
+        """ Resamples only the frames (of the roots) that were edited since the motion was
+            sampled, and patches the trajectories and motion trace curves in place """
+        dirty = ct.tracker.Pop()
+        if not dirty or not self.sampler:
+            return
+        # gather the edited frame ranges for each root (None means the whole timeline)
+        rootRanges = {}
+        for obj, ranges in dirty.items():
+            if not mc.objExists(obj):
+                continue
+            for root in self.RootsAffectedBy( obj ):
+                if ranges is None or (root in rootRanges and rootRanges[root] is None):
+                    rootRanges[root] = None
+                else:
+                    rootRanges.setdefault( root, [] ).extend( ranges )
+        for root, ranges in rootRanges.items():
+            if not root in self.sampler.samples:
+                continue
+            times = self.sampler.Times( root=root )
+            indices = [i for i,t in enumerate(times) if ranges is None or [r for r in ranges if r[0] <= t <= r[1]]]
+            if not indices:
+                continue
+            joints = self.sampler.Joints( root )
+            positions = self.scene.WorldPositions( joints, [times[i] for i in indices] )
             for j in joints:
-                keypoints[root][j] = []
-        # cycle through the timeline and record data
-        for t in range(int(mc.playbackOptions(q=True,minTime=True)), int(mc.playbackOptions(q=True,maxTime=True))+1):
-            mc.currentTime(t)
-            for root in roots:
-                #.split(':')[-1]
-                joints = [j for j in mc.listRelatives( root, allDescendents=True ) if j in self.traceableObjs]
-                for j in joints:
-                    keypoints[root][j].append( mc.xform( j, q=True, ws=True, translation=True ) )
+                samples = self.sampler.samples[root][j]
+                changed = False
+                for i, p in zip( indices, positions[j] ):
+                    if samples[i] != p:
+                        samples[i] = p
+                        changed = True
+                        if root in self.trace and j in self.trace[root].searchList:
+                            self.trace[root].searchList[j].points[times[i]] = Vector( p )
+                if changed:
+                    self.UpdateMotionTraceCurve( root, j )
+            if root in self.trace:
+                self.trace[root].Clear()    # the DTWs were set up against the old motion
+                if self.motionIndex and not self.motionIndex.Update( root, self.trace[root] ):
+                    self.motionIndex = None
+            self.cacheKeys.pop( root, None )    # (the edited motion no longer matches its on-disk cache key)
+            self.versions[root] = self.versions.get( root, 0 ) + 1
+
+    def UpdateMotionTraceCurve( self, root, joint ):
+        """ Re-fits a joint's motion trace curves (every level of detail) to its (patched) samples, keeping the curve nodes.
+            The fitting runs on a worker thread; a newer edit of the same joint replaces a fit that hasn't finished. """
+        traceCurve = "%s_trace"%joint
+        if not mc.objExists( traceCurve ):
+            return
+        points = list( self.sampler.Points( root, joint, wholeFrames=True ) )     # (a snapshot, the samples may be patched again)
+        self.jobs.Submit( bmt.traceLevelsOfDetail, (points,), key=traceCurve,
+                          onDone=lambda lods: self.ReplaceMotionTraceCurves( traceCurve, lods ) )
+
+    def ReplaceMotionTraceCurves( self, traceCurve, lods ):
+        """ Swaps in the newly fit shapes of a motion trace (every level of detail) """
+        for lod, shape in enumerate( lods ):
+            curve = traceCurve + (lod and "LOD%d"%lod or "")
+            if mc.objExists( curve ):
+                cu.replaceCurveShape( curve, shape )
+
+    def UseTrajectoryStore( self, path ):
+        """ Fills the shared sample cache from a precomputed TrajectoryStore (see precomputeTrajectories.py),
+            as long as it covers every root over the current playback range """
+        store = TrajectoryStore.Load( path )
+        sampler = self.NewSampler( store.substeps )
+        times = sampler.SampleTimes()
+        if not store.Covers( self.xformRoots, times ):
+            mc.warning( "%s does not cover the motion in this scene (so it will be resampled)."%path )
+            return False
+        self.substeps = store.substeps
+        self.sampler = store.Fill( sampler, times )
+        return True
+
+    def UseTrajectoryCache( self, cache ):
+        """ Reuses the motion in the on-disk cache (for every root whose motion didn't change) as roots get loaded """
+        self.cache = cache
+
+    @profiled("FillFromTrajectoryCache")
+    def FillFromTrajectoryCache( self, roots ):
+        """ Fills the shared sample cache with the given roots whose motion is in the on-disk cache
+            (the rest get sampled as usual, and can be saved with SaveToTrajectoryCache) """
+        if not self.sampler or self.sampler.substeps != self.substeps or self.sampler.adaptive != self.adaptive:
+            self.sampler = self.NewSampler()
+        times = self.sampler.times or self.sampler.SampleTimes()
+        for root in roots:
+            if root in self.sampler.samples or root in self.cacheKeys:
+                continue
+            self.cacheKeys[root] = self.cache.RootKey( root, self.sampler.Joints( root ), times, self.substeps, self.adaptive )
+            store = self.cache.Get( self.cacheKeys[root] )
+            if store and store.Covers( [root], times ):
+                store.Fill( self.sampler, times, roots=[root] )
+                self.cachedRoots.append( root )
+
+    @profiled("SaveToTrajectoryCache")
+    def SaveToTrajectoryCache( self, cache, roots=None ):
+        """ Saves the sampled motion of each root (that missed the on-disk cache) """
+        for root in (roots or self.xformRoots):
+            if not root in self.cacheKeys or not root in self.sampler.samples:
+                continue
+            store = TrajectoryStore( self.substeps )
+            store.times = list( self.sampler.times )
+            store.joints[root] = list( self.sampler.Joints( root ) )
+            store.samples[root] = dict( [ (j, dict( zip( self.sampler.Times( root=root ), self.sampler.Points( root, j ) ) )) for j in store.joints[root] ] )
+            cache.Put( self.cacheKeys[root], store )
+
+    @profiled("DrawJointMotionPaths")
+    def DrawJointMotionPaths( self, roots ):
+        """ Builds motion paths for each joint of each root (from the shared sample cache) """
+        sampler = self.SampleJointMotion( roots )
         # use the data to build motion curves
         cols = [9,12,13,14,15,17,18,23,29,31]   # color indices for the display layers
+        layerMembers = {}       # display layer -> the curves to add to it
         for root in roots:
-            joints = [j for j in mc.listRelatives( root, allDescendents=True ) if j in self.traceableObjs]
+            joints = sampler.Joints( root )
             if len(joints) > 0:
-                traceGroup = mc.group(n="%s_MotionTraces"%root,empty=True)
-                curves = []
-                for num, j in enumerate(joints):
-                    curve = bmt.CurveMotionTrace( j, keys=keypoints[root][j] )
-                    curveGeom = curve.construct("%s_trace"%j)
-                    curves.append( curveGeom )   # add the motion paths to the trace's search list and set up the DTWs
-
-                    displayLayerName = "%s_MotionPaths"%j#.split(':')[-1]
-                    if not mc.objExists(displayLayerName):
-                        mc.createDisplayLayer(name=displayLayerName)
-                        mc.setAttr("%s.color"%displayLayerName, cols[num])  
-                        mc.editDisplayLayerMembers( displayLayerName, curveGeom )
-                    else:
-                        objs = mc.editDisplayLayerMembers(displayLayerName, query=True )
-                        if objs:
-                            objs.append( curveGeom )
-                        else:
-                            objs = [curveGeom]
-                        mc.editDisplayLayerMembers( displayLayerName, objs )
-                mc.parent(curves, traceGroup)
-                mc.parent(traceGroup, root)
-                mc.select(cl=True)
+                # (parented right away, so the long names of the curves made under it stay valid)
+                traceGroup = mc.group(n="%s_MotionTraces"%root,empty=True,parent=root)
+                self.registry.Add( "motionTraces", traceGroup )
+                # fit every level of detail of every joint's curve in process, then make them all in one pass per level
+                lods = [ bmt.traceLevelsOfDetail( sampler.Points( root, j, wholeFrames=True ) ) for j in joints ]
+                for lod in range(len(self.lodDistances)+1):
+                    lodGroup = mc.group(n="%s_MotionTracesLOD%d"%(root, lod), empty=True, parent=traceGroup)
+                    names = [ "%s_trace"%j + (lod and "LOD%d"%lod or "") for j in joints ]     # (the finest curves keep their old names)
+                    curves = bmt.buildCurves( [ shapes[lod] for shapes in lods ], names, parent=lodGroup )
+                    for num, (j, curveGeom) in enumerate( zip( joints, curves ) ):
+                        displayLayerName = "%s_MotionPaths"%j#.split(':')[-1]
+                        if not mc.objExists(displayLayerName):
+                            mc.createDisplayLayer(name=displayLayerName, empty=True)
+                            mc.setAttr("%s.color"%displayLayerName, cols[num%len(cols)])
+                        layerMembers.setdefault( displayLayerName, [] ).append( curveGeom )
+        # one membership edit per display layer
+        for displayLayerName, members in layerMembers.items():
+            mc.editDisplayLayerMembers( displayLayerName, members, noRecurse=True )
+        self.UpdateLevelsOfDetail( roots )
                 
             
+    @profiled("LoadJointMotionPaths")
     def LoadJointMotionPaths( self, roots ):
-        """ prep the data structure that holds the motion paths """
-        animPaths = {}
+        """ prep the data structure that holds the motion paths (from the shared sample cache) """
+        sampler = self.SampleJointMotion( roots )
         for root in roots:
-            animPaths[root] = {}
+            times = sampler.Times( root=root )
             self.trace[root] = Trajectory("%sTrace"%root)
-            # find all nearby joints
-            joints = [j for j in mc.listRelatives( root, allDescendents=True ) if j in self.traceableObjs]  # TODO: just get the nearby joints by projecting them all onto the viewing plane and finding the distance
-            # get the motion path of each nearby joint
-            if len(joints) > 0:
-                for j in joints:
-                    animPaths[root][j] = Trajectory( "%s_path"%j )
-                    if debug > 0:
-                        mc.group(name="%sGrp"%j,empty=True)
-        
-        startFrame = mc.playbackOptions(q=True,minTime=True)
-        endFrame = mc.playbackOptions(q=True,maxTime=True)+1
-        for t in [float(x)/self.substeps+startFrame for x in range(0, int(endFrame-startFrame)*self.substeps)]:
-            mc.currentTime(t)
-            for root in roots:
-                joints = [j for j in mc.listRelatives( root, allDescendents=True ) if j in self.traceableObjs]
-                for j in joints:
-                    point = Vector( mc.xform(j, q=True, ws=True, t=True) ) 
-                    animPaths[root][j].AddPoint( point, t )
-                    if debug > 0:
-                        loc = mc.spaceLocator(p=point)
+            animPaths = {}
+            # get the motion path of each traceable joint
+            for j in sampler.Joints( root ):
+                animPaths[j] = Trajectory( "%s_path"%j )
+                for t, p in zip( times, sampler.Points( root, j ) ):
+                    animPaths[j].points[t] = Vector( p )
+                if debug > 0:
+                    self.registry.Add( "debug", mc.group(name="%sGrp"%j,empty=True) )
+                    for p in sampler.Points( root, j ):
+                        loc = mc.spaceLocator(p=p)
                         mc.parent(loc,"%sGrp"%j)
-                self.trace[root].SetSearchList( animPaths[root] )
+            self.trace[root].SetSearchList( animPaths )
+        self.motionIndex = None     # the trajectories changed, so the spatial index is stale
 
 def findXformRoot( jointRoot ):
     """ Returns the transform root of a given jointRoot """
@@ -460,8 +862,55 @@ def autoFindTraceables():
         traceableObjs.extend( findEndEffectorJoints(root) )   # all end-effector joints under the root
     return jointRoots, xformRoots, traceableObjs
     
-def main( traceables=None ):
+def selectMotionsInVolume( obj=None, radius=None ):
+    """ Selects the motion (of every rig) that passes through a cylinder, e.g. a
+        polyCylinder placed in the scene.  The cylinder runs along obj's Y axis
+        (obj defaults to the selected object); its radius defaults to obj's
+        polyCylinder radius (or 1) times obj's X scale """
     global traceSelect
+    if not obj:
+        selection = mc.ls( sl=True, transforms=True )
+        if not selection:
+            mc.warning("select an object (e.g. a polyCylinder) to select the motion inside of it")
+            return None
+        obj = selection[0]
+    m = mc.xform( obj, q=True, ws=True, matrix=True )
+    xAxis, yAxis = Vector( m[0:3] ), Vector( m[4:7] )
+    if radius is None:
+        cylinders = mc.listHistory( obj, type="polyCylinder" )
+        radius = xAxis.mag() * ( cylinders and mc.getAttr( "%s.radius"%cylinders[0] ) or 1.0 )
+    try:
+        traceSelect
+    except NameError:
+        if not main():
+            return None
+    mc.select( clear=True )
+    traceSelect.SelectMotionsInVolume( Cylinder( Vector( m[12:15] ), yAxis, radius ) )
+    return traceSelect
+
+def profile( on=True ):
+    """ Turns the built-in profiling of the trace tools on (or off).  While it is on, the
+        phases of main and of each gesture are timed, and the Maya commands called by
+        the trace tools are counted (see Profiler.py).  Look at the results with
+        profiler.Report(), or save them with profiler.DumpJSON() / profiler.DumpChromeTrace() """
+    if on:
+        names = ( __name__, "Trajectory", "buildMotionTraces", "curveUtil", "SceneBackend", "GestureContext", "NodeRegistry",
+                  "SelectionCurvePool", "SelectionIndex", "TrajectoryCache", "ChangeTracker", "RootBounds" )
+        profiler.Enable( [ sys.modules[name] for name in names if name in sys.modules ] )   # (modules that don't call Maya are skipped)
+    else:
+        profiler.Disable()
+
+@profiled("main")
+def main( traceables=None, lasso=False, store=None, useCache=True, lazy=True, adaptive=None ):
+    global traceSelect
+
+    # stop the previous instance of the tool from loading and watching the scene (if it still is) --
+    # it may be from an older version of the tool, without all of these
+    previous = globals().get( "traceSelect" )
+    for stop in ( getattr( previous, "StopLazyLoading", None ), getattr( previous, "StopWatchingCamera", None ),
+                  getattr( previous, "StopWatchingScene", None ), getattr( getattr( previous, "jobs", None ), "Shutdown", None ) ):
+        if stop:
+            stop()
 
     if(traceables):
         traceableObjs = traceables
@@ -476,6 +925,15 @@ def main( traceables=None ):
               
     # otherwise, keep going...
     traceSelect = TraceSelection( xformRoots, traceableObjs )
+    traceSelect.lassoMode = lasso
+    traceSelect.adaptive = adaptive     # (a tolerance samples the motion adaptively, see MotionSampler.py)
+    traceSelect.selectionPool.Fill( traceSelect.selectionPoolSize )     # (so the first selections don't make any nodes)
+    if store:
+        # use the motion that was sampled ahead of time (by precomputeTrajectories.py)
+        traceSelect.UseTrajectoryStore( store )
+    elif useCache:
+        # reuse the motion sampled in an earlier session (only roots that changed get resampled)
+        traceSelect.UseTrajectoryCache( TrajectoryCache() )
     
     # Define draggerContext with press and drag procedures
     if not traceSelect.forceReload and mc.draggerContext( 'TraceGesture', exists=True ) :
@@ -491,11 +949,15 @@ def main( traceables=None ):
                            dragCommand='traceSelect.TraceGestureDrag()',
                            releaseCommand='traceSelect.TraceGestureRelease()',
                            cursor='default')
-    if len(mc.ls('*_MotionPaths')) == 0:
-        # if first time script has been called on this scene
-        traceSelect.DrawJointMotionPaths(xformRoots)
-
-    traceSelect.LoadJointMotionPaths(xformRoots)
+    if lazy:
+        # load the rigs nearest the camera first, and the rest when Maya is idle
+        traceSelect.LoadRootsLazily()
+    else:
+        traceSelect.LoadRoots(xformRoots)
+    traceSelect.WatchCamera()           # show coarser motion paths for the rigs far from the camera
+    traceSelect.WatchScene()            # forget the scene's curves and selections once it is cleared
+    ct.tracker.WatchAnimCurves()        # resample edited motion (from any tool) on the next press
+    ct.tracker.Pop()                    # everything was just sampled
         
     mc.setToolTo('TraceGesture')
     return traceSelect
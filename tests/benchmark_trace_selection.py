@@ -0,0 +1,83 @@
+## A headless benchmark of loading and gesture matching in the Trace Create Tool (on a FakeScene, no Maya needed)
+## Run it from the top of the repository with:  python tests/benchmark_trace_selection.py [rigs] [joints] [frames]
+##
+## It loads the rigs through TraceSelection's own LoadJointMotionPaths and queries its spatial index.
+## The gesture is then played back through the same calls the press, drag and release handlers make
+## (the handlers themselves ask Maya for the mouse, camera and selection, so they can't run headless).
+
+import os, sys, math
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "scripts" ) )
+
+from SceneBackend import FakeScene
+from Vector import Vector
+from Plane import Plane
+from Cylinder import Cylinder
+from Profiler import profiler
+from traceSelectTool import TraceSelection
+
+def buildScene( numRigs, numJoints, frames ):
+    """ A row of rigs: each a root with joints swinging in loops of different sizes and speeds """
+    scene = FakeScene( playbackRange=(1.0, float(frames)) )
+    for r in range(numRigs):
+        root = scene.AddObject( "rig%d"%r, motion=lambda t, x=10.0*r: (x, 0.0, 0.0) )
+        for j in range(numJoints):
+            scene.AddObject( "rig%d_joint%d"%(r, j), parent=root,
+                             motion=lambda t, j=j: ( (1+j)*math.cos(0.05*(1+j)*t), j+math.sin(0.1*t), 0.5*math.sin(0.03*t) ) )
+    return scene
+
+def gesture( tool, root, joint, start, end ):
+    """ Traces over a stretch of a joint's motion (the press, then one drag event per sample) """
+    path = tool.trace[root].searchList[joint].points
+    return [ Vector( [path[t].x, path[t].y, 0.0] ) for t in sorted(path.keys()) if start <= t <= end ]
+
+def run( numRigs=20, numJoints=5, frames=200 ):
+    scene = buildScene( numRigs, numJoints, frames )
+    roots, traceables = scene.FindTraceables()
+    tool = TraceSelection( roots, traceables )
+    tool.scene = scene
+    camPos = Vector( [0.0, 0.0, 100.0] )
+    tool.interactionPlane = Plane( Vector( [0.0, 0.0, 1.0] ), Vector( [0.0, 0.0, 0.0] ) )
+    profiler.Reset()
+    profiler.Enable()
+    try:
+        tool.LoadJointMotionPaths( roots )
+        with profiler.Phase( "GetMotionIndex" ):
+            index = tool.GetMotionIndex( camPos )
+
+        middle = numRigs/2
+        points = gesture( tool, "rig%d"%middle, "rig%d_joint%d"%(middle, min(2, numJoints-1)), 0.3*frames, 0.5*frames )
+        # press: hit test, then set up the DTWs of the nearest root
+        with profiler.Phase( "FindNearestMotion" ):
+            root, joint, t, dist = tool.FindNearestMotion( points[0], camPos=camPos )
+        trace = tool.trace[root]
+        trace.Clear()
+        trace.normal = tool.interactionPlane.normal
+        trace.planePt = tool.interactionPlane.point
+        trace.AddPoint( points[0] )
+        with profiler.Phase( "SetUpDTWs" ):
+            trace.SetUpDTWs( camPos )
+        # drag: add the points and re-solve within the budget; release: solve whatever is left
+        tool.solver.Start()
+        for p in points[1:]:
+            tool.solver.Add( trace, p )
+            with profiler.Phase( "UpdateDTWs" ):
+                tool.solver.Solve( trace )
+        with profiler.Phase( "UpdateDTWs" ):
+            tool.solver.Finish( trace )
+
+        # bulk selection: a lasso around the middle rigs, and a cylinder through one of them
+        x = 10.0*middle
+        with profiler.Phase( "Lasso" ):
+            index.Lasso( [ Vector( [x-15, -10, 0] ), Vector( [x+15, -10, 0] ), Vector( [x+15, 10, 0] ), Vector( [x-15, 10, 0] ) ] )
+        with profiler.Phase( "Volume" ):
+            index.Volume( Cylinder( Vector( [x, 0, 0] ), Vector( [0, 1, 0] ), 3.0 ) )
+    finally:
+        profiler.Disable()
+        tool.jobs.Shutdown()
+
+    print( "%d rigs x %d joints x %d frames (%d positions sampled)"%(numRigs, numJoints, frames, scene.queries) )
+    print( "matched %s %s over %s"%(root, trace.closestJoint, trace.timespan) )
+    profiler.Report()
+
+if __name__ == "__main__":
+    run( *[ int(arg) for arg in sys.argv[1:] ] )
@@ -0,0 +1,86 @@
+## Headless tests of the pure Python curve code (BSpline fitting and the ArcLengthTable)
+## Run them from the top of the repository with:  python -m unittest discover -s tests
+
+import os, sys, math, unittest
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "scripts" ) )
+
+import BSpline
+from ArcLengthTable import ArcLengthTable
+
+def dist( p, q ):
+    return math.sqrt( sum( [ (a-b)**2 for a, b in zip( p, q ) ] ) )
+
+def helix( n ):
+    return [ (math.cos(0.2*k), math.sin(0.2*k), 0.1*k) for k in range(n) ]
+
+class TestFit( unittest.TestCase ):
+
+    def testFitError( self ):
+        """ A fit stays close to smooth input (and gets closer with more spans) """
+        points = helix( 60 )
+        errors = []
+        for spans in (4, 16):
+            curve = BSpline.fit( points, spans )
+            errors.append( max( [ dist( curve.Point( k ), p ) for k, p in enumerate( points ) ] ) )
+        self.assertTrue( errors[1] < errors[0] )
+        self.assertTrue( errors[1] < 0.01 )
+
+    def testEndPointsArePreserved( self ):
+        points = helix( 25 )
+        for spans in (1, 3, 10):
+            curve = BSpline.fit( points, spans )
+            lo, hi = curve.Range()
+            self.assertTrue( dist( curve.Point( lo ), points[0] ) < 1e-9 )
+            self.assertTrue( dist( curve.Point( hi ), points[-1] ) < 1e-9 )
+
+    def testTooFewPoints( self ):
+        self.assertRaises( ValueError, BSpline.fit, [], 4 )
+        self.assertRaises( ValueError, BSpline.fit, [(0,0,0), (1,0,0)], 4, paramRange=(2.0, 2.0) )
+        curve = BSpline.fit( [(1,2,3)], 4 )
+        lo, hi = curve.Range()
+        self.assertTrue( hi > lo )
+        for u in (lo, 0.5*(lo+hi), hi):
+            self.assertEqual( curve.Point( u ), (1.0, 2.0, 3.0) )
+        for n in (2, 3):    # (fewer than degree+1 points lower the degree)
+            points = helix( n )
+            curve = BSpline.fit( points, 4, degree=3 )
+            self.assertEqual( curve.degree, n-1 )
+            self.assertTrue( dist( curve.Point( curve.Range()[1] ), points[-1] ) < 1e-9 )
+
+class TestClosestParam( unittest.TestCase ):
+
+    def testPointsOnTheCurve( self ):
+        curve = BSpline.fit( helix( 40 ), 12 )
+        lo, hi = curve.Range()
+        for k in range(11):
+            u = lo+(hi-lo)*k/10.0
+            self.assertAlmostEqual( curve.ClosestParam( curve.Point( u ) ), u, places=4 )
+
+    def testPointsOffTheEnds( self ):
+        curve = BSpline.BSpline( 1, [0.0, 1.0], [(0,0,0), (1,0,0)] )
+        self.assertAlmostEqual( curve.ClosestParam( (-5.0, 1.0, 0.0) ), 0.0 )
+        self.assertAlmostEqual( curve.ClosestParam( (7.0, -1.0, 0.0) ), 1.0 )
+        self.assertAlmostEqual( curve.ClosestParam( (0.25, 3.0, 0.0) ), 0.25, places=6 )
+
+class TestArcLength( unittest.TestCase ):
+
+    def testStraightLine( self ):
+        table = ArcLengthTable( 1, [0.0, 2.0], [(0,0,0), (3,4,0)] )
+        self.assertAlmostEqual( table.length, 5.0 )
+        self.assertAlmostEqual( table.ArcLen( 1.0 ), 2.5 )
+        self.assertAlmostEqual( table.Param( 2.5 ), 1.0 )
+        self.assertAlmostEqual( table.ParamAtPercent( 0.2 ), 0.4 )
+
+    def testCircle( self ):
+        """ A fit quarter circle measures (close to) pi/2, and lookups invert each other """
+        points = [ (math.cos(a), math.sin(a), 0.0) for a in [ 0.5*math.pi*k/50.0 for k in range(51) ] ]
+        curve = BSpline.fit( points, 8 )
+        table = ArcLengthTable( curve.degree, curve.knots, curve.cvs )
+        self.assertAlmostEqual( table.length, 0.5*math.pi, places=3 )
+        for s in (0.0, 0.3, 1.0, table.length):
+            self.assertAlmostEqual( table.ArcLen( table.Param( s ) ), s, places=6 )
+        self.assertEqual( table.Param( -1.0 ), table.minParam )
+        self.assertEqual( table.Param( 10.0 ), table.maxParam )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+## Headless tests of the JobScheduler (with a FakePump standing in for Maya's main thread)
+## Run them from the top of the repository with:  python -m unittest discover -s tests
+
+import os, sys, time, threading, unittest
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "scripts" ) )
+
+from JobScheduler import JobScheduler, FakePump, Job
+
+def pumpUntil( pump, done, timeout=5.0 ):
+    """ Runs the pump (on this, the "main" thread) until done() or the timeout """
+    end = time.time()+timeout
+    while not done() and time.time() < end:
+        pump.Run()
+        time.sleep( 0.001 )
+    pump.Run()
+
+class TestJobScheduler( unittest.TestCase ):
+
+    def setUp( self ):
+        self.pump = FakePump()
+        self.jobs = JobScheduler( workers=2, pump=self.pump )
+
+    def tearDown( self ):
+        self.jobs.Shutdown()
+        for worker in self.jobs.workers:
+            worker.join( 5.0 )
+            self.assertFalse( worker.is_alive() )
+
+    def testResultsAreDeliveredOnTheMainThread( self ):
+        ran, delivered = [], []
+        def work( x ):
+            ran.append( threading.current_thread() )
+            return x*x
+        for x in range(5):
+            self.jobs.Submit( work, (x,), onDone=lambda result: delivered.append( (result, threading.current_thread()) ) )
+        pumpUntil( self.pump, lambda: len(delivered) == 5 )
+        self.assertEqual( sorted( [ result for result, thread in delivered ] ), [0, 1, 4, 9, 16] )
+        main = threading.current_thread()
+        self.assertTrue( all( [ thread is main for result, thread in delivered ] ) )
+        self.assertTrue( all( [ thread is not main for thread in ran ] ) )
+
+    def testNothingIsDeliveredUntilThePumpRuns( self ):
+        delivered = []
+        job = self.jobs.Submit( lambda: 1, onDone=delivered.append )
+        end = time.time()+5.0
+        while not self.pump.queue and time.time() < end:
+            time.sleep( 0.001 )
+        self.assertEqual( delivered, [] )
+        self.assertEqual( self.pump.Run(), 1 )
+        self.assertEqual( delivered, [1] )
+        self.assertEqual( job.state, Job.DONE )
+
+    def testErrorsGoToOnError( self ):
+        errors = []
+        job = self.jobs.Submit( lambda: 1/0, onError=errors.append )
+        pumpUntil( self.pump, lambda: errors )
+        self.assertEqual( errors[0][0], ZeroDivisionError )
+        self.assertEqual( job.state, Job.FAILED )
+
+    def testANewerJobReplacesOneWithTheSameKey( self ):
+        gate = threading.Event()
+        delivered = []
+        self.jobs.Shutdown()        # (a single worker, instead of setUp's two)
+        self.jobs = JobScheduler( workers=1, pump=self.pump )
+        self.jobs.Submit( gate.wait )       # (keeps the only worker busy)
+        first = self.jobs.Submit( lambda: "first", onDone=delivered.append, key="curve" )
+        second = self.jobs.Submit( lambda: "second", onDone=delivered.append, key="curve" )
+        self.assertTrue( first.Cancelled() )
+        gate.set()
+        pumpUntil( self.pump, lambda: delivered )
+        self.assertEqual( delivered, ["second"] )
+
+    def testPriorities( self ):
+        gate = threading.Event()
+        order = []
+        self.jobs.Shutdown()        # (a single worker, instead of setUp's two)
+        self.jobs = JobScheduler( workers=1, pump=self.pump )
+        self.jobs.Submit( gate.wait )
+        for priority in (3, 1, 2):
+            self.jobs.Submit( order.append, (priority,), priority=priority )
+        gate.set()
+        pumpUntil( self.pump, lambda: len(order) == 3 )
+        self.assertEqual( order, [1, 2, 3] )
+
+    def testShutdown( self ):
+        self.jobs.Shutdown()
+        self.assertRaises( RuntimeError, self.jobs.Submit, lambda: 1 )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+## Headless tests of the Kinematics channels
+## Run them from the top of the repository with:  python -m unittest discover -s tests
+
+import os, sys, math, unittest
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "scripts" ) )
+
+from Kinematics import Kinematics
+
+class TestKinematics( unittest.TestCase ):
+
+    def testSteadyLine( self ):
+        times = [0.0, 1.0, 2.5, 3.0, 5.0]      # (uneven samples)
+        k = Kinematics( times, [ (2.0*t, 0.0, 0.0) for t in times ] )
+        for v, s, c in zip( k.velocity, k.speed, k.curvature ):
+            self.assertAlmostEqual( v[0], 2.0 )
+            self.assertAlmostEqual( s, 2.0 )
+            self.assertAlmostEqual( c, 0.0 )
+        self.assertEqual( k.SpeedRange(), (2.0, 2.0) )
+        self.assertAlmostEqual( k.Length(), 10.0 )
+
+    def testCircle( self ):
+        """ Uniform motion around a circle of radius 2: speed 2*w and curvature 1/2 """
+        w = 0.1
+        times = [ 0.25*i for i in range(200) ]
+        k = Kinematics( times, [ (2.0*math.cos(w*t), 2.0*math.sin(w*t), 0.0) for t in times ] )
+        for i in range(1, len(times)-1):
+            self.assertAlmostEqual( k.speed[i], 2.0*w, places=4 )
+            self.assertAlmostEqual( k.curvature[i], 0.5, places=3 )
+
+    def testAcceleration( self ):
+        times = [0.0, 0.5, 2.0, 3.0, 4.5]
+        k = Kinematics( times, [ (0.0, t*t, 0.0) for t in times ] )     # (quadratic, so exact)
+        for t, v, a in zip( times, k.velocity, k.acceleration )[1:-1]:
+            self.assertAlmostEqual( v[1], 2.0*t )
+            self.assertAlmostEqual( a[1], 2.0 )
+
+    def testTooFewSamples( self ):
+        k = Kinematics( [1.0], [(1.0, 2.0, 3.0)] )
+        self.assertEqual( k.speed, [0.0] )
+        self.assertEqual( k.Length(), 0.0 )
+
+if __name__ == "__main__":
+    unittest.main()
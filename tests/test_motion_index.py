@@ -0,0 +1,107 @@
+## Headless tests of the MotionIndex (checked against brute force searches)
+## Run them from the top of the repository with:  python -m unittest discover -s tests
+
+import os, sys, random, unittest
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "scripts" ) )
+
+from Vector import Vector
+from Plane import Plane
+from MotionIndex import MotionIndex
+
+class Path:
+    def __init__( self, points ):
+        self.points = points
+
+class Trace:
+    """ Stands in for a Trajectory (the index only reads its searchList) """
+    def __init__( self, searchList ):
+        self.searchList = searchList
+
+def buildTraces( rng, numRoots=4, numJoints=3, numSamples=400 ):
+    traces = {}
+    for r in range(numRoots):
+        searchList = {}
+        for j in range(numJoints):
+            searchList["joint%d"%j] = Path( dict( [ (float(t), Vector( [30.0*r+rng.gauss(0,3), rng.gauss(j,3), rng.gauss(0,3)] ))
+                                                    for t in range(numSamples) ] ) )
+        traces["root%d"%r] = Trace( searchList )
+    return traces
+
+def nearestDistance( index, point, root=None, joint=None ):
+    a, b = index.Project( point )
+    best = None
+    for s, (u, v) in enumerate( index.uv ):
+        r, j = index.paths[ index.pathOf[s] ]
+        if (root is None or r == root) and (joint is None or j == joint):
+            d = ((u-a)**2 + (v-b)**2)**0.5
+            if best is None or d < best:
+                best = d
+    return best
+
+class TestMotionIndex( unittest.TestCase ):
+
+    def setUp( self ):
+        self.rng = random.Random( 7 )
+        self.traces = buildTraces( self.rng )
+        self.plane = Plane( Vector( [0,0,1] ), Vector( [0,0,0] ) )
+
+    def assertSameNearest( self, index, other=None ):
+        for k in range(100):
+            point = Vector( [self.rng.uniform(-400,500), self.rng.uniform(-400,400), 0] )
+            for root, joint in ( (None, None), ("root0", None), ("root3", "joint1") ):
+                found = index.Nearest( point, root, joint )
+                expected = nearestDistance( other or index, point, root, joint )
+                self.assertAlmostEqual( found[3], expected )
+                self.assertTrue( root is None or found[0] == root )
+
+    def testNearestMatchesBruteForce( self ):
+        self.assertSameNearest( MotionIndex( self.traces, self.plane ) )
+        self.assertSameNearest( MotionIndex( self.traces, self.plane, camPos=Vector( [0,0,60] ) ) )
+
+    def testReprojectMatchesANewIndex( self ):
+        index = MotionIndex( self.traces, self.plane )
+        plane = Plane( Vector( [0.2,0.3,1] ).norm(), Vector( [1,2,3] ) )
+        camPos = Vector( [5,5,80] )
+        index.Reproject( plane, camPos )
+        self.assertSameNearest( index, MotionIndex( self.traces, plane, camPos=camPos ) )
+
+    def testUpdateMovesOneRoot( self ):
+        index = MotionIndex( self.traces, self.plane )
+        index.Nearest( Vector( [0,0,0] ), "root2", "joint1" )     # (builds a filtered grid, which has to be dropped)
+        points = self.traces["root2"].searchList["joint1"].points
+        for t in points.keys():
+            points[t] = Vector( [self.rng.gauss(200,20), self.rng.gauss(0,20), 0] )
+        self.assertTrue( index.Update( "root2", self.traces["root2"] ) )
+        self.assertSameNearest( index, MotionIndex( self.traces, self.plane ) )
+        del points[0.0]         # (different sample times can't be patched in place)
+        self.assertFalse( index.Update( "root2", self.traces["root2"] ) )
+
+    def testLassoAndVolume( self ):
+        from MotionIndex import PointInPolygon
+        index = MotionIndex( self.traces, self.plane )
+        # a lasso around the first root (only)
+        lasso = [ Vector( [-15,-15,0] ), Vector( [15,-12,0] ), Vector( [9,15,0] ), Vector( [-15,15,0] ) ]
+        ranges = index.Lasso( lasso )
+        self.assertEqual( ranges.keys(), ["root0"] )
+        poly = [ index.Project( p ) for p in lasso ]
+        self.assertEqual( ranges, index.Ranges( [ s for s, uv in enumerate( index.uv ) if PointInPolygon( uv, poly ) ] ) )
+        self.assertSameVolumes( index )
+
+    def testVolumeAfterUpdate( self ):
+        index = MotionIndex( self.traces, self.plane )
+        points = self.traces["root1"].searchList["joint2"].points
+        for t in points.keys():
+            points[t] = Vector( [self.rng.gauss(60,5), self.rng.gauss(0,5), self.rng.gauss(0,5)] )
+        self.assertTrue( index.Update( "root1", self.traces["root1"] ) )
+        self.assertSameVolumes( index )
+
+    def assertSameVolumes( self, index ):
+        from Cylinder import Cylinder
+        for center, axis, radius in ( ( [30,0,0], [0,0,1], 4.0 ), ( [60,0,0], [1,1,0], 7.0 ), ( [40,2,1], [0.3,0.2,1], 25.0 ) ):
+            cylinder = Cylinder( Vector( center ), Vector( axis ), radius )
+            inside = [ s for s, (x, y, z) in enumerate( index.xyz ) if cylinder.Contains( Vector( [x, y, z] ) ) ]
+            self.assertTrue( inside )
+            self.assertEqual( index.Volume( cylinder ), index.Ranges( inside ) )
+
+if __name__ == "__main__":
+    unittest.main()
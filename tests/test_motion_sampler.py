@@ -0,0 +1,67 @@
+## Headless tests of the MotionSampler (sampling a FakeScene, no Maya needed)
+## Run them from the top of the repository with:  python -m unittest discover -s tests
+
+import os, sys, unittest
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "scripts" ) )
+
+from SceneBackend import FakeScene
+from MotionSampler import MotionSampler, sampleTimes
+
+def buildScene():
+    """ Two rigs: each a root with a hand (swinging in a circle) and a foot (walking along x) """
+    import math
+    scene = FakeScene( playbackRange=(1.0, 10.0) )
+    for root, offset in (("rigA", 0.0), ("rigB", 5.0)):
+        scene.AddObject( root, motion=lambda t, offset=offset: (offset, 0.0, 0.0) )
+        scene.AddObject( root+"_hand", parent=root, motion=lambda t: (math.cos(t), math.sin(t), 0.0) )
+        scene.AddObject( root+"_foot", parent=root, motion=lambda t: (0.5*t, 0.0, 0.0) )
+    return scene
+
+class TestMotionSampler( unittest.TestCase ):
+
+    def setUp( self ):
+        self.scene = buildScene()
+        self.roots, self.traceables = self.scene.FindTraceables()
+
+    def testSamplesEveryJointAtEverySampleTime( self ):
+        sampler = MotionSampler( self.roots, self.traceables, substeps=2, scene=self.scene )
+        sampler.Sample()
+        times = sampleTimes( 1.0, 10.0, 2 )
+        self.assertEqual( sampler.Times(), times )
+        for root in self.roots:
+            self.assertEqual( sorted(sampler.Joints( root )), [root+"_foot", root+"_hand"] )
+            for joint in sampler.Joints( root ):
+                self.assertEqual( sampler.Points( root, joint ), [ self.scene.WorldPosition( joint, t ) for t in times ] )
+        # one bulk query covers every joint and time
+        self.assertEqual( self.scene.queries, 4*len(times) )
+
+    def testWholeFrames( self ):
+        sampler = MotionSampler( self.roots, self.traceables, substeps=4, scene=self.scene )
+        self.assertEqual( sampler.Times( wholeFrames=True ), [ float(f) for f in range(1, 11) ] )
+        self.assertEqual( len(sampler.Points( "rigA", "rigA_foot", wholeFrames=True )), 10 )
+
+    def testOnlyRequestedRootsAreSampled( self ):
+        sampler = MotionSampler( self.roots, self.traceables, scene=self.scene )
+        sampler.Sample( roots=["rigB"] )
+        self.assertEqual( sampler.samples.keys(), ["rigB"] )
+        queries = self.scene.queries
+        sampler.Sample( roots=["rigB"] )        # (already cached)
+        self.assertEqual( self.scene.queries, queries )
+
+    def testAdaptiveSamplingRefinesTheSwing( self ):
+        sampler = MotionSampler( self.roots, self.traceables, scene=self.scene, adaptive=0.01 )
+        sampler.Sample()
+        times = sampler.Times( root="rigA" )
+        self.assertTrue( len(times) > len(sampler.times) )
+        self.assertEqual( times, sorted(times) )
+        for joint in sampler.Joints( "rigA" ):
+            self.assertEqual( sampler.Points( "rigA", joint ), [ self.scene.WorldPosition( joint, t ) for t in times ] )
+
+class TestHeadlessImport( unittest.TestCase ):
+
+    def testToolImportsWithoutMaya( self ):
+        import traceSelectTool
+        self.assertTrue( hasattr( traceSelectTool, "main" ) )
+
+if __name__ == "__main__":
+    unittest.main()
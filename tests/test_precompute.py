@@ -0,0 +1,75 @@
+## Headless tests of precomputing trajectories with a pool of workers (each sampling a FakeScene)
+## Run them from the top of the repository with:  python -m unittest discover -s tests
+
+import os, sys, math, shutil, tempfile, unittest
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "..", "scripts" ) )
+
+from SceneBackend import FakeScene
+from MotionSampler import MotionSampler
+from TrajectoryStore import TrajectoryStore
+import precomputeTrajectories as pt
+
+def fakeScene( scenePath ):
+    """ The scene factory of the workers: a few rigs, each with a couple of moving joints """
+    scene = FakeScene( playbackRange=(1.0, 24.0) )
+    for k in range(5):
+        root = "rig%d"%k
+        scene.AddObject( root, motion=lambda t, k=k: (2.0*k, 0.0, 0.1*t) )
+        scene.AddObject( root+"_hand", parent=root, motion=lambda t, k=k: (math.cos(t+k), math.sin(t), 0.0) )
+        scene.AddObject( root+"_foot", parent=root, motion=lambda t: (0.0, abs(math.sin(0.5*t)), 0.0) )
+    return scene
+
+def sampleDirectly( substeps ):
+    """ Returns a TrajectoryStore of the scene sampled in this process, in one pass """
+    scene = fakeScene( None )
+    roots, traceableObjs = scene.FindTraceables()
+    sampler = MotionSampler( roots, traceableObjs, substeps, scene=scene )
+    sampler.Sample()
+    store = TrajectoryStore( substeps )
+    store.AddSamples( sampler )
+    return store
+
+class TestPrecompute( unittest.TestCase ):
+
+    def setUp( self ):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.dir )
+
+    def testWorkersMergeIntoTheSameStore( self ):
+        for numWorkers in (1, 3):
+            merged = pt.precompute( "fake.mb", numWorkers=numWorkers, substeps=2, sceneFactory=fakeScene )
+            direct = sampleDirectly( 2 )
+            self.assertEqual( merged.times, direct.times )
+            self.assertEqual( merged.joints, direct.joints )
+            self.assertEqual( merged.samples, direct.samples )
+
+    def testSplitWorkCoversEverything( self ):
+        roots = ["rig%d"%k for k in range(5)]
+        times = range(30)
+        for numWorkers in (1, 2, 4, 8):
+            covered = set()
+            for group, chunk in pt.splitWork( roots, times, numWorkers ):
+                for root in group:
+                    for t in chunk:
+                        self.assertFalse( (root, t) in covered )
+                        covered.add( (root, t) )
+            self.assertEqual( len(covered), len(roots)*len(times) )
+
+    def testSavedStoreFillsASampler( self ):
+        path = os.path.join( self.dir, "fake.traj" )
+        pt.precompute( "fake.mb", path, numWorkers=2, sceneFactory=fakeScene )
+        store = TrajectoryStore.Load( path )
+        scene = fakeScene( None )
+        roots, traceableObjs = scene.FindTraceables()
+        sampler = store.Fill( MotionSampler( roots, traceableObjs, scene=scene ) )
+        sampler.Sample()        # (everything is already filled, so nothing is sampled)
+        self.assertEqual( scene.queries, 0 )
+        direct = sampleDirectly( 1 )
+        for root in roots:
+            for joint in sampler.Joints( root ):
+                self.assertEqual( sampler.Points( root, joint ), [ direct.samples[root][joint][t] for t in direct.times ] )
+
+if __name__ == "__main__":
+    unittest.main()